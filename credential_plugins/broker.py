@@ -0,0 +1,320 @@
+"""
+Local token broker for Delinea Secret Server credentials.
+
+A long-lived broker process holds the token cache, refresh schedules and
+HTTP connections for every AWX process on the host.  Plugin instances talk
+to it over a Unix domain socket instead of each importing the SDK and
+keeping their own state:
+
+    tss-token-broker --socket /run/awx/tss-broker.sock
+
+and in the AWX environment::
+
+    TSS_BROKER_SOCKET=/run/awx/tss-broker.sock
+
+Framing is a 4-byte big-endian length followed by a UTF-8 JSON object.
+Requests carry ``op`` (``"token"``, ``"renew"`` or ``"ping"``) and, for
+``token`` and ``renew``, the credential inputs.  ``renew`` also carries the
+``rejected`` token the REST API answered with 401, so the broker replaces
+it for every process rather than handing it out again.  Responses carry
+``ok`` and either ``token`` or ``error`` / ``error_type``.  Connections
+are persistent: a client sends any number of requests on one socket.
+
+The socket is created with owner-only permissions, since requests carry the
+service-account password.
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_FRAME = 1 << 20
+BROKER_TIMEOUT = 90.0
+
+_HEADER = struct.Struct(">I")
+
+
+class BrokerUnavailable(Exception):
+    """The broker could not be reached; callers should resolve directly."""
+
+
+class BrokerTimeout(BrokerUnavailable):
+    """The broker did not answer within the request's timeout."""
+
+
+class BrokerError(Exception):
+    """The broker reached Secret Server and the resolution failed there."""
+
+    def __init__(self, message: str, error_type: str = "Exception"):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+# ── Framing ───────────────────────────────────────────────────────────────
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("broker connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_frame(sock: socket.socket, message: Dict[str, Any]) -> None:
+    """Write *message* as one length-prefixed JSON frame."""
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    if len(body) > MAX_FRAME:
+        raise ValueError("frame too large")
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def recv_frame(sock: socket.socket) -> Dict[str, Any]:
+    """Read one length-prefixed JSON frame."""
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > MAX_FRAME:
+        raise ValueError("frame too large")
+    message: Dict[str, Any] = json.loads(_recv_exact(sock, size).decode("utf-8"))
+    return message
+
+
+# ── Client ────────────────────────────────────────────────────────────────
+
+
+class BrokerClient:
+    """Thread-safe client keeping one persistent connection per thread."""
+
+    def __init__(self, path: str, timeout: float = BROKER_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, message: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Send *message* and return the broker's reply.
+
+        Waits at most *timeout* seconds (capped at the client's timeout),
+        else raises ``BrokerTimeout``.  Raises ``BrokerUnavailable`` when the
+        broker cannot be reached.  A stale pooled connection (e.g. the broker
+        restarted) is retried once on a fresh socket.
+        """
+        timeout = self.timeout if timeout is None else min(self.timeout, timeout)
+        for attempt in (0, 1):
+            sock = self._socket()
+            sock.settimeout(timeout)
+            try:
+                send_frame(sock, message)
+                return recv_frame(sock)
+            except socket.timeout as exc:
+                self.close()
+                raise BrokerTimeout(str(exc) or "timed out") from exc
+            except (OSError, ValueError) as exc:
+                self.close()
+                if attempt:
+                    raise BrokerUnavailable(str(exc)) from exc
+        raise BrokerUnavailable("unreachable")  # pragma: no cover
+
+    def token(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        domain: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Resolve an access token through the broker within *timeout* seconds."""
+        return self._token_request(
+            {
+                "op": "token",
+                "base_url": base_url,
+                "username": username,
+                "password": password,
+                "domain": domain,
+            },
+            timeout,
+        )
+
+    def renew(
+        self,
+        rejected: str,
+        base_url: str,
+        username: str,
+        password: str,
+        domain: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Have the broker replace *rejected* and return the new token."""
+        return self._token_request(
+            {
+                "op": "renew",
+                "rejected": rejected,
+                "base_url": base_url,
+                "username": username,
+                "password": password,
+                "domain": domain,
+            },
+            timeout,
+        )
+
+    def _token_request(self, message: Dict[str, Any], timeout: Optional[float]) -> str:
+        reply = self.request(message, timeout)
+        if not reply.get("ok"):
+            raise BrokerError(reply.get("error", ""), reply.get("error_type", "Exception"))
+        token: str = reply["token"]
+        return token
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None or self._local.pid != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError as exc:
+                sock.close()
+                raise BrokerUnavailable(str(exc)) from exc
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return sock
+
+
+# ── Server ────────────────────────────────────────────────────────────────
+
+Resolver = Callable[[str, str, str, Optional[str]], str]
+Renewer = Callable[[str, str, str, Optional[str], str], str]
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "BrokerServer"
+
+    def handle(self) -> None:
+        while True:
+            try:
+                message = recv_frame(self.request)
+            except (ConnectionError, ValueError, OSError):
+                return
+            reply = self.server.dispatch(message)
+            try:
+                send_frame(self.request, reply)
+            except OSError:
+                return  # the client gave up waiting (e.g. its deadline passed)
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix-socket server answering token requests via *resolve*.
+
+    ``renew`` requests go to *renew*, called with the credential inputs and
+    the rejected token; without one they are refused.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, resolve: Resolver, renew: Optional[Renewer] = None):
+        self.path = path
+        self.resolve = resolve
+        self.renew = renew
+        if os.path.exists(path):
+            os.unlink(path)
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def dispatch(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True}
+        renew = self.renew
+        if op not in ("token", "renew") or (op == "renew" and renew is None):
+            return {"ok": False, "error": f"Unknown op '{op}'", "error_type": "ValueError"}
+        try:
+            credentials = (
+                message["base_url"],
+                message["username"],
+                message["password"],
+                message.get("domain"),
+            )
+            if renew is not None and op == "renew":
+                token = renew(*credentials, message["rejected"])
+            else:
+                token = self.resolve(*credentials)
+        except Exception as exc:
+            return {"ok": False, "error": str(exc), "error_type": type(exc).__name__}
+        return {"ok": True, "token": token}
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the broker until interrupted."""
+    from .delinea_secret_server import (
+        _acquire_token,
+        _cache_key,
+        _renew_token,
+        _token_refresher,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="tss-token-broker",
+        description="Serve Delinea Secret Server tokens to local AWX processes.",
+    )
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get("TSS_BROKER_SOCKET", "/run/tss-broker/broker.sock"),
+        help="Unix socket path (default: $TSS_BROKER_SOCKET)",
+    )
+    parser.add_argument(
+        "--refresh-ratio",
+        type=float,
+        default=0.8,
+        help="Renew tokens after this fraction of expires_in (0 disables)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    _token_refresher.ratio = args.refresh_ratio
+
+    def resolve(base_url: str, username: str, password: str, domain: Optional[str]) -> str:
+        key = _cache_key(base_url, username, password, domain)
+        return _acquire_token(key, base_url, username, password, domain)
+
+    def renew(
+        base_url: str, username: str, password: str, domain: Optional[str], rejected: str
+    ) -> str:
+        return _renew_token((base_url, username, password, domain), rejected)
+
+    server = BrokerServer(args.socket, resolve, renew)
+    logger.info("Token broker listening on %s", args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        _token_refresher.stop()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
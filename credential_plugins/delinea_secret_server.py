@@ -12,18 +12,108 @@ value to return.
 """
 
 import collections
-from typing import Any, Optional
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from concurrent.futures import ThreadPoolExecutor
+
+    from delinea.secrets.server import (
+        DomainPasswordGrantAuthorizer,
+        PasswordGrantAuthorizer,
+        SecretServer,
+        SecretServerClientError,
+        SecretServerError,
+    )
+
+    from .broker import BrokerClient
+    from .metrics import PluginMetrics, Registry, TextfileWriter
+    from .secret_index import Getter, SecretIndex
+    from .token_store import TokenStore
+    from .transport import SessionPool
+
+from . import tracing
+from .endpoints import (
+    CircuitBreaker,
+    EndpointHealth,
+    LatencyWindow,
+    canonical_url,
+    hedge,
+    split_endpoints,
+)
+from .throttle import RateLimiter, Throttled, backoff, retry_after
+from .tracing import Profiler, identity_hash, span
+
+T = TypeVar("T")
 
-from delinea.secrets.server import (
-    DomainPasswordGrantAuthorizer,
-    PasswordGrantAuthorizer,
+logger = logging.getLogger(__name__)
+
+# ── Lazy SDK import ───────────────────────────────────────────────────────
+#
+# AWX imports every installed credential plugin at startup, even when no
+# Delinea credential is ever resolved.  The SDK (and ``requests`` with it)
+# is therefore imported on the first grant, not at module load, so reading
+# ``INPUTS`` and the ``CredentialPlugin`` stays cheap.
+_SDK_NAMES = (
+    "DomainPasswordGrantAuthorizer",
+    "PasswordGrantAuthorizer",
+    "SecretServer",
+    "SecretServerClientError",
+    "SecretServerError",
 )
 
+
+def _load_sdk() -> None:
+    """Import the Delinea SDK and bind its classes as module globals.
+
+    Names that are already bound (e.g. patched in tests) are left alone.
+    """
+    if all(name in globals() for name in _SDK_NAMES):
+        return
+    from delinea.secrets import server
+
+    for name in _SDK_NAMES:
+        globals().setdefault(name, getattr(server, name))
+
+
+def __getattr__(name: str) -> Any:
+    if name in _SDK_NAMES:
+        _load_sdk()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # ── Input field definition (what the user fills in on the credential form) ──
 #
 # fields:    set once when the user creates a Delinea credential in AWX
 # metadata:  set each time the user *links* a target credential field
-#   - identifier dropdown selects the value to return ("token" or "base_url")
+#   - identifier dropdown selects the value to return ("token", "base_url"
+#     or "secret")
+#   - secret_id (or secret_path) / secret_field select the secret field for
+#     "secret"
 INPUTS = {
     "fields": [
         {
@@ -32,7 +122,9 @@ INPUTS = {
             "help_text": (
                 "The base URL of Secret Server, e.g. "
                 "https://myserver/SecretServer or "
-                "https://mytenant.secretservercloud.com"
+                "https://mytenant.secretservercloud.com.  List several "
+                "web nodes (comma-separated) to fail over between them; "
+                "the first is the canonical URL."
             ),
             "type": "string",
         },
@@ -55,16 +147,49 @@ INPUTS = {
             "type": "string",
             "secret": True,
         },
+        {
+            "id": "timeout",
+            "label": "Timeout (seconds)",
+            "help_text": (
+                "Overall time limit for resolving a value at job launch " "(optional, default 60)"
+            ),
+            "type": "string",
+        },
     ],
     "metadata": [
         {
             "id": "identifier",
             "label": "Output value",
             "type": "string",
-            "choices": ["token", "base_url"],
+            "choices": ["token", "base_url", "secret"],
             "default": "token",
             "help_text": (
-                "Select which value to return: " "the OAuth2 token or the Secret Server base URL."
+                "Select which value to return: the OAuth2 token, the Secret Server "
+                "base URL, or a field of the secret selected below."
+            ),
+        },
+        {
+            "id": "secret_id",
+            "label": "Secret ID",
+            "type": "string",
+            "help_text": "Numeric ID of the secret to read (Output value: secret).",
+        },
+        {
+            "id": "secret_path",
+            "label": "Secret path",
+            "type": "string",
+            "help_text": (
+                "Folder path and name of the secret, e.g. Servers\\Linux\\db-admin; "
+                "used when no Secret ID is set (Output value: secret)."
+            ),
+        },
+        {
+            "id": "secret_field",
+            "label": "Secret field",
+            "type": "string",
+            "help_text": (
+                "Slug or name of the secret field to return, e.g. password "
+                "(Output value: secret)."
             ),
         },
     ],
@@ -72,6 +197,602 @@ INPUTS = {
 }
 
 
+def _env_int(name: str, default: int) -> int:
+    """Read an integer tuning knob from the environment."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float tuning knob from the environment."""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────
+#
+# Opt-in Prometheus metrics for backend() calls, grants and caches; see
+# ``metrics``.  While disabled, instrumented paths only compare
+# ``_metrics`` with ``None``.
+#
+# TSS_METRICS           1 collects metrics in memory
+# TSS_METRICS_TEXTFILE  file the metrics are written to for node_exporter's
+#                       textfile collector (implies TSS_METRICS=1)
+# TSS_METRICS_INTERVAL  seconds between textfile writes
+METRICS_ENABLED = _env_int("TSS_METRICS", 0) > 0
+METRICS_TEXTFILE = os.environ.get("TSS_METRICS_TEXTFILE", "")
+METRICS_INTERVAL = _env_float("TSS_METRICS_INTERVAL", 15.0)
+
+_metrics: Optional["PluginMetrics"] = None
+_metrics_writer: Optional["TextfileWriter"] = None
+_metrics_lock = threading.Lock()
+
+
+def enable_metrics(
+    textfile: Optional[str] = None, interval: float = METRICS_INTERVAL
+) -> "Registry":
+    """Start collecting metrics and return their registry.
+
+    A host process can serve ``registry.render()`` on its scrape endpoint.
+    With *textfile*, the metrics are also written to that path every
+    *interval* seconds and at exit.
+    """
+    global _metrics, _metrics_writer
+    with _metrics_lock:
+        if _metrics is None:
+            from .metrics import PluginMetrics
+
+            _metrics = PluginMetrics()
+        if textfile and _metrics_writer is None:
+            import atexit
+
+            from .metrics import TextfileWriter
+
+            _metrics_writer = TextfileWriter(_metrics.registry, textfile, interval)
+            _metrics_writer.start()
+            atexit.register(_metrics_writer.write)
+        return _metrics.registry
+
+
+def disable_metrics() -> None:
+    """Stop collecting metrics (and writing the textfile)."""
+    global _metrics, _metrics_writer
+    with _metrics_lock:
+        if _metrics_writer is not None:
+            _metrics_writer.stop()
+        _metrics = _metrics_writer = None
+
+
+if METRICS_ENABLED or METRICS_TEXTFILE:
+    enable_metrics(METRICS_TEXTFILE or None)
+
+
+# ── Tracing and profiling ─────────────────────────────────────────────────
+#
+# Per-phase timing spans (see ``tracing``) are emitted once the host
+# registers a consumer with ``tracing.add_span_callback()`` or
+# ``tracing.set_tracer()``, or through the switches below.  A sampled
+# fraction of backend() calls can also be profiled to files.
+#
+# TSS_TRACE_LOG       1 logs every span at DEBUG on ``credential_plugins.tracing``
+# TSS_TRACE_OTEL      1 forwards spans to the OpenTelemetry tracer provider
+# TSS_PROFILE_SAMPLE  fraction of backend() calls profiled (e.g. 0.01); 0 disables
+# TSS_PROFILE         ``cprofile`` (pstats files) or ``tracemalloc`` (snapshots)
+# TSS_PROFILE_DIR     directory for profile files (default: the temp dir)
+PROFILE_SAMPLE = _env_float("TSS_PROFILE_SAMPLE", 0.0)
+
+_profiler: Optional[Profiler] = None
+if PROFILE_SAMPLE > 0:
+    _profiler = Profiler(
+        PROFILE_SAMPLE,
+        os.environ.get("TSS_PROFILE", "cprofile"),
+        os.environ.get("TSS_PROFILE_DIR", ""),
+    )
+if _env_int("TSS_TRACE_LOG", 0) > 0:
+    tracing.add_span_callback(tracing.log_span)
+if _env_int("TSS_TRACE_OTEL", 0) > 0:
+    tracing.use_opentelemetry()
+
+
+# ── Token cache ───────────────────────────────────────────────────────────
+#
+# AWX resolves the linked ``token`` field once per job launch.  Caching the
+# grant per identity means a burst of launches against the same service
+# account costs one OAuth2 round trip instead of one per job.
+#
+# TSS_TOKEN_CACHE_SIZE    max identities kept (LRU), 0 disables the cache
+# TSS_TOKEN_CACHE_MARGIN  seconds shaved off ``expires_in`` so a cached
+#                         token is never handed out right before it expires
+TOKEN_CACHE_SIZE = _env_int("TSS_TOKEN_CACHE_SIZE", 256)
+TOKEN_CACHE_MARGIN = _env_float("TSS_TOKEN_CACHE_MARGIN", 60.0)
+
+CacheKey = Tuple[str, str, str, str]
+
+
+class Grant(NamedTuple):
+    """An OAuth2 grant as returned by Secret Server.
+
+    ``refresh_token`` and ``token_url`` are kept so the grant can be
+    renewed without the password.
+    """
+
+    access_token: str
+    expires_in: Optional[float]
+    refresh_token: Optional[str]
+    token_url: Optional[str]
+
+
+def _cache_key(
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str] = None,
+) -> CacheKey:
+    """Build the cache key for an identity.
+
+    Keys carry the password only as a SHA-256 digest, so a rotated password
+    maps to a new key and keys can be kept, compared and logged safely.  The
+    raw password itself is still held wherever the plugin must authenticate
+    again later: refresh schedules and secret path indexes.
+    """
+    digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
+    return (canonical_url(base_url).rstrip("/"), username, domain or "", digest)
+
+
+class TokenCache:
+    """Thread-safe LRU cache of access tokens with per-entry expiry."""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, margin: float = TOKEN_CACHE_MARGIN):
+        self.max_size = max_size
+        self.margin = margin
+        self._entries: "collections.OrderedDict[CacheKey, Tuple[str, float]]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        """Return the cached token for *key*, or ``None`` if absent or expired."""
+        token = self._lookup(key)
+        if _metrics is not None:
+            _metrics.cache.inc("token", "miss" if token is None else "hit")
+        return token
+
+    def _lookup(self, key: CacheKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def put(self, key: CacheKey, token: str, expires_in: Optional[float]) -> None:
+        """Store *token* for ``expires_in - margin`` seconds.
+
+        Tokens without a usable lifetime are not cached.
+        """
+        if self.max_size <= 0 or not expires_in:
+            return
+        ttl = float(expires_in) - self.margin
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                if _metrics is not None:
+                    _metrics.evictions.inc("token")
+
+    def discard(self, key: CacheKey, token: str) -> None:
+        """Drop *key*'s entry if it still holds *token* (e.g. after a 401)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop every cached token."""
+        with self._lock:
+            self._entries.clear()
+
+    def _after_fork(self) -> None:
+        """Give a forked child a fresh lock; unexpired tokens carry over."""
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_token_cache = TokenCache()
+
+
+# ── Negative cache ────────────────────────────────────────────────────────
+#
+# A rejected grant (4xx: wrong or rotated password, locked or disabled
+# account) is remembered per identity and password digest for a short
+# time.  Launches in that window raise a copy of the error without another
+# grant, so a stale password does not hammer Secret Server or push the
+# service account into lockout.  A new password is a new key and is tried
+# at once.
+#
+# TSS_AUTH_ERROR_TTL     seconds a rejected grant is remembered; 0 disables
+AUTH_ERROR_TTL = _env_float("TSS_AUTH_ERROR_TTL", 30.0)
+
+
+_ErrorEntry = Tuple[Type[BaseException], Tuple[Any, ...], Dict[str, Any], float]
+
+
+class AuthErrorCache:
+    """Thread-safe LRU cache of rejected-grant errors with a fixed time-to-live.
+
+    Only each error's type, arguments and attributes are kept, and every hit
+    gets a new instance built from them: a remembered traceback
+    would pin the failed call's locals, password included, and grow with
+    every re-raise.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl: float = AUTH_ERROR_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "collections.OrderedDict[CacheKey, _ErrorEntry]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[BaseException]:
+        """Return a copy of the remembered error for *key*, ``None`` if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            error_type, args, attributes, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+        # Skip __init__: SDK errors keep their message in an attribute, not args.
+        error = error_type.__new__(error_type, *args)
+        error.__dict__.update(attributes)
+        return error
+
+    def put(self, key: CacheKey, error: BaseException) -> None:
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (
+                type(error),
+                error.args,
+                dict(vars(error)),
+                time.monotonic() + self.ttl,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget every remembered error."""
+        with self._lock:
+            self._entries.clear()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_auth_errors = AuthErrorCache()
+
+
+# ── Deadlines ─────────────────────────────────────────────────────────────
+#
+# Every backend() call runs under an overall deadline (the ``timeout``
+# field, else TSS_CALL_DEADLINE).  Each HTTP request gets the configured
+# connect / read timeouts, capped by the time left, and waiting on another
+# caller's grant stops at the deadline too.
+#
+# TSS_CALL_DEADLINE          default overall seconds per backend() call; 0
+#                            means no overall limit
+# TSS_HTTP_CONNECT_TIMEOUT   seconds to establish a connection
+CALL_DEADLINE = _env_float("TSS_CALL_DEADLINE", 60.0)
+HTTP_CONNECT_TIMEOUT = _env_float("TSS_HTTP_CONNECT_TIMEOUT", 5.0)
+
+_deadline: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar(
+    "tss_deadline", default=None
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's deadline passed before a value could be resolved."""
+
+
+def _remaining() -> Optional[float]:
+    """Seconds left before the current deadline, ``None`` without one.
+
+    Raises ``DeadlineExceeded`` once the deadline has passed.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Secret Server did not answer within the call deadline")
+    return remaining
+
+
+def _spent_deadline(exc: BaseException) -> bool:
+    """Whether *exc* is the current deadline running out rather than a real failure.
+
+    An HTTP timeout counts once the deadline has passed, since the deadline
+    capped it.
+    """
+    if isinstance(exc, DeadlineExceeded):
+        return True
+    deadline = _deadline.get()
+    return deadline is not None and isinstance(exc, OSError) and time.monotonic() >= deadline
+
+
+def _call_deadline(kwargs: Mapping[str, Any]) -> Optional[float]:
+    """Return the overall seconds allowed for this call, ``None`` for no limit."""
+    value = kwargs.get("timeout")
+    if value in (None, ""):
+        seconds = CALL_DEADLINE
+    else:
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Timeout must be a number of seconds, got '{value}'.")
+    return seconds if seconds > 0 else None
+
+
+# ── Single-flight ─────────────────────────────────────────────────────────
+#
+# When many jobs linked to the same credential launch together, only the
+# first thread performs the grant; the rest wait for and share its outcome.
+
+
+class _Call:
+    """An in-flight call whose result (or exception) is shared by waiters."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # The leader failed because its own deadline ran out, not the call.
+        self.deadline_spent = False
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Any, fn: Callable[[], T]) -> T:
+        """Run *fn* once for all concurrent callers sharing *key*.
+
+        Every caller receives the leader's return value, or re-raises the
+        leader's exception.  Waiters give up with ``DeadlineExceeded`` when
+        their own call deadline passes first.  A leader that ran out of its
+        own deadline is not followed: waiters with time left run *fn* again.
+        """
+        while True:
+            with self._lock:
+                existing = self._calls.get(key)
+                call = existing if existing is not None else _Call()
+                if existing is None:
+                    self._calls[key] = call
+            if existing is None:
+                break
+            if not call.done.wait(_remaining()):
+                raise DeadlineExceeded("Timed out waiting for a concurrent grant")
+            if call.error is None:
+                return cast(T, call.result)
+            if not call.deadline_spent:
+                raise call.error
+            _remaining()  # the leader's deadline, not ours, ran out; retry if time is left
+
+        try:
+            result = call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            call.deadline_spent = _spent_deadline(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return result
+
+    def _after_fork(self) -> None:
+        """Forget in-flight calls: their leaders are parent threads that never finish here."""
+        self._calls = {}
+        self._lock = threading.Lock()
+
+
+_token_flight = SingleFlight()
+
+
+# ── HTTP connection pooling ───────────────────────────────────────────────
+#
+# The SDK opens a new TCP + TLS connection for every request.  Authorizers
+# built by _get_authorizer() send their requests through a per-origin
+# keep-alive session instead, and the detected server type is remembered per
+# base URL so later grants skip the SDK's health-check round trip.  New
+# connections resume cached TLS sessions and use cached DNS answers; see
+# ``transport.stats()`` for the handshake and DNS counters.
+#
+# TSS_HTTP_POOL_SIZE     max keep-alive connections kept per origin
+# TSS_HTTP_IDLE_TIMEOUT  seconds before an unused origin's session is closed
+# TSS_HTTP_TIMEOUT       per-request read timeout in seconds (SDK default: 60)
+# TSS_DNS_CACHE_TTL      seconds Secret Server addresses stay cached; 0
+#                        resolves on every new connection
+HTTP_POOL_SIZE = _env_int("TSS_HTTP_POOL_SIZE", 10)
+HTTP_IDLE_TIMEOUT = _env_float("TSS_HTTP_IDLE_TIMEOUT", 60.0)
+HTTP_TIMEOUT = _env_float("TSS_HTTP_TIMEOUT", 60.0)
+DNS_CACHE_TTL = _env_float("TSS_DNS_CACHE_TTL", 60.0)
+
+_http_pool: Optional["SessionPool"] = None
+_http_pool_lock = threading.Lock()
+_server_types: Dict[str, str] = {}
+
+
+def _get_http_pool() -> "SessionPool":
+    """Create the session pool (importing ``requests``) on first use."""
+    global _http_pool
+    with _http_pool_lock:
+        if _http_pool is None:
+            from .transport import SessionPool, dns_cache
+
+            dns_cache.ttl = DNS_CACHE_TTL
+            _http_pool = SessionPool(HTTP_POOL_SIZE, HTTP_IDLE_TIMEOUT)
+        return _http_pool
+
+
+def _http_timeout() -> Tuple[float, float]:
+    """``(connect, read)`` timeouts for the next request, capped by the deadline."""
+    remaining = _remaining()
+    if remaining is None:
+        return (HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT)
+    return (min(HTTP_CONNECT_TIMEOUT, remaining), min(HTTP_TIMEOUT, remaining))
+
+
+def _request_access_grant(token_url: str, grant_request: Dict[str, Any]) -> Dict[str, Any]:
+    """Pooled replacement for ``PasswordGrantAuthorizer.get_access_grant``.
+
+    Keeps the SDK's response handling: HTTP errors raise
+    ``SecretServerClientError`` / ``SecretServerServiceError`` and a non-JSON
+    body raises ``SecretServerError``.  HTTP 429 raises ``Throttled``.
+    """
+    _load_sdk()
+    session = _get_http_pool().session(token_url)
+    with span("grant", url=token_url) as attributes:
+        response = session.post(token_url, grant_request, timeout=_http_timeout())
+        attributes["http.status_code"] = response.status_code
+    if response.status_code == 429:
+        raise Throttled(
+            "Secret Server throttled the token request",
+            retry_after(response.headers.get("Retry-After")),
+        )
+    try:
+        grant: Dict[str, Any] = json.loads(SecretServer.process(response).content)
+    except json.JSONDecodeError:
+        raise SecretServerError(response)
+    return grant
+
+
+def _check_health_endpoint(url: str) -> bool:
+    """Pooled replacement for the SDK's server-detection health check."""
+    timeout = _http_timeout()
+    try:
+        with span("health_check", url=url):
+            response = _get_http_pool().session(url).get(url, timeout=timeout)
+            body = response.content
+    except Exception:
+        return False
+    try:
+        return bool(response.json().get("Healthy", False))
+    except Exception:
+        return b"Healthy" in body or b"healthy" in body
+
+
+# ── Endpoint failover ─────────────────────────────────────────────────────
+#
+# ``base_url`` may list several web nodes.  Grants and secret reads go to
+# the healthiest node by latency / error-rate moving averages and fail over
+# to the next one within the same call; see ``endpoints.EndpointHealth``.
+# Rejected credentials (4xx) are not retried on another node.
+#
+# Each node also has a circuit breaker: after TSS_CIRCUIT_THRESHOLD
+# consecutive failures its circuit opens and calls to it fail at once with
+# ``CircuitOpen`` (failing over to other nodes) instead of waiting for a
+# timeout; after TSS_CIRCUIT_RESET_TIMEOUT seconds a single probe request
+# decides whether it closes again.
+#
+# With hedging enabled, a grant still unanswered after the observed
+# percentile latency is also sent to the next node, and the first success
+# wins, cutting the tail caused by one slow node.  The backup takes its own
+# grant rate-limit slot and is skipped when none is free.
+#
+# TSS_HEDGE_PERCENTILE   grant latency percentile to hedge at (e.g. 95);
+#                        0 disables hedging
+# TSS_HEDGE_MIN_SAMPLES  grants observed before hedging starts
+# TSS_CIRCUIT_THRESHOLD  consecutive failures that open a node's circuit;
+#                        0 disables the breaker
+# TSS_CIRCUIT_RESET_TIMEOUT  seconds an open circuit waits before a probe
+HEDGE_PERCENTILE = _env_float("TSS_HEDGE_PERCENTILE", 0.0)
+HEDGE_MIN_SAMPLES = _env_int("TSS_HEDGE_MIN_SAMPLES", 20)
+CIRCUIT_THRESHOLD = _env_int("TSS_CIRCUIT_THRESHOLD", 5)
+CIRCUIT_RESET_TIMEOUT = _env_float("TSS_CIRCUIT_RESET_TIMEOUT", 30.0)
+
+_endpoint_health = EndpointHealth()
+_circuits = CircuitBreaker(CIRCUIT_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+_grant_latency = LatencyWindow()
+
+
+# ── Grant rate limiting ───────────────────────────────────────────────────
+#
+# Password grants to one Secret Server pass through a token bucket shared
+# by every thread, keyed by the canonical base_url.  Callers over the rate
+# queue for their slot until their call deadline instead of failing.  An
+# HTTP 429 raises ``Throttled``; the grant is retried after the server's
+# Retry-After (or a jittered exponential backoff without one), and the
+# whole bucket pauses for that time so queued callers do not pile on.
+#
+# TSS_GRANT_RATE     password grants per second per Secret Server; 0 means
+#                    unlimited (429 responses are still honoured)
+# TSS_GRANT_BURST    grants allowed at once before the rate applies
+# TSS_GRANT_RETRIES  retries of a throttled grant
+GRANT_RATE = _env_float("TSS_GRANT_RATE", 0.0)
+GRANT_BURST = _env_int("TSS_GRANT_BURST", 10)
+GRANT_RETRIES = _env_int("TSS_GRANT_RETRIES", 3)
+
+_grant_limiter = RateLimiter(GRANT_RATE, GRANT_BURST)
+
+
+def _throttle_grant(key: str) -> None:
+    """Wait for a grant slot for *key*, within the call deadline."""
+    if not _grant_limiter.acquire(key, _remaining()):
+        raise DeadlineExceeded("Grant rate limit would delay the call past its deadline")
+
+
+def _back_off(key: str, exc: Throttled, attempt: int) -> None:
+    """Pause grants for *key* after a 429, or re-raise if past the deadline."""
+    delay = (exc.retry_after or 0.0) + backoff(attempt)
+    remaining = _remaining()
+    if remaining is not None and delay >= remaining:
+        raise exc
+    logger.warning("Secret Server throttled a token request; retrying in %.1fs", delay)
+    _grant_limiter.pause(key, delay)
+
+
+def _should_failover(exc: BaseException) -> bool:
+    """Connection errors, timeouts, open circuits and 5xx / unusable responses fail over."""
+    _load_sdk()
+    if isinstance(exc, (SecretServerClientError, DeadlineExceeded)):
+        return False
+    return isinstance(exc, (OSError, SecretServerError))
+
+
+def _is_auth_error(exc: BaseException) -> bool:
+    """Whether *exc* is Secret Server rejecting the credentials (4xx)."""
+    _load_sdk()
+    return isinstance(exc, SecretServerClientError)
+
+
+def _is_token_rejected(exc: BaseException) -> bool:
+    """Whether *exc* is the REST API rejecting the bearer token (HTTP 401)."""
+    return getattr(exc, "status_code", None) == 401
+
+
 def _get_authorizer(
     base_url: str,
     username: str,
@@ -81,11 +802,836 @@ def _get_authorizer(
     """Create and return an authenticated Delinea SDK authorizer.
 
     Uses ``DomainPasswordGrantAuthorizer`` when *domain* is provided,
-    otherwise ``PasswordGrantAuthorizer``.
+    otherwise ``PasswordGrantAuthorizer``.  The authorizer's requests go
+    through the pooled HTTP session for *base_url*.
     """
+    _load_sdk()
     if domain:
-        return DomainPasswordGrantAuthorizer(base_url, username, domain, password)
-    return PasswordGrantAuthorizer(base_url, username, password)
+        authorizer = DomainPasswordGrantAuthorizer(base_url, username, domain, password)
+    else:
+        authorizer = PasswordGrantAuthorizer(base_url, username, password)
+    # The SDK calls these through ``self``, so instance attributes take
+    # precedence over its module-level ``requests`` calls.
+    authorizer.get_access_grant = _request_access_grant
+    authorizer._validate_health_endpoint = _check_health_endpoint
+    server_type = _server_types.get(base_url.rstrip("/"))
+    if server_type is not None:
+        authorizer._server_type = server_type
+    return authorizer
+
+
+def _fetch_grant(
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str] = None,
+) -> Grant:
+    """Perform the OAuth2 password grant and return the resulting ``Grant``.
+
+    Lifetime and refresh token are read from the SDK's ``access_grant``;
+    they are ``None`` when the server did not report them.  With several
+    endpoints in *base_url*, the grant fails over between them, and is
+    hedged on the next node when hedging is enabled.  Grants are rate
+    limited per Secret Server and throttled ones are retried.
+    """
+    endpoints = split_endpoints(base_url)
+    key = endpoints[0].rstrip("/")
+    attempt = 0
+    while True:
+        _throttle_grant(key)
+        started = time.monotonic()
+        try:
+            if len(endpoints) == 1:
+                grant = _grant_from(endpoints[0], username, password, domain)
+            else:
+                grant = _grant_on(endpoints, username, password, domain)
+        except Throttled as exc:
+            if attempt >= GRANT_RETRIES:
+                raise
+            _back_off(key, exc, attempt)
+            attempt += 1
+            continue
+        _grant_latency.add(time.monotonic() - started)
+        return grant
+
+
+def _grant_on(
+    endpoints: List[str],
+    username: str,
+    password: str,
+    domain: Optional[str],
+) -> Grant:
+    def attempt(order: List[str]) -> Callable[[], Grant]:
+        return lambda: _endpoint_health.call(
+            order,
+            lambda endpoint: _grant_from(endpoint, username, password, domain),
+            _should_failover,
+            reorder=False,
+        )
+
+    def admit() -> bool:
+        # The backup is one more password grant, so it needs a free slot of
+        # its own; when the limit has none, the hedge is skipped.
+        return _grant_limiter.acquire(endpoints[0].rstrip("/"), 0.0)
+
+    order = _endpoint_health.order(endpoints)
+    delay = _hedge_delay()
+    if delay is None:
+        return attempt(order)()
+    # The backup starts on the next-healthiest node and fails over from there.
+    return hedge(attempt(order), attempt(order[1:] + order[:1]), delay, admit)
+
+
+def _hedge_delay() -> Optional[float]:
+    """Seconds before a backup grant is sent, ``None`` when not hedging."""
+    if HEDGE_PERCENTILE <= 0:
+        return None
+    return _grant_latency.percentile(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+
+
+def _grant_from(
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str] = None,
+) -> Grant:
+    """Perform the password grant against the single endpoint *base_url*."""
+
+    def grant() -> Grant:
+        if _metrics is None:
+            return _grant_at(base_url, username, password, domain)
+        return _metrics.track_grant(
+            base_url.rstrip("/"), lambda: _grant_at(base_url, username, password, domain)
+        )
+
+    return _circuits.call(base_url, grant, _should_failover)
+
+
+def _grant_at(
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str] = None,
+) -> Grant:
+    authorizer = _get_authorizer(base_url, username, password, domain)
+    token: str = authorizer.get_access_token()
+    server_type = getattr(authorizer, "_server_type", None)
+    if isinstance(server_type, str):
+        _server_types[base_url.rstrip("/")] = server_type
+    grant = getattr(authorizer, "access_grant", None)
+    if not isinstance(grant, dict):
+        return Grant(token, None, None, None)
+    return Grant(
+        token,
+        grant.get("expires_in"),
+        grant.get("refresh_token"),
+        getattr(authorizer, "token_url", None),
+    )
+
+
+def _refresh_grant(grant: Grant) -> Grant:
+    """Renew *grant* with the OAuth2 ``refresh_token`` grant type.
+
+    Uses the SDK's error handling over the pooled session, so a rejected
+    refresh token raises ``SecretServerError`` just like a failed password
+    grant.
+    """
+    assert grant.token_url is not None
+    response = _request_access_grant(
+        grant.token_url,
+        {"grant_type": "refresh_token", "refresh_token": grant.refresh_token},
+    )
+    return Grant(
+        response["access_token"],
+        response.get("expires_in"),
+        response.get("refresh_token", grant.refresh_token),
+        grant.token_url,
+    )
+
+
+# ── Background refresh ────────────────────────────────────────────────────
+#
+# Opt-in: renews cached tokens at a fraction of their lifetime so the
+# launch path keeps hitting the cache.  Identities that have not been
+# requested for TSS_TOKEN_REFRESH_IDLE seconds are dropped from the schedule.
+#
+# TSS_TOKEN_REFRESH_RATIO  fraction of ``expires_in`` after which to renew
+#                          (e.g. 0.8); 0 disables background refresh
+# TSS_TOKEN_REFRESH_IDLE   seconds without a request before an identity is
+#                          no longer refreshed
+TOKEN_REFRESH_RATIO = _env_float("TSS_TOKEN_REFRESH_RATIO", 0.0)
+TOKEN_REFRESH_IDLE = _env_float("TSS_TOKEN_REFRESH_IDLE", 900.0)
+
+Credentials = Tuple[str, str, str, Optional[str]]
+
+
+class _RefreshEntry:
+    """Refresh schedule for one identity."""
+
+    __slots__ = ("credentials", "grant", "refresh_at", "last_used")
+
+    def __init__(self, credentials: Credentials, grant: Grant, refresh_at: float, last_used: float):
+        self.credentials = credentials
+        self.grant = grant
+        self.refresh_at = refresh_at
+        self.last_used = last_used
+
+
+class TokenRefresher:
+    """Renew cached tokens ahead of expiry on a single daemon thread.
+
+    The password is kept alongside each scheduled identity so the refresher
+    can fall back to a password grant when no refresh token was issued or
+    the refresh token was rejected.
+    """
+
+    def __init__(
+        self,
+        cache: TokenCache,
+        ratio: float = TOKEN_REFRESH_RATIO,
+        idle_timeout: float = TOKEN_REFRESH_IDLE,
+    ):
+        self.cache = cache
+        self.ratio = ratio
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[CacheKey, _RefreshEntry] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    @property
+    def enabled(self) -> bool:
+        return 0 < self.ratio < 1
+
+    def schedule(
+        self,
+        key: CacheKey,
+        grant: Grant,
+        credentials: Credentials,
+        last_used: Optional[float] = None,
+    ) -> None:
+        """Plan the renewal of *grant* at ``ratio * expires_in`` from now."""
+        if not self.enabled or not grant.expires_in:
+            return
+        now = time.monotonic()
+        entry = _RefreshEntry(
+            credentials,
+            grant,
+            refresh_at=now + self.ratio * float(grant.expires_in),
+            last_used=now if last_used is None else last_used,
+        )
+        with self._cond:
+            self._entries[key] = entry
+            self._ensure_thread()
+            self._cond.notify()
+
+    def touch(self, key: CacheKey) -> None:
+        """Record that *key* was just requested, keeping it on the schedule.
+
+        Also restarts the refresh thread if it is gone, e.g. after a fork.
+        """
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                self._ensure_thread()
+
+    def stop(self) -> None:
+        """Stop the refresh thread and forget every scheduled identity."""
+        with self._cond:
+            self._stopped = True
+            self._entries.clear()
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        with self._cond:
+            self._thread = None
+            self._stopped = False
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._entries)
+
+    def _after_fork(self) -> None:
+        """Keep the schedule in a forked child; the thread restarts on next use."""
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="tss-token-refresher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                due = [(k, e) for k, e in self._entries.items() if e.refresh_at <= now]
+                for key, _ in due:
+                    del self._entries[key]
+                if not due:
+                    next_at = min((e.refresh_at for e in self._entries.values()), default=None)
+                    self._cond.wait(None if next_at is None else next_at - now)
+                    continue
+            for key, entry in due:
+                self._refresh(key, entry)
+
+    def _refresh(self, key: CacheKey, entry: _RefreshEntry) -> None:
+        if time.monotonic() - entry.last_used > self.idle_timeout:
+            return
+        grant = None
+        if entry.grant.refresh_token and entry.grant.token_url:
+            try:
+                grant = _refresh_grant(entry.grant)
+            except Exception as exc:
+                logger.debug(
+                    "Refresh token grant failed (%s); using password grant", type(exc).__name__
+                )
+        if grant is None:
+            try:
+                grant = _fetch_grant(*entry.credentials)
+            except Exception as exc:
+                logger.warning("Background token refresh failed: %s", type(exc).__name__)
+                return
+        self.cache.put(key, grant.access_token, grant.expires_in)
+        _publish_shared(entry.credentials, grant)
+        self.schedule(key, grant, entry.credentials, last_used=entry.last_used)
+
+
+_token_refresher = TokenRefresher(_token_cache)
+
+
+# ── Shared token store ────────────────────────────────────────────────────
+#
+# Opt-in: grants are shared between worker processes (and nodes) through a
+# ``TokenStore`` so one grant per identity serves every worker.
+#
+# TSS_TOKEN_STORE_URL    ``redis://`` / ``rediss://`` URL of a cluster-wide
+#                        store (requires the ``redis`` extra)
+# TSS_SHARED_CACHE_PATH  path of a node-local SQLite store (owner-only
+#                        permissions), used when no store URL is set
+#
+# Host processes can also install their own backend with set_token_store().
+TOKEN_STORE_URL = os.environ.get("TSS_TOKEN_STORE_URL", "")
+SHARED_CACHE_PATH = os.environ.get("TSS_SHARED_CACHE_PATH", "")
+
+_custom_store: Optional["TokenStore"] = None
+_shared_store: Optional["TokenStore"] = None
+_shared_store_config: Tuple[str, str] = ("", "")
+_shared_store_lock = threading.Lock()
+
+
+def set_token_store(store: Optional["TokenStore"]) -> None:
+    """Install *store* as the shared token store (``None`` restores the default)."""
+    global _custom_store
+    _custom_store = store
+
+
+def _open_token_store() -> Optional["TokenStore"]:
+    import sqlite3
+
+    from .token_store import NullTokenStore, RedisTokenStore, SqliteTokenStore
+
+    if TOKEN_STORE_URL:
+        try:
+            return RedisTokenStore.from_url(TOKEN_STORE_URL)
+        except Exception as exc:
+            logger.warning("Token store %s unavailable: %s", type(exc).__name__, exc)
+            return NullTokenStore()
+    if SHARED_CACHE_PATH:
+        try:
+            return SqliteTokenStore(SHARED_CACHE_PATH)
+        except (OSError, sqlite3.Error) as exc:
+            logger.warning("Shared token cache unavailable: %s", exc)
+            return NullTokenStore()
+    return None
+
+
+def _get_shared_store() -> Optional["TokenStore"]:
+    """Open the configured store on first use, or return ``None`` when disabled."""
+    global _shared_store, _shared_store_config
+    if _custom_store is not None:
+        return _custom_store
+    config = (TOKEN_STORE_URL, SHARED_CACHE_PATH)
+    if not any(config):
+        return None
+    with _shared_store_lock:
+        if _shared_store is None or _shared_store_config != config:
+            _shared_store = _open_token_store()
+            _shared_store_config = config
+        return _shared_store
+
+
+def _load_shared(store: "TokenStore", credentials: Credentials) -> Optional[Grant]:
+    """Return the shared grant for *credentials* with its remaining lifetime.
+
+    A grant within ``TOKEN_CACHE_MARGIN`` of expiry is a miss, so it is
+    replaced rather than handed to a job it may expire under.
+    """
+    payload = store.get(credentials)
+    if payload is None:
+        return None
+    expires_in = payload["expires_at"] - time.time()
+    if expires_in <= TOKEN_CACHE_MARGIN:
+        return None
+    return Grant(
+        payload["access_token"],
+        expires_in,
+        payload.get("refresh_token"),
+        payload.get("token_url"),
+    )
+
+
+def _publish_shared(credentials: Credentials, grant: Grant) -> None:
+    """Write *grant* to the shared store, if one is configured."""
+    store = _get_shared_store()
+    if store is None or not grant.expires_in:
+        return
+    store.put(
+        credentials,
+        {
+            "access_token": grant.access_token,
+            "expires_at": time.time() + float(grant.expires_in),
+            "refresh_token": grant.refresh_token,
+            "token_url": grant.token_url,
+        },
+    )
+
+
+def _fetch_grant_shared(credentials: Credentials) -> Grant:
+    """Return a grant from the shared store, granting under its node-wide lock.
+
+    Falls back to a plain ``_fetch_grant`` when no shared store is configured.
+    Waiting for the lock stops at the call deadline with ``DeadlineExceeded``.
+    """
+    store = _get_shared_store()
+    if store is None:
+        return _fetch_grant(*credentials)
+    grant = _load_shared(store, credentials)
+    if grant is not None:
+        return grant
+    with store.lock(credentials, _remaining()) as locked:
+        if not locked:
+            _remaining()  # raises if the deadline is what cut the wait short
+        # Another worker may have granted while we waited for the lock.
+        grant = _load_shared(store, credentials)
+        if grant is not None:
+            return grant
+        grant = _fetch_grant(*credentials)
+        _publish_shared(credentials, grant)
+        return grant
+
+
+def _acquire_token(
+    key: CacheKey,
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str] = None,
+) -> str:
+    """Return a token for *key* from the cache, or via a coalesced grant."""
+
+    def grant() -> str:
+        # Another flight may have filled the cache since our last look.  The
+        # miss was already counted, so re-check without the metrics.
+        cached = _token_cache._lookup(key)
+        if cached is not None:
+            return cached
+        credentials = (base_url, username, password, domain)
+        try:
+            fetched = _fetch_grant_shared(credentials)
+        except Exception as exc:
+            if _is_auth_error(exc):
+                _auth_errors.put(key, exc)
+            raise
+        _token_cache.put(key, fetched.access_token, fetched.expires_in)
+        _token_refresher.schedule(key, fetched, credentials)
+        return fetched.access_token
+
+    cached = _token_cache.get(key)
+    if cached is not None:
+        _token_refresher.touch(key)
+        return cached
+    error = _auth_errors.get(key)
+    if error is not None:
+        raise error
+    return _token_flight.do(key, grant)
+
+
+# ── Token broker ──────────────────────────────────────────────────────────
+#
+# Opt-in: when a broker (``tss-token-broker``) serves this host, tokens are
+# resolved through its Unix socket so every AWX process shares one cache,
+# refresh schedule and connection pool.  If the broker cannot be reached the
+# plugin resolves directly.
+#
+# TSS_BROKER_SOCKET  path of the broker's Unix socket; unset disables it
+BROKER_SOCKET = os.environ.get("TSS_BROKER_SOCKET", "")
+
+_broker_client: Optional["BrokerClient"] = None
+
+
+def _get_broker() -> Optional["BrokerClient"]:
+    """Return the broker client, or ``None`` when no broker is configured."""
+    global _broker_client
+    if not BROKER_SOCKET:
+        return None
+    if _broker_client is None or _broker_client.path != BROKER_SOCKET:
+        from .broker import BrokerClient
+
+        _broker_client = BrokerClient(BROKER_SOCKET)
+    return _broker_client
+
+
+def _from_broker(request: Callable[["BrokerClient", Optional[float]], str]) -> Optional[str]:
+    """Return ``request(broker, timeout)``, or ``None`` to resolve in this process.
+
+    The broker is given what is left of the call deadline.  Running out of
+    it raises ``DeadlineExceeded`` rather than falling back to a direct grant.
+    """
+    broker = _get_broker()
+    if broker is None:
+        return None
+    from .broker import BrokerTimeout, BrokerUnavailable
+
+    remaining = _remaining()
+    try:
+        return request(broker, remaining)
+    except BrokerUnavailable as exc:
+        deadline_spent = remaining is not None and remaining < broker.timeout
+        if isinstance(exc, BrokerTimeout) and deadline_spent:
+            raise DeadlineExceeded("Token broker did not answer within the call deadline")
+        logger.debug("Token broker unavailable (%s); resolving directly", exc)
+    return None
+
+
+def _resolve_token(
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str] = None,
+) -> str:
+    """Return a token through the broker if configured, else from this process."""
+    token = _from_broker(
+        lambda broker, timeout: broker.token(base_url, username, password, domain, timeout)
+    )
+    if token is not None:
+        return token
+    key = _cache_key(base_url, username, password, domain)
+    return _acquire_token(key, base_url, username, password, domain)
+
+
+def _renew_token(credentials: Credentials, rejected: str) -> str:
+    """Replace *rejected* (revoked, or lost in a server restart) with a new grant.
+
+    The new grant bypasses the caches and overwrites the shared store's
+    entry.  With a broker, this runs in the broker process.
+    """
+    key = _cache_key(*credentials)
+    _token_cache.discard(key, rejected)
+
+    def grant() -> str:
+        cached = _token_cache._lookup(key)
+        if cached is not None and cached != rejected:
+            return cached
+        fetched = _fetch_grant(*credentials)
+        _publish_shared(credentials, fetched)
+        _token_cache.put(key, fetched.access_token, fetched.expires_in)
+        _token_refresher.schedule(key, fetched, credentials)
+        return fetched.access_token
+
+    return _token_flight.do((key, rejected), grant)
+
+
+def _with_token(credentials: Credentials, fn: Callable[[str], T]) -> T:
+    """Call ``fn(token)``, renewing the token once if the API rejects it."""
+    token = _resolve_token(*credentials)
+    try:
+        return fn(token)
+    except Exception as exc:
+        if not _is_token_rejected(exc):
+            raise
+        logger.info("Secret Server rejected a cached token; granting a new one")
+    renewed = _from_broker(
+        lambda broker, timeout: broker.renew(token, *credentials, timeout=timeout)
+    )
+    return fn(renewed if renewed is not None else _renew_token(credentials, token))
+
+
+# ── Secret fields ─────────────────────────────────────────────────────────
+#
+# identifier="secret" returns one field of a secret.  When several target
+# fields of a launch link to the same secret, the secret is fetched once:
+# concurrent lookups share one request and later ones hit a short-lived
+# cache of the secret's fields.  Entries are keyed by identity as well as
+# secret ID, so an identity never reads a secret through another's fetch.
+#
+# TSS_SECRET_CACHE_TTL   seconds a fetched secret is served from memory; 0
+#                        fetches on every lookup
+# TSS_SECRET_CACHE_SIZE  max secrets kept (LRU)
+SECRET_CACHE_TTL = _env_float("TSS_SECRET_CACHE_TTL", 30.0)
+SECRET_CACHE_SIZE = _env_int("TSS_SECRET_CACHE_SIZE", 128)
+
+SecretKey = Tuple[CacheKey, str]
+SecretFields = Dict[str, str]
+
+
+class SecretCache:
+    """Thread-safe LRU cache of secret fields with a fixed time-to-live."""
+
+    def __init__(self, max_size: int = SECRET_CACHE_SIZE, ttl: float = SECRET_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "collections.OrderedDict[SecretKey, Tuple[SecretFields, float]]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: SecretKey) -> Optional[SecretFields]:
+        """Return the cached fields for *key*, or ``None`` if absent or expired."""
+        fields = self._lookup(key)
+        if _metrics is not None:
+            _metrics.cache.inc("secret", "miss" if fields is None else "hit")
+        return fields
+
+    def _lookup(self, key: SecretKey) -> Optional[SecretFields]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            fields, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return fields
+
+    def put(self, key: SecretKey, fields: SecretFields) -> None:
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (fields, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                if _metrics is not None:
+                    _metrics.evictions.inc("secret")
+
+    def clear(self) -> None:
+        """Drop every cached secret."""
+        with self._lock:
+            self._entries.clear()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_secret_cache = SecretCache()
+_secret_flight = SingleFlight()
+_vault_urls: Dict[str, str] = {}
+
+
+def _get_json(url: str, token: str, params: Optional[Dict[str, str]] = None) -> Any:
+    """GET *url* with a bearer token over the pool, with the SDK's error handling."""
+    _load_sdk()
+    with span("api_request", url=url) as attributes:
+        response = (
+            _get_http_pool()
+            .session(url)
+            .get(
+                url,
+                params=params,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=_http_timeout(),
+            )
+        )
+        attributes["http.status_code"] = response.status_code
+    try:
+        return json.loads(SecretServer.process(response).content)
+    except SecretServerClientError as exc:
+        exc.status_code = response.status_code  # the SDK drops the response
+        raise
+    except json.JSONDecodeError:
+        raise SecretServerError(response)
+
+
+def _api_url(base_url: str, token: str) -> str:
+    """Return the REST API root, resolving the default vault on Platform."""
+    base = base_url.rstrip("/")
+    if _server_types.get(base) != "platform":
+        return base + "/api/v1"
+    vault = _vault_urls.get(base)
+    if vault is None:
+        vaults = _get_json(base + "/vaultbroker/api/vaults", token).get("vaults", [])
+        for candidate in vaults:
+            url = candidate.get("connection", {}).get("url")
+            if candidate.get("isDefault") and candidate.get("isActive") and url:
+                vault = _vault_urls[base] = url.rstrip("/")
+                break
+        else:
+            raise SecretServerError("No configured default and active vault found.")
+    return vault + "/api/v1"
+
+
+def _api_get(
+    base_url: str, token: str, endpoint: str, params: Optional[Dict[str, str]] = None
+) -> Any:
+    """GET *endpoint* of the REST API, failing over between listed nodes."""
+
+    def get(node: str) -> Any:
+        return _circuits.call(
+            node,
+            lambda: _get_json(_api_url(node, token) + endpoint, token, params),
+            _should_failover,
+        )
+
+    endpoints = split_endpoints(base_url)
+    if len(endpoints) == 1:
+        return get(endpoints[0])
+    return _endpoint_health.call(endpoints, get, _should_failover)
+
+
+def _fetch_secret(base_url: str, token: str, secret_id: str) -> SecretFields:
+    """Fetch secret *secret_id* and index its field values by slug and name."""
+    secret = _api_get(base_url, token, f"/secrets/{secret_id}")
+    fields: SecretFields = {}
+    for item in secret.get("items", []):
+        value = item.get("itemValue")
+        value = "" if value is None else str(value)
+        for name in (item.get("fieldName"), item.get("slug")):
+            if name:
+                fields[name.lower()] = value
+    return fields
+
+
+def _secret_field(
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str],
+    secret_id: str,
+    secret_field: str,
+) -> str:
+    """Return *secret_field* of *secret_id*, fetching the secret at most once."""
+    secret_id = str(secret_id).strip()
+    if not (secret_id.isascii() and secret_id.isdigit()):
+        raise ValueError(f"'secret_id' must be a numeric secret ID, got '{secret_id}'.")
+    credentials = (base_url, username, password, domain)
+    key = (_cache_key(*credentials), secret_id)
+
+    def fetch() -> SecretFields:
+        cached = _secret_cache._lookup(key)  # the miss was already counted
+        if cached is not None:
+            return cached
+        fetched = _with_token(credentials, lambda token: _fetch_secret(base_url, token, secret_id))
+        _secret_cache.put(key, fetched)
+        return fetched
+
+    fields = _secret_cache.get(key)
+    if fields is None:
+        fields = _secret_flight.do(key, fetch)
+    value = fields.get(secret_field.lower())
+    if value is None:
+        raise ValueError(f"Secret {secret_id} has no field '{secret_field}'.")
+    return value
+
+
+# ── Secret path index ─────────────────────────────────────────────────────
+#
+# secret_path links a field by folder path and name instead of secret ID.
+# Opt-in: each identity gets a SecretIndex built once from the search API
+# and synced incrementally, so lookups are a dictionary read.  Without it
+# every lookup costs a search.
+#
+# TSS_SECRET_INDEX_SYNC  seconds between incremental index syncs; 0 disables
+#                        the index and searches on every lookup
+# TSS_SECRET_INDEX_SIZE  max identities with an index (LRU); each index keeps
+#                        its identity's password to sync with
+SECRET_INDEX_SYNC = _env_float("TSS_SECRET_INDEX_SYNC", 0.0)
+SECRET_INDEX_SIZE = _env_int("TSS_SECRET_INDEX_SIZE", 32)
+
+_secret_indexes: Dict[CacheKey, "SecretIndex"] = {}
+_secret_indexes_lock = threading.Lock()
+
+
+def _api_getter(credentials: Credentials) -> "Getter":
+    """Return a ``get(endpoint, params)`` for the REST API as *credentials*."""
+    base_url = credentials[0]
+
+    def get(endpoint: str, params: Dict[str, str]) -> Any:
+        return _with_token(credentials, lambda token: _api_get(base_url, token, endpoint, params))
+
+    return get
+
+
+def _get_secret_index(key: CacheKey, credentials: Credentials) -> Optional["SecretIndex"]:
+    """Return the path index for *key*, or ``None`` when indexing is disabled.
+
+    Indexes are kept LRU, at most ``SECRET_INDEX_SIZE`` of them.  A new
+    password for an identity drops the index built with the old one.
+    """
+    if SECRET_INDEX_SYNC <= 0 or SECRET_INDEX_SIZE <= 0:
+        return None
+    with _secret_indexes_lock:
+        index = _secret_indexes.pop(key, None)
+        if index is None:
+            from .secret_index import SecretIndex
+
+            for stale in [k for k in _secret_indexes if k[:3] == key[:3]]:
+                del _secret_indexes[stale]
+            while len(_secret_indexes) >= SECRET_INDEX_SIZE:
+                del _secret_indexes[next(iter(_secret_indexes))]
+            index = SecretIndex(_api_getter(credentials), SECRET_INDEX_SYNC)
+        _secret_indexes[key] = index  # most recently used last
+        return index
+
+
+def _secret_field_by_path(
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str],
+    secret_path: str,
+    secret_field: str,
+) -> str:
+    """Return *secret_field* of the secret at *secret_path*.
+
+    An indexed ID that no longer resolves (secret deleted or moved since the
+    last sync) is corrected with one direct search.
+    """
+    from .secret_index import find_secret
+
+    _load_sdk()
+    credentials = (base_url, username, password, domain)
+    index = _get_secret_index(_cache_key(base_url, username, password, domain), credentials)
+    if index is None:
+        secret_id = find_secret(_api_getter(credentials), secret_path)
+    else:
+        secret_id = index.lookup(secret_path)
+        if secret_id is None:
+            # Possibly created since the last sync.
+            secret_id = index.relookup(secret_path)
+        else:
+            try:
+                return _secret_field(*credentials, str(secret_id), secret_field)
+            except SecretServerClientError:
+                fresh = index.relookup(secret_path)
+                if fresh is None or fresh == secret_id:
+                    raise
+                secret_id = fresh
+    if secret_id is None:
+        raise ValueError(f"No secret found at '{secret_path}'.")
+    return _secret_field(*credentials, str(secret_id), secret_field)
 
 
 def backend(**kwargs: Any) -> str:
@@ -96,8 +1642,19 @@ def backend(**kwargs: Any) -> str:
     The ``identifier`` kwarg (a dropdown defaulting to "token") selects
     which value to return:
 
-    - ``token``    → OAuth2 access token (authenticates via the SDK)
-    - ``base_url`` → the Secret Server base URL (pass-through)
+    - ``token``    → OAuth2 access token (authenticates via the SDK, served
+      from the in-process token cache while the grant is still valid;
+      concurrent callers for one identity share a single grant, and the
+      opt-in background refresher renews it ahead of expiry; resolved
+      through the local token broker when one is configured)
+    - ``base_url`` → the Secret Server base URL (the first, canonical one
+      when several endpoints are listed)
+    - ``secret``   → the ``secret_field`` value of secret ``secret_id`` (or
+      the secret at ``secret_path``), fetched once per secret for all
+      fields linked in a launch
+
+    The whole call is bounded by ``timeout`` seconds (default
+    ``TSS_CALL_DEADLINE``); ``DeadlineExceeded`` is raised past it.
 
     Returns
     -------
@@ -110,15 +1667,334 @@ def backend(**kwargs: Any) -> str:
     domain: Optional[str] = kwargs.get("domain")
     identifier: str = kwargs.get("identifier", "token")
 
+    def resolve() -> str:
+        return _resolve_within_deadline(identifier, base_url, username, password, domain, kwargs)
+
+    if tracing.enabled():
+        resolve = _traced(resolve, identifier, base_url, username, domain)
+    if _profiler is not None:
+        resolve = functools.partial(_profiler.run, resolve)
+    if _metrics is not None:
+        return _metrics.track_call(identifier, canonical_url(base_url).rstrip("/"), resolve)
+    return resolve()
+
+
+def _traced(
+    resolve: Callable[[], str],
+    identifier: str,
+    base_url: str,
+    username: str,
+    domain: Optional[str],
+) -> Callable[[], str]:
+    """Wrap *resolve* in the ``backend`` span; the identity is only hashed."""
+    canonical = canonical_url(base_url)
+
+    def traced() -> str:
+        with span(
+            "backend",
+            identifier=identifier,
+            base_url=canonical.rstrip("/"),
+            identity=identity_hash(canonical, username, domain),
+        ):
+            return resolve()
+
+    return traced
+
+
+def _resolve_within_deadline(
+    identifier: str,
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str],
+    kwargs: Mapping[str, Any],
+) -> str:
+    seconds = _call_deadline(kwargs)
+    if seconds is None:
+        return _resolve(identifier, base_url, username, password, domain, kwargs)
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    reset = _deadline.set(deadline if outer is None else min(deadline, outer))
+    try:
+        return _resolve(identifier, base_url, username, password, domain, kwargs)
+    finally:
+        _deadline.reset(reset)
+
+
+def _resolve(
+    identifier: str,
+    base_url: str,
+    username: str,
+    password: str,
+    domain: Optional[str],
+    kwargs: Mapping[str, Any],
+) -> str:
     if identifier == "base_url":
-        return base_url
+        return canonical_url(base_url)
 
     if identifier == "token":
-        authorizer = _get_authorizer(base_url, username, password, domain)
-        token: str = authorizer.get_access_token()
-        return token
+        return _resolve_token(base_url, username, password, domain)
+
+    if identifier == "secret":
+        secret_id = kwargs.get("secret_id")
+        secret_path = kwargs.get("secret_path")
+        secret_field = kwargs.get("secret_field")
+        if secret_field and secret_id:
+            return _secret_field(base_url, username, password, domain, secret_id, secret_field)
+        if secret_field and secret_path:
+            return _secret_field_by_path(
+                base_url, username, password, domain, secret_path, secret_field
+            )
+        raise ValueError(
+            "Output value 'secret' requires 'secret_field' and " "'secret_id' or 'secret_path'."
+        )
+
+    raise ValueError(
+        f"Unknown identifier '{identifier}'. " f"Valid values: 'token', 'base_url', 'secret'."
+    )
+
+
+# ── Async and batched resolution ──────────────────────────────────────────
+#
+# For tooling that pre-resolves many credentials outside AWX.  Both APIs
+# share the token cache, single-flight and connection pool with backend(),
+# whose contract is unchanged.  The SDK is synchronous, so grants run on a
+# bounded worker pool and the event loop only ever awaits them; cache hits
+# are answered without leaving the loop.
+#
+# TSS_RESOLVE_CONCURRENCY  max grants in flight for resolve_many() and
+#                          the abackend() worker pool
+RESOLVE_CONCURRENCY = _env_int("TSS_RESOLVE_CONCURRENCY", 16)
+
+# Outcome of one resolve_many() item: ``value`` on success, else ``error``.
+Resolution = collections.namedtuple("Resolution", ["value", "error"])
+
+_async_executor: Optional["ThreadPoolExecutor"] = None
+_async_executor_lock = threading.Lock()
+
+
+def _get_async_executor() -> "ThreadPoolExecutor":
+    global _async_executor
+    with _async_executor_lock:
+        if _async_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _async_executor = ThreadPoolExecutor(
+                max_workers=max(RESOLVE_CONCURRENCY, 1), thread_name_prefix="tss-resolve"
+            )
+        return _async_executor
+
+
+def _cached_value(kwargs: Mapping[str, Any]) -> Optional[str]:
+    """Answer *kwargs* without I/O when possible (pass-through or cache hit)."""
+    identifier = kwargs.get("identifier", "token")
+    if identifier == "base_url":
+        return canonical_url(kwargs["base_url"])
+    if identifier == "token" and not BROKER_SOCKET:
+        key = _cache_key(
+            kwargs["base_url"], kwargs["username"], kwargs["password"], kwargs.get("domain")
+        )
+        # A miss is counted by the backend() call that follows; count hits here.
+        cached = _token_cache._lookup(key)
+        if cached is not None:
+            if _metrics is not None:
+                _metrics.cache.inc("token", "hit")
+            _token_refresher.touch(key)
+        return cached
+    return None
+
+
+def _request_key(kwargs: Mapping[str, Any]) -> Hashable:
+    """Identity of a resolution request; the password is only kept as a digest."""
+    items = []
+    for name, value in sorted(kwargs.items()):
+        if name == "password":
+            value = hashlib.sha256(str(value).encode("utf-8")).hexdigest()
+        items.append((name, value))
+    return tuple(items)
+
+
+async def abackend(**kwargs: Any) -> str:
+    """Async counterpart of :func:`backend`, with the same arguments and result."""
+    import asyncio
+
+    cached = _cached_value(kwargs)
+    if cached is not None:
+        return cached
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_async_executor(), functools.partial(backend, **kwargs))
+
+
+def resolve_many(
+    requests: Iterable[Mapping[str, Any]],
+    max_concurrency: int = RESOLVE_CONCURRENCY,
+) -> List[Resolution]:
+    """Resolve many ``backend()`` keyword sets concurrently.
+
+    Identical requests are resolved once and at most *max_concurrency*
+    distinct requests run at a time.  Returns one ``Resolution`` per input,
+    in input order; a failing item carries its exception instead of
+    aborting the batch.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    items = [dict(kwargs) for kwargs in requests]
+    keys = [_request_key(kwargs) for kwargs in items]
+    distinct = dict(zip(keys, items))
+    if not distinct:
+        return []
+    with ThreadPoolExecutor(
+        max_workers=max(min(max_concurrency, len(distinct)), 1), thread_name_prefix="tss-resolve"
+    ) as pool:
+        futures = {key: pool.submit(backend, **kwargs) for key, kwargs in distinct.items()}
+    results = []
+    for key in keys:
+        error = futures[key].exception()
+        if error is not None:
+            results.append(Resolution(None, error))
+        else:
+            results.append(Resolution(futures[key].result(), None))
+    return results
+
+
+async def aresolve_many(
+    requests: Iterable[Mapping[str, Any]],
+    max_concurrency: int = RESOLVE_CONCURRENCY,
+) -> List[Resolution]:
+    """Async counterpart of :func:`resolve_many`."""
+    import asyncio
+
+    items = [dict(kwargs) for kwargs in requests]
+    keys = [_request_key(kwargs) for kwargs in items]
+    distinct = dict(zip(keys, items))
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def resolve(kwargs: Dict[str, Any]) -> Resolution:
+        async with semaphore:
+            try:
+                return Resolution(await abackend(**kwargs), None)
+            except Exception as exc:
+                return Resolution(None, exc)
+
+    outcomes = await asyncio.gather(*(resolve(kwargs) for kwargs in distinct.values()))
+    by_key = dict(zip(distinct, outcomes))
+    return [by_key[key] for key in keys]
+
+
+# ── Pre-warming ───────────────────────────────────────────────────────────
+#
+# After a controller restart the first scheduled jobs all miss the token
+# cache and open new connections at once.  prewarm() authenticates a list
+# of credential inputs ahead of them, through the normal token path, so the
+# grants also land in the shared store or broker when one is configured;
+# ``tss-plugin-prewarm`` (see ``prewarm.py``) runs it from the command line.
+_PREWARM_INPUTS = ("base_url", "username", "password", "domain", "timeout")
+
+
+def prewarm(
+    inputs: Iterable[Mapping[str, Any]],
+    max_concurrency: int = RESOLVE_CONCURRENCY,
+) -> List[Resolution]:
+    """Authenticate credential *inputs* concurrently, ahead of traffic.
+
+    Fills the token cache and connection pool for each input, and opens a
+    pooled connection to the other web nodes of multi-node ``base_url``
+    values so a failover does not pay for a handshake either.  Only the
+    authentication inputs are used.  Returns one ``Resolution`` (the token,
+    or the error) per input, in input order.
+    """
+    requests = [
+        dict({name: item[name] for name in _PREWARM_INPUTS if item.get(name)}, identifier="token")
+        for item in inputs
+    ]
+    results = resolve_many(requests, max_concurrency)
+    standby = sorted(
+        {node for request in requests for node in split_endpoints(request.get("base_url", ""))[1:]}
+    )
+    if standby:
+        from concurrent.futures import ThreadPoolExecutor
+
+        urls = [node.rstrip("/") + "/api/v1/healthcheck" for node in standby]
+        with ThreadPoolExecutor(max_workers=max(min(max_concurrency, len(urls)), 1)) as pool:
+            list(pool.map(_check_health_endpoint, urls))
+    return results
+
+
+# ── Fork safety ───────────────────────────────────────────────────────────
+#
+# AWX's dispatcher forks worker processes.  A child starts with a copy of
+# this module's state as it was in the parent: locks other threads held at
+# that moment, pooled sockets still shared with the parent, and references
+# to refresher and worker threads that do not exist in the child.  At-fork
+# handlers give the child fresh locks and drop what cannot be shared (HTTP
+# sessions, store and broker connections, the resolve worker pool and
+# grants in flight in parent threads).  Unexpired tokens, secrets and
+# indexes carry over, so children do not re-authenticate; the refresher
+# thread restarts the first time a child uses a scheduled token.  Children
+# count metrics from zero and leave the metrics textfile to the parent.
+
+
+def _before_fork() -> None:
+    # Fork with no token cache update half-done, so every token carries over.
+    _token_cache._lock.acquire()
+
+
+def _after_fork_in_parent() -> None:
+    _token_cache._lock.release()
+
+
+def _after_fork_in_child() -> None:
+    global _http_pool, _http_pool_lock, _shared_store, _shared_store_config, _shared_store_lock
+    global _broker_client, _async_executor, _async_executor_lock, _secret_indexes_lock
+    global _metrics, _metrics_writer, _metrics_lock
+
+    for state in (
+        _token_cache,
+        _auth_errors,
+        _token_flight,
+        _token_refresher,
+        _endpoint_health,
+        _circuits,
+        _grant_latency,
+        _grant_limiter,
+        _secret_cache,
+        _secret_flight,
+    ):
+        state._after_fork()
+    for index in _secret_indexes.values():
+        index._after_fork()
+    if _profiler is not None:
+        _profiler._after_fork()
+    transport = sys.modules.get(f"{__package__}.transport")
+    if transport is not None:
+        transport.dns_cache._after_fork()
+        transport.tls_sessions._after_fork()
+
+    # Discarded, not closed: closing would shut down connections the parent uses.
+    _http_pool = None
+    _shared_store = None
+    _shared_store_config = ("", "")
+    _broker_client = None
+    _async_executor = None
+    if _metrics is not None:
+        from .metrics import PluginMetrics
+
+        _metrics = PluginMetrics()
+    _metrics_writer = None
+
+    _http_pool_lock = threading.Lock()
+    _shared_store_lock = threading.Lock()
+    _secret_indexes_lock = threading.Lock()
+    _async_executor_lock = threading.Lock()
+    _metrics_lock = threading.Lock()
+
 
-    raise ValueError(f"Unknown identifier '{identifier}'. " f"Valid values: 'token', 'base_url'.")
+if hasattr(os, "register_at_fork"):  # POSIX only
+    os.register_at_fork(
+        before=_before_fork,
+        after_in_parent=_after_fork_in_parent,
+        after_in_child=_after_fork_in_child,
+    )
 
 
 # ── AWX Credential Plugin Definition ──────────────────────────────────────
@@ -0,0 +1,352 @@
+"""
+Multi-endpoint selection and failover for Secret Server web nodes.
+
+The ``base_url`` field may list several web nodes of one Secret Server
+(comma-, space- or newline-separated).  The first entry is the canonical URL:
+it is what ``identifier="base_url"`` returns and what identifies the
+instance in cache keys.  Nodes share one database, so a token granted by one
+node is valid on all of them.
+
+``EndpointHealth`` keeps, per endpoint, an exponentially weighted moving
+average (EWMA) of request latency and of the error rate, and orders the
+endpoints of a call healthiest first:
+
+- score = latency EWMA / (1 - error-rate EWMA), lower is better,
+- an endpoint without samples scores like the best measured one, so listed
+  order decides until measurements say otherwise,
+- the error rate decays with ``error_half_life`` while an endpoint is not
+  used, so a node that failed is retried once it has had time to recover.
+
+``call()`` runs a request against each endpoint in that order until one
+succeeds, failing over within the same call.
+
+``CircuitBreaker`` stops sending requests to an endpoint after repeated
+failures: while its circuit is open, calls fail at once with
+``CircuitOpen``; after ``reset_timeout`` one half-open probe is let through,
+and its outcome closes or re-opens the circuit.
+
+Tail latency is cut with hedging: ``LatencyWindow`` keeps recent request
+latencies, and ``hedge()`` starts a backup request when the primary has
+not answered after a given delay (e.g. the observed p95), returning
+whichever succeeds first.
+"""
+
+import collections
+import contextvars
+import math
+import queue
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+
+EWMA_ALPHA = 0.3
+ERROR_HALF_LIFE = 30.0
+WINDOW_SIZE = 200
+CIRCUIT_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30.0
+
+_SEPARATORS = re.compile(r"[\s,]+")
+
+
+def split_endpoints(base_url: Union[str, Sequence[str]]) -> List[str]:
+    """Return the distinct endpoints listed in *base_url*, in order."""
+    items = _SEPARATORS.split(base_url) if isinstance(base_url, str) else list(base_url)
+    return list(dict.fromkeys(item.strip() for item in items if item.strip())) or [""]
+
+
+def canonical_url(base_url: Union[str, Sequence[str]]) -> str:
+    """Return the first (canonical) endpoint of *base_url*."""
+    return split_endpoints(base_url)[0]
+
+
+class _Stats:
+    __slots__ = ("latency", "error_rate", "updated")
+
+    def __init__(self) -> None:
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.updated = time.monotonic()
+
+
+class EndpointHealth:
+    """Thread-safe latency / error-rate tracking and ordering of endpoints."""
+
+    def __init__(self, alpha: float = EWMA_ALPHA, error_half_life: float = ERROR_HALF_LIFE):
+        self.alpha = alpha
+        self.error_half_life = error_half_life
+        self._stats: Dict[str, _Stats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float, error: bool) -> None:
+        """Fold one request's outcome into *endpoint*'s moving averages."""
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, _Stats())
+            now = time.monotonic()
+            error_rate = self._decayed(stats, now)
+            stats.error_rate = error_rate + self.alpha * (float(error) - error_rate)
+            if not error:
+                stats.latency = (
+                    latency
+                    if stats.latency is None
+                    else stats.latency + self.alpha * (latency - stats.latency)
+                )
+            stats.updated = now
+
+    def order(self, endpoints: Sequence[str]) -> List[str]:
+        """Return *endpoints* healthiest first; ties keep their listed order."""
+        if len(endpoints) < 2:
+            return list(endpoints)
+        now = time.monotonic()
+        with self._lock:
+            measured = {}
+            for endpoint in endpoints:
+                stats = self._stats.get(endpoint)
+                if stats is not None:
+                    measured[endpoint] = (stats.latency, self._decayed(stats, now))
+        known = [latency for latency, _ in measured.values() if latency is not None]
+        baseline = min(known) if known else 0.0
+
+        def score(endpoint: str) -> float:
+            latency, error_rate = measured.get(endpoint, (None, 0.0))
+            latency = baseline if latency is None else latency
+            return latency / max(1.0 - error_rate, 1e-3) + error_rate
+
+        return sorted(endpoints, key=score)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current latency and error-rate averages per endpoint."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                endpoint: {"latency": s.latency, "error_rate": self._decayed(s, now)}
+                for endpoint, s in self._stats.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        endpoints: Sequence[str],
+        fn: Callable[[str], T],
+        should_failover: Callable[[BaseException], bool],
+        reorder: bool = True,
+    ) -> T:
+        """Run ``fn(endpoint)`` on each endpoint, healthiest first, until one succeeds.
+
+        Errors for which *should_failover* is false (e.g. rejected
+        credentials) are raised at once and do not count against the
+        endpoint; otherwise the last endpoint's error is raised.  With
+        ``reorder=False`` the endpoints are tried in the given order.
+        """
+        last_error: Optional[BaseException] = None
+        for endpoint in self.order(endpoints) if reorder else endpoints:
+            started = time.monotonic()
+            try:
+                result = fn(endpoint)
+            except Exception as exc:
+                failover = should_failover(exc)
+                self.record(endpoint, time.monotonic() - started, error=failover)
+                if not failover:
+                    raise
+                last_error = exc
+                continue
+            self.record(endpoint, time.monotonic() - started, error=False)
+            return result
+        assert last_error is not None
+        raise last_error
+
+    def _decayed(self, stats: _Stats, now: float) -> float:
+        if self.error_half_life <= 0:
+            return stats.error_rate
+        return stats.error_rate * math.pow(0.5, (now - stats.updated) / self.error_half_life)
+
+
+class CircuitOpen(ConnectionError):
+    """The endpoint's circuit is open: the call was not attempted."""
+
+
+class _Circuit:
+    __slots__ = ("failures", "opened_at", "probing")
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+
+class CircuitBreaker:
+    """Thread-safe per-endpoint circuit breaker with half-open probes.
+
+    A circuit opens after *threshold* consecutive failures; a threshold of
+    0 disables the breaker.
+    """
+
+    def __init__(
+        self, threshold: int = CIRCUIT_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT
+    ):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._circuits: Dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        endpoint: str,
+        fn: Callable[[], T],
+        is_failure: Callable[[BaseException], bool],
+    ) -> T:
+        """Run *fn* unless *endpoint*'s circuit is open.
+
+        Errors for which *is_failure* is false (e.g. rejected credentials)
+        show the endpoint answering, and neither open nor close the circuit.
+        """
+        if self.threshold <= 0:
+            return fn()
+        self._allow(endpoint)
+        try:
+            result = fn()
+        except Exception as exc:
+            if is_failure(exc):
+                self._failure(endpoint)
+            else:
+                self._release(endpoint)
+            raise
+        except BaseException:
+            self._release(endpoint)
+            raise
+        self._success(endpoint)
+        return result
+
+    def state(self, endpoint: str) -> str:
+        """``"closed"``, ``"open"`` or ``"half-open"`` (due for a probe)."""
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit.opened_at is None:
+                return "closed"
+            if circuit.probing or time.monotonic() - circuit.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._circuits.clear()
+
+    def _after_fork(self) -> None:
+        """Reset the lock in a forked child; probes in flight belong to the parent."""
+        self._lock = threading.Lock()
+        for circuit in self._circuits.values():
+            circuit.probing = False
+
+    def _allow(self, endpoint: str) -> None:
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, _Circuit())
+            if circuit.opened_at is None:
+                return
+            waited = time.monotonic() - circuit.opened_at
+            if circuit.probing or waited < self.reset_timeout:
+                raise CircuitOpen(f"Circuit open for {endpoint or 'endpoint'}")
+            circuit.probing = True
+
+    def _success(self, endpoint: str) -> None:
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, _Circuit())
+            circuit.failures = 0
+            circuit.opened_at = None
+            circuit.probing = False
+
+    def _failure(self, endpoint: str) -> None:
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, _Circuit())
+            circuit.failures += 1
+            if circuit.probing or circuit.failures >= self.threshold:
+                circuit.opened_at = time.monotonic()
+            circuit.probing = False
+
+    def _release(self, endpoint: str) -> None:
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is not None:
+                circuit.probing = False
+
+
+class LatencyWindow:
+    """Thread-safe window of the most recent latencies, for percentiles."""
+
+    def __init__(self, size: int = WINDOW_SIZE):
+        self._samples: "collections.deque[float]" = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """Return the *q*-th percentile, or ``None`` with fewer than *min_samples*."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(q / 100.0 * len(samples))) - 1))
+        return samples[index]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+def _start(fn: Callable[[], Any], results: "queue.Queue[Tuple[bool, Any]]") -> None:
+    def run() -> None:
+        try:
+            results.put((True, fn()))
+        except BaseException as exc:
+            results.put((False, exc))
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), name="tss-hedge", daemon=True).start()
+
+
+def hedge(
+    primary: Callable[[], T],
+    backup: Callable[[], T],
+    delay: float,
+    admit: Optional[Callable[[], bool]] = None,
+) -> T:
+    """Run *primary*; if it has not finished after *delay* seconds, also run *backup*.
+
+    Returns the first successful result.  If the primary fails before the
+    delay its error is raised without hedging; once hedged, an error is
+    raised only if both attempts fail.  The losing attempt is left to
+    finish in the background.  When *admit* is given, it is asked at the
+    delay whether the backup may be sent; if not, the primary is awaited.
+    """
+    results: "queue.Queue[Tuple[bool, Any]]" = queue.Queue()
+    _start(primary, results)
+    try:
+        ok, value = results.get(timeout=max(delay, 0.0))
+    except queue.Empty:
+        if admit is not None and not admit():
+            ok, value = results.get()
+        else:
+            _start(backup, results)
+            ok, value = results.get()
+            if not ok:
+                ok, value = results.get()
+    if not ok:
+        raise value
+    result: T = value
+    return result
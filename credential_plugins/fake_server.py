@@ -0,0 +1,327 @@
+"""
+Local stand-in for Secret Server, for benchmarks, load tests and demos.
+
+``FakeSecretServer`` serves the endpoints the plugin uses under a path
+prefix (``/SecretServer`` by default):
+
+- ``GET  /api/v1/healthcheck`` — server detection,
+- ``POST /oauth2/token`` — password and refresh-token grants,
+- ``GET  /api/v1/secrets/<id>`` — a secret's fields (bearer token required),
+- ``GET  /api/v1/secrets`` and ``/api/v1/folders[/<id>]`` — paged searches.
+
+Behaviour is configurable per instance (and can be changed while running):
+``latency`` seconds added to every request (plus up to ``jitter`` more),
+an ``error_rate`` fraction of 503s and a ``throttle_rate`` fraction of 429s
+with ``retry_after`` on token and API requests (health checks always
+succeed), and the ``token_lifetime`` of issued tokens.
+``stats()`` counts requests per route and accepted connections.
+
+Run it standalone with::
+
+    python -m credential_plugins.fake_server --port 8443 --latency 0.05
+
+Any username / password pair is accepted unless ``users`` is given.  It is
+plain HTTP on the loopback interface by default and is not meant to be
+exposed.
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_PREFIX = "/SecretServer"
+DEFAULT_SECRETS: Dict[int, Dict[str, Any]] = {
+    1: {
+        "name": "db-admin",
+        "folderId": 1,
+        "items": {"username": "dbadmin", "password": "hunter2"},
+    },
+}
+DEFAULT_FOLDERS: Dict[int, str] = {1: "\\Servers"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeSecretServer"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid Nagle / delayed-ACK stalls.
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.count("connections")
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _dispatch(self, method: str) -> None:
+        server = self.server
+        url = urlsplit(self.path)
+        path = url.path
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if not path.startswith(server.prefix):
+            self._reply(404, {"message": "Not found"})
+            return
+        route = path[len(server.prefix) :].rstrip("/")  # noqa: E203
+        server.count(f"{method} {_route_name(route)}")
+        server.delay()
+        status = server.injected_status() if route != "/api/v1/healthcheck" else None
+        if status == 429:
+            self._reply(429, {"message": "Too many requests"}, retry_after=server.retry_after)
+            return
+        if status == 503:
+            self._reply(503, {"message": "Service unavailable"})
+            return
+        if method == "GET" and route == "/api/v1/healthcheck":
+            self._reply(200, {"Healthy": True})
+        elif method == "POST" and route == "/oauth2/token":
+            self._reply(*server.grant(parse_qs(body.decode("utf-8"))))
+        elif method == "GET" and route.startswith("/api/v1/"):
+            token = self.headers.get("Authorization", "")[len("Bearer ") :]  # noqa: E203
+            if not server.token_valid(token):
+                self._reply(401, {"message": "Authentication failed or expired token"})
+                return
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self._reply(*server.api(route[len("/api/v1") :], query))  # noqa: E203
+        else:
+            self._reply(404, {"message": "Not found"})
+
+    def _reply(self, status: int, payload: Any, retry_after: Optional[float] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if retry_after is not None:
+            self.send_header("Retry-After", str(int(retry_after)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _route_name(route: str) -> str:
+    """Collapse IDs so stats group by endpoint (``/api/v1/secrets/{id}``)."""
+    parts = ["{id}" if part.isdigit() else part for part in route.split("/")]
+    return "/".join(parts)
+
+
+class FakeSecretServer(ThreadingHTTPServer):
+    """Threaded fake Secret Server; use as a context manager or call ``start()``."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        prefix: str = DEFAULT_PREFIX,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        token_lifetime: int = 1200,
+        users: Optional[Dict[str, str]] = None,
+        secrets: Optional[Dict[int, Dict[str, Any]]] = None,
+        folders: Optional[Dict[int, str]] = None,
+    ):
+        super().__init__((host, port), _Handler)
+        self.prefix = prefix.rstrip("/")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.token_lifetime = token_lifetime
+        self.users = users
+        self.secrets = dict(DEFAULT_SECRETS if secrets is None else secrets)
+        self.folders = dict(DEFAULT_FOLDERS if folders is None else folders)
+        self._tokens: Dict[str, float] = {}
+        self._counts: "collections.Counter[str]" = collections.Counter()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as the plugin's ``base_url``."""
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode("ascii")
+        return f"http://{host}:{port}{self.prefix}"
+
+    def start(self) -> "FakeSecretServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, args=(0.05,), name="tss-fake-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self) -> "FakeSecretServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    # ── Bookkeeping ─────────────────────────────────────────────────────
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Requests per ``"<METHOD> <route>"`` plus ``connections``."""
+        with self._lock:
+            return dict(self._counts)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def delay(self) -> None:
+        seconds = self.latency + (random.uniform(0.0, self.jitter) if self.jitter else 0.0)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def injected_status(self) -> Optional[int]:
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    # ── Endpoints ───────────────────────────────────────────────────────
+
+    def grant(self, form: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        grant_type = (form.get("grant_type") or [""])[0]
+        if grant_type == "password":
+            username = (form.get("username") or [""])[0]
+            password = (form.get("password") or [""])[0]
+            if self.users is not None and self.users.get(username) != password:
+                return 400, {"error": "invalid_grant"}
+        elif grant_type == "refresh_token":
+            if (form.get("refresh_token") or [""])[0] not in self._tokens:
+                return 400, {"error": "invalid_grant"}
+        else:
+            return 400, {"error": "unsupported_grant_type"}
+        token = os.urandom(16).hex()
+        with self._lock:
+            self._tokens[token] = time.monotonic() + self.token_lifetime
+        return 200, {
+            "access_token": token,
+            "token_type": "bearer",
+            "expires_in": self.token_lifetime,
+            "refresh_token": token,
+        }
+
+    def revoke_tokens(self) -> None:
+        """Invalidate every issued token, as a restart of Secret Server would."""
+        with self._lock:
+            self._tokens.clear()
+
+    def token_valid(self, token: str) -> bool:
+        with self._lock:
+            expires_at = self._tokens.get(token)
+        return expires_at is not None and time.monotonic() < expires_at
+
+    def api(self, endpoint: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        parts = endpoint.strip("/").split("/")
+        if parts[0] == "secrets" and len(parts) == 2 and parts[1].isdigit():
+            secret = self.secrets.get(int(parts[1]))
+            if secret is None:
+                return 404, {"message": "Secret not found"}
+            return 200, self._secret_json(int(parts[1]), secret)
+        if parts == ["secrets"]:
+            text = query.get("filter.searchText", "").lower()
+            records = [
+                {"id": secret_id, "name": secret["name"], "folderId": secret.get("folderId")}
+                for secret_id, secret in sorted(self.secrets.items())
+                if not text or text in secret["name"].lower()
+            ]
+            return 200, self._page(records, query)
+        if parts[0] == "folders" and len(parts) == 2 and parts[1].isdigit():
+            folder_path = self.folders.get(int(parts[1]))
+            if folder_path is None:
+                return 404, {"message": "Folder not found"}
+            return 200, {"id": int(parts[1]), "folderPath": folder_path}
+        if parts == ["folders"]:
+            records = [
+                {"id": folder_id, "folderPath": path}
+                for folder_id, path in sorted(self.folders.items())
+            ]
+            return 200, self._page(records, query)
+        return 404, {"message": "Not found"}
+
+    @staticmethod
+    def _secret_json(secret_id: int, secret: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": secret_id,
+            "name": secret["name"],
+            "folderId": secret.get("folderId"),
+            "items": [
+                {"fieldName": name.title(), "slug": name, "itemValue": value}
+                for name, value in secret.get("items", {}).items()
+            ],
+        }
+
+    @staticmethod
+    def _page(records: List[Dict[str, Any]], query: Dict[str, str]) -> Dict[str, Any]:
+        skip = int(query.get("skip", 0))
+        end = skip + int(query.get("take", 500))
+        return {"records": records[skip:end], "hasNext": end < len(records)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a local fake Secret Server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503s")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429s")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--token-lifetime", type=int, default=1200)
+    args = parser.parse_args(argv)
+
+    server = FakeSecretServer(
+        args.host,
+        args.port,
+        prefix=args.prefix,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        token_lifetime=args.token_lifetime,
+    )
+    print(f"Fake Secret Server listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,416 @@
+"""
+Replay job-launch bursts through ``backend()`` for capacity planning.
+
+Each launch resolves the credential fields linked to one job, one after
+another as AWX does.  For example, ``token`` and ``base_url`` resolve for a
+job whose credential links both.  Launches come from a trace file or a
+synthetic profile, and are spread over worker processes with a thread pool
+each:
+
+    tss-plugin-loadtest --fake --launches 500 --rate 50 --threads 8 --processes 4
+    tss-plugin-loadtest --url https://tss.example.com/SecretServer \\
+        --username svc-awx --trace launches.jsonl --output report.json
+
+A trace is JSON lines, one launch per line: ``{"at": 0.25, "fields":
+["token", "base_url"], "account": 1}``.  ``at`` is the offset from the start
+of the run, in seconds.  ``fields`` defaults to the ``--mix`` and
+``account`` to 0.  The replay is open-loop: a launch starts at its offset
+even when earlier launches are still running.
+
+``--fake`` runs against a local ``fake_server.FakeSecretServer``.  With
+``--url``, the password is read from ``$TSS_PASSWORD`` (see
+``--password-env``).  Account *n* > 0 resolves as ``<username>-<n>``.
+
+The JSON report has throughput, latency percentiles per resolution and per
+launch, outbound requests per resolution by kind (grant, API, health check),
+new connections, and errors by exception type.  Launch latency counts from
+the scheduled start, so it includes time spent queued behind busy threads.
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import tracing
+
+FIELDS = ("token", "base_url", "secret")
+
+# Spans that are one outbound HTTP request each, and the report key for them.
+_REQUEST_SPANS = {"grant": "grant", "api_request": "api", "health_check": "health_check"}
+
+# One job launch: its offset in seconds, the fields it resolves, its account.
+Launch = collections.namedtuple("Launch", ["at", "fields", "account"])
+
+# Where and as whom launches resolve.
+Target = collections.namedtuple(
+    "Target", ["base_url", "username", "password", "domain", "secret_id", "secret_field"]
+)
+
+Mix = List[Tuple[Tuple[str, ...], float]]
+
+
+def parse_mix(values: Sequence[str]) -> Mix:
+    """Parse ``--mix`` values like ``token+base_url:3`` into weighted field sets."""
+    mix: Mix = []
+    for value in values:
+        fields_text, _, weight_text = value.partition(":")
+        fields = tuple(field.strip() for field in fields_text.split("+") if field.strip())
+        unknown = [field for field in fields if field not in FIELDS]
+        if not fields or unknown:
+            raise ValueError(f"Invalid mix '{value}'. Fields are {', '.join(FIELDS)}.")
+        try:
+            weight = float(weight_text) if weight_text else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid mix weight in '{value}'.") from None
+        mix.append((fields, weight))
+    return mix
+
+
+def synthetic_profile(
+    launches: int, rate: float, mix: Mix, accounts: int = 1, seed: int = 0
+) -> List[Launch]:
+    """*launches* launches at *rate* per second (``0``: all at once).
+
+    Field sets are drawn from *mix* by weight; accounts are assigned in turn.
+    """
+    rng = random.Random(seed)
+    field_sets = [fields for fields, _ in mix]
+    weights = [weight for _, weight in mix]
+    return [
+        Launch(
+            index / rate if rate > 0 else 0.0,
+            rng.choices(field_sets, weights)[0],
+            index % max(accounts, 1),
+        )
+        for index in range(launches)
+    ]
+
+
+def read_trace(path: str, mix: Mix) -> List[Launch]:
+    """Read a JSON-lines launch trace; launches without ``fields`` draw from *mix*."""
+    rng = random.Random(0)
+    field_sets = [fields for fields, _ in mix]
+    weights = [weight for _, weight in mix]
+    launches = []
+    with open(path, encoding="utf-8") as handle:
+        for number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                fields = tuple(entry.get("fields") or rng.choices(field_sets, weights)[0])
+                launch = Launch(float(entry.get("at", 0.0)), fields, int(entry.get("account", 0)))
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"{path}:{number}: invalid launch: {exc}") from None
+            unknown = [field for field in launch.fields if field not in FIELDS]
+            if unknown:
+                raise ValueError(f"{path}:{number}: unknown fields {unknown}")
+            launches.append(launch)
+    return sorted(launches, key=lambda launch: launch.at)
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """Summary of *values*: count, mean, p50 / p90 / p99 and max."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+
+class _Recorder:
+    """Thread-safe collection of one process's results."""
+
+    def __init__(self) -> None:
+        self.resolutions: List[float] = []
+        self.launches: List[float] = []
+        self.errors: "collections.Counter[str]" = collections.Counter()
+        self.requests: "collections.Counter[str]" = collections.Counter()
+        self._lock = threading.Lock()
+
+    def on_span(self, span: tracing.Span) -> None:
+        kind = _REQUEST_SPANS.get(span.name)
+        if kind is None and span.name == "connect":
+            kind = "connections"
+        if kind is not None:
+            with self._lock:
+                self.requests[kind] += 1
+
+    def resolution(self, seconds: float, error: Optional[BaseException]) -> None:
+        with self._lock:
+            self.resolutions.append(seconds)
+            if error is not None:
+                self.errors[type(error).__name__] += 1
+
+    def launch(self, seconds: float) -> None:
+        with self._lock:
+            self.launches.append(seconds)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "resolutions": self.resolutions,
+            "launches": self.launches,
+            "errors": dict(self.errors),
+            "requests": dict(self.requests),
+        }
+
+
+def _launch_kwargs(target: Target, launch: Launch, field: str) -> Dict[str, Any]:
+    username = target.username if not launch.account else f"{target.username}-{launch.account}"
+    kwargs = dict(
+        base_url=target.base_url,
+        username=username,
+        password=target.password,
+        identifier=field,
+    )
+    if target.domain:
+        kwargs["domain"] = target.domain
+    if field == "secret":
+        kwargs.update(secret_id=target.secret_id, secret_field=target.secret_field)
+    return kwargs
+
+
+def run_launches(
+    launches: Sequence[Launch], target: Target, threads: int, start: float
+) -> Dict[str, Any]:
+    """Replay *launches* in this process, from wall-clock time *start*."""
+    from .delinea_secret_server import backend
+
+    recorder = _Recorder()
+
+    def launch_job(launch: Launch, scheduled: float) -> None:
+        for field in launch.fields:
+            began = time.perf_counter()
+            error: Optional[BaseException] = None
+            try:
+                backend(**_launch_kwargs(target, launch, field))
+            except Exception as exc:  # recorded, the replay goes on
+                error = exc
+            recorder.resolution(time.perf_counter() - began, error)
+        recorder.launch(time.time() - scheduled)
+
+    tracing.add_span_callback(recorder.on_span)
+    try:
+        with ThreadPoolExecutor(max(threads, 1), thread_name_prefix="tss-loadtest") as pool:
+            for launch in launches:
+                scheduled = start + launch.at
+                delay = scheduled - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(launch_job, launch, scheduled)
+    finally:
+        tracing.remove_span_callback(recorder.on_span)
+    result = recorder.result()
+    result.update(started=start, finished=time.time())
+    return result
+
+
+def _load_plugin() -> None:
+    """Import the plugin and its SDK outside the measured window."""
+    from .delinea_secret_server import _load_sdk
+
+    _load_sdk()
+
+
+def _process_main(
+    launches: List[Launch], target: Target, threads: int, barrier: Any, results: Any
+) -> None:
+    _load_plugin()
+    barrier.wait()  # every process starts together
+    results.put(run_launches(launches, target, threads, time.time()))
+
+
+def run(
+    launches: Sequence[Launch], target: Target, threads: int = 1, processes: int = 1
+) -> Dict[str, Any]:
+    """Replay *launches* on *processes* × *threads* workers and build the report."""
+    if processes <= 1:
+        _load_plugin()
+        results = [run_launches(launches, target, threads, time.time())]
+    else:
+        import multiprocessing
+
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(processes)
+        queue = context.Queue()
+        workers = [
+            context.Process(
+                target=_process_main,
+                args=(list(launches[index::processes]), target, threads, barrier, queue),
+                daemon=True,
+            )
+            for index in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            results = _collect(workers, queue)
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+    duration = max(r["finished"] for r in results) - min(r["started"] for r in results)
+    return _report(launches, target, threads, processes, results, duration)
+
+
+def _collect(workers: List[Any], queue: Any) -> List[Dict[str, Any]]:
+    """Wait for one result per worker; raise if a worker dies without one."""
+    import queue as queue_module
+
+    results: List[Dict[str, Any]] = []
+    while len(results) < len(workers):
+        try:
+            results.append(queue.get(timeout=1.0))
+        except queue_module.Empty:
+            failed = [w.exitcode for w in workers if w.exitcode not in (None, 0)]
+            if failed:
+                raise RuntimeError(f"Load test worker process exited with code {failed[0]}")
+    return results
+
+
+def _report(
+    launches: Sequence[Launch],
+    target: Target,
+    threads: int,
+    processes: int,
+    results: List[Dict[str, Any]],
+    duration: float,
+) -> Dict[str, Any]:
+    resolutions = [seconds for result in results for seconds in result["resolutions"]]
+    launch_latencies = [seconds for result in results for seconds in result["launches"]]
+    errors: "collections.Counter[str]" = collections.Counter()
+    requests: "collections.Counter[str]" = collections.Counter()
+    for result in results:
+        errors.update(result["errors"])
+        requests.update(result["requests"])
+    connections = requests.pop("connections", 0)
+    outbound = sum(requests.values())
+    count = max(len(resolutions), 1)
+    return {
+        "target": target.base_url,
+        "threads": threads,
+        "processes": processes,
+        "launches": len(launches),
+        "resolutions": len(resolutions),
+        "duration_seconds": duration,
+        "throughput": {
+            "launches_per_second": len(launch_latencies) / duration if duration else 0.0,
+            "resolutions_per_second": len(resolutions) / duration if duration else 0.0,
+        },
+        "latency_seconds": {
+            "resolution": percentiles(resolutions),
+            "launch": percentiles(launch_latencies),
+        },
+        "outbound_requests": {
+            "total": outbound,
+            "per_resolution": outbound / count,
+            "by_kind": dict(requests),
+            "new_connections": connections,
+        },
+        "errors": {
+            "total": sum(errors.values()),
+            "rate": sum(errors.values()) / count,
+            "by_type": dict(errors),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run a load replay and write its JSON report."""
+    parser = argparse.ArgumentParser(
+        prog="tss-plugin-loadtest",
+        description="Replay job-launch bursts through the Delinea credential plugin.",
+    )
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--url", help="Secret Server base URL (comma-separated for failover)")
+    where.add_argument("--fake", action="store_true", help="Run against a local fake server")
+    parser.add_argument("--username", default="svc-loadtest", help="Application user name")
+    parser.add_argument("--domain", default=None, help="Application user domain")
+    parser.add_argument(
+        "--password-env",
+        default="TSS_PASSWORD",
+        help="Environment variable holding the password (default: TSS_PASSWORD)",
+    )
+    parser.add_argument("--trace", help="JSON-lines launch trace to replay")
+    parser.add_argument("--launches", type=int, default=100, help="Synthetic launches")
+    parser.add_argument(
+        "--rate", type=float, default=0.0, help="Synthetic launches per second (0: one burst)"
+    )
+    parser.add_argument("--accounts", type=int, default=1, help="Synthetic service accounts")
+    parser.add_argument(
+        "--mix",
+        action="append",
+        help="Fields resolved per launch, FIELD[+FIELD...][:WEIGHT]; repeatable "
+        "(default: token+base_url)",
+    )
+    parser.add_argument("--secret-id", default="1", help="Secret read by 'secret' fields")
+    parser.add_argument("--secret-field", default="password", help="Field of that secret")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per process")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic mix")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake server latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake server 503 rate")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fake server 429 rate")
+    parser.add_argument("--output", "-o", default="-", help="Report file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix or ["token+base_url"])
+        if args.trace:
+            launches = read_trace(args.trace, mix)
+        else:
+            launches = synthetic_profile(args.launches, args.rate, mix, args.accounts, args.seed)
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+
+    server = None
+    if args.fake:
+        from .fake_server import FakeSecretServer
+
+        server = FakeSecretServer(
+            latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate
+        ).start()
+        base_url, password = server.url, "loadtest"
+    else:
+        base_url, password = args.url, os.environ.get(args.password_env, "")
+        if not password:
+            parser.error(f"${args.password_env} is not set")
+    target = Target(
+        base_url, args.username, password, args.domain, args.secret_id, args.secret_field
+    )
+
+    try:
+        report = run(launches, target, args.threads, args.processes)
+    finally:
+        if server is not None:
+            server.stop()
+
+    text = json.dumps(report, indent=2, sort_keys=True) + "\n"
+    if args.output == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
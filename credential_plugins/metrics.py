@@ -0,0 +1,298 @@
+"""
+Prometheus metrics for the credential plugin's hot paths.
+
+Metrics are opt-in.  ``TSS_METRICS=1`` collects them in memory, and
+``TSS_METRICS_TEXTFILE=/path/tss.prom`` also writes them every
+``TSS_METRICS_INTERVAL`` seconds, and at exit, for node_exporter's textfile
+collector.  A host process can enable them with
+``delinea_secret_server.enable_metrics()`` and serve ``registry.render()``
+on its own scrape endpoint.
+
+When disabled the plugin's only cost is a ``None`` check per instrumented
+call.  This module has no dependencies: ``Registry`` renders the Prometheus
+text exposition format (version 0.0.4) itself.
+"""
+
+import abc
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Text exposition lines: the header, then one sample per label set."""
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        yield from self._header()
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket distribution of observed values per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: per-bucket counts (non-cumulative), sum.
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * len(self.buckets), [0.0])
+            counts, total = entry
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            total[0] += value
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(labels)
+            return sum(entry[0]) if entry else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((labels, (list(c), t[0])) for labels, (c, t) in self._values.items())
+        yield from self._header()
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                text = _format_labels(names, labels + (_format_value(bound),))
+                yield f"{self.name}_bucket{text} {cumulative}"
+            text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{text} {_format_value(total)}"
+            yield f"{self.name}_count{text} {cumulative}"
+
+
+_M = TypeVar("_M", bound=_Metric)
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_M") -> "_M":
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = [line for metric in metrics for line in metric.samples()]
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Write the metrics to *path* atomically, for a textfile collector."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tss-metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(self.render())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+class PluginMetrics:
+    """The plugin's metrics, in one registry."""
+
+    def __init__(self, registry: Optional[Registry] = None):
+        self.registry = registry if registry is not None else Registry()
+        add = self.registry.register
+        self.calls = add(
+            Histogram(
+                "tss_backend_duration_seconds",
+                "Duration of backend() calls.",
+                ("identifier", "base_url"),
+            )
+        )
+        self.in_flight = add(
+            Gauge("tss_backend_in_flight", "backend() calls in progress.", ("identifier",))
+        )
+        self.errors = add(
+            Counter(
+                "tss_backend_errors_total",
+                "backend() calls that raised, by exception type.",
+                ("identifier", "error"),
+            )
+        )
+        self.grants = add(
+            Counter(
+                "tss_grants_total",
+                "OAuth2 password grants sent, by outcome.",
+                ("base_url", "outcome"),
+            )
+        )
+        self.grant_duration = add(
+            Histogram(
+                "tss_grant_duration_seconds",
+                "Duration of OAuth2 password grants, including authorizer setup.",
+                ("base_url",),
+            )
+        )
+        self.grants_in_flight = add(
+            Gauge("tss_grants_in_flight", "OAuth2 password grants in progress.", ("base_url",))
+        )
+        self.cache = add(
+            Counter(
+                "tss_cache_requests_total",
+                "Cache lookups, by cache and result (hit / miss).",
+                ("cache", "result"),
+            )
+        )
+        self.evictions = add(
+            Counter(
+                "tss_cache_evictions_total",
+                "Entries evicted from a full cache.",
+                ("cache",),
+            )
+        )
+
+    def track_call(self, identifier: str, base_url: str, fn: Callable[[], T]) -> T:
+        """Run a backend() call, recording its duration, concurrency and errors."""
+        self.in_flight.inc(identifier)
+        started = time.perf_counter()
+        try:
+            return fn()
+        except Exception as exc:
+            self.errors.inc(identifier, type(exc).__name__)
+            raise
+        finally:
+            self.calls.observe(time.perf_counter() - started, identifier, base_url)
+            self.in_flight.dec(identifier)
+
+    def track_grant(self, base_url: str, fn: Callable[[], T]) -> T:
+        """Run one password grant, recording its duration, concurrency and outcome."""
+        self.grants_in_flight.inc(base_url)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = fn()
+            outcome = "ok"
+            return result
+        finally:
+            self.grant_duration.observe(time.perf_counter() - started, base_url)
+            self.grants.inc(base_url, outcome)
+            self.grants_in_flight.dec(base_url)
+
+
+class TextfileWriter:
+    """Daemon thread writing a registry to a textfile every *interval* seconds."""
+
+    def __init__(self, registry: Registry, path: str, interval: float):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tss-metrics", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def write(self) -> None:
+        if os.getpid() != self._pid:
+            return  # A forked child's copy; the file belongs to the parent.
+        try:
+            self.registry.write_textfile(self.path)
+        except OSError:
+            pass  # Metrics must never break credential resolution.
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
@@ -0,0 +1,193 @@
+"""
+Pre-warm the plugin's token cache and connection pools.
+
+Reads a list of Delinea credential inputs and authenticates them
+concurrently with ``delinea_secret_server.prewarm()``, so the first jobs
+after a controller restart or deploy find tokens and connections ready:
+
+    tss-plugin-prewarm --file /etc/tower/tss-credentials.json
+    tss-plugin-prewarm --file /etc/tower/tss-credentials.json --watch --interval 300
+
+The file is a JSON list of credential inputs.  Passwords may be given
+inline or, preferably, read from an environment variable named by
+``password_env``:
+
+    [{"base_url": "https://tss.example.com/SecretServer",
+      "username": "svc-awx", "domain": "CORP", "password_env": "TSS_PASSWORD_AWX"}]
+
+Without ``--file`` a single credential is read from ``TSS_BASE_URL``,
+``TSS_USERNAME``, ``TSS_PASSWORD`` and ``TSS_DOMAIN``.
+
+Tokens are cached in the process that resolves them.  Run standalone, this
+command warms AWX workers through the shared node cache
+(``TSS_SHARED_CACHE_PATH``), the cluster-wide store (``TSS_TOKEN_STORE_URL``)
+or the token broker (``TSS_BROKER_SOCKET``).  Inside a long-lived process,
+call ``prewarm()`` directly.
+
+``--watch`` repeats the pass every ``--interval`` seconds, re-reading the
+file each time.  It also enables the background refresher, so tokens are
+renewed before they expire and the renewed grants are published to the
+shared store.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = ("base_url", "username", "password", "domain", "timeout")
+
+
+def load_inputs(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read credential inputs from the JSON file at *path*, or from the environment.
+
+    Raises ``ValueError`` for malformed entries, naming the entry but never
+    its password.
+    """
+    if path is None:
+        entries: Any = [
+            {
+                "base_url": os.environ.get("TSS_BASE_URL", ""),
+                "username": os.environ.get("TSS_USERNAME", ""),
+                "password_env": "TSS_PASSWORD",
+                "domain": os.environ.get("TSS_DOMAIN", ""),
+            }
+        ]
+    else:
+        with open(path, encoding="utf-8") as handle:
+            entries = json.load(handle)
+    if not isinstance(entries, list):
+        raise ValueError("Credential file must contain a JSON list of credential inputs.")
+
+    inputs = []
+    for number, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Credential {number} is not an object.")
+        item = {name: entry[name] for name in _FIELDS if entry.get(name)}
+        if entry.get("password_env"):
+            item["password"] = os.environ.get(entry["password_env"], "")
+            if not item["password"]:
+                raise ValueError(
+                    f"Credential {number}: ${entry['password_env']} is not set or empty."
+                )
+        missing = [name for name in ("base_url", "username", "password") if not item.get(name)]
+        if missing:
+            raise ValueError(f"Credential {number} is missing {', '.join(missing)}.")
+        inputs.append(item)
+    return inputs
+
+
+def warm_once(path: Optional[str], max_concurrency: int) -> bool:
+    """Pre-warm every credential once; return whether all of them succeeded."""
+    from .delinea_secret_server import prewarm
+
+    started = time.monotonic()
+    inputs = load_inputs(path)
+    results = prewarm(inputs, max_concurrency)
+    failed = [(item, result.error) for item, result in zip(inputs, results) if result.error]
+    for item, error in failed:
+        logger.warning(
+            "Pre-warming %s@%s failed: %s", item["username"], item["base_url"], type(error).__name__
+        )
+    logger.info(
+        "Pre-warmed %d/%d credentials in %.2fs",
+        len(inputs) - len(failed),
+        len(inputs),
+        time.monotonic() - started,
+    )
+    return not failed
+
+
+def watch(
+    path: Optional[str],
+    interval: float,
+    max_concurrency: int,
+    cycles: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """Pre-warm every *interval* seconds until *stop* is set or *cycles* passes ran."""
+    stop = stop if stop is not None else threading.Event()
+    done = 0
+    while not stop.is_set():
+        try:
+            warm_once(path, max_concurrency)
+        except (OSError, ValueError) as exc:
+            # Keep the previous pass's tokens warm while the file is being fixed.
+            logger.error("Cannot read credentials: %s", exc)
+        done += 1
+        if cycles is not None and done >= cycles:
+            return
+        stop.wait(interval)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Pre-warm once (exit status 1 if any credential failed), or keep warm with --watch."""
+    from .delinea_secret_server import (
+        BROKER_SOCKET,
+        RESOLVE_CONCURRENCY,
+        SHARED_CACHE_PATH,
+        TOKEN_STORE_URL,
+        _token_refresher,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="tss-plugin-prewarm",
+        description="Authenticate Delinea credentials ahead of AWX job traffic.",
+    )
+    parser.add_argument(
+        "--file",
+        help="JSON list of credential inputs (default: one credential from TSS_* env vars)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=RESOLVE_CONCURRENCY,
+        help="Credentials authenticated at once (default: $TSS_RESOLVE_CONCURRENCY)",
+    )
+    parser.add_argument("--watch", action="store_true", help="Keep the credentials warm")
+    parser.add_argument(
+        "--interval", type=float, default=300.0, help="Seconds between --watch passes"
+    )
+    parser.add_argument(
+        "--refresh-ratio",
+        type=float,
+        default=0.8,
+        help="With --watch, renew tokens after this fraction of expires_in (0 disables)",
+    )
+    parser.add_argument("--cycles", type=int, default=None, help="Stop --watch after N passes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not (SHARED_CACHE_PATH or TOKEN_STORE_URL or BROKER_SOCKET):
+        logger.warning(
+            "No shared token store or broker is configured; tokens are only cached in "
+            "this process. Set TSS_SHARED_CACHE_PATH, TSS_TOKEN_STORE_URL or TSS_BROKER_SOCKET."
+        )
+
+    if not args.watch:
+        try:
+            return 0 if warm_once(args.file, args.concurrency) else 1
+        except (OSError, ValueError) as exc:
+            parser.error(str(exc))
+
+    try:
+        load_inputs(args.file)  # fail fast on a bad file before looping
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    _token_refresher.ratio = args.refresh_ratio
+    try:
+        watch(args.file, args.interval, args.concurrency, args.cycles)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _token_refresher.stop()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,241 @@
+"""
+Folder path + name → secret ID index for name-based secret lookups.
+
+Linking a credential field by ``secret_path`` (e.g. ``Servers\\Linux\\db-admin``)
+instead of a numeric secret ID would otherwise cost a Secret Server search on
+every ``backend()`` call.  ``SecretIndex`` maps every secret visible to one
+identity by its folder path and name:
+
+- the first lookup builds the index from the folders and secrets search API,
+- later syncs (at most every ``sync_interval`` seconds) only request secrets
+  modified since the previous sync, passed as ``MODIFIED_SINCE_PARAM``, and
+  fetch just the folders those secrets point to that are not known yet; a
+  server that ignores the filter is detected and logged,
+- the folder listing is refreshed every ``folder_sync_interval`` seconds, and
+  the secrets of a renamed folder are re-indexed under its new path,
+- lookups are a dictionary read,
+- a stale entry (secret moved, renamed or deleted since the last sync) is
+  corrected with one direct search through ``relookup()``.
+
+The index is HTTP-agnostic: it is given a ``get(endpoint, params)`` callable
+returning the decoded JSON of a REST API call (``endpoint`` relative to
+``/api/v1``).  ``find_secret()`` performs the same direct search without an
+index.
+"""
+
+import datetime
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 500
+SYNC_INTERVAL = 300.0
+FOLDER_SYNC_INTERVAL = 3600.0
+# Overlap between incremental syncs, covering clock skew with the server.
+SYNC_OVERLAP = 60.0
+
+Getter = Callable[[str, Dict[str, str]], Any]
+PathKey = Tuple[str, str]
+
+
+def normalize_folder(path: str) -> str:
+    """Normalize a folder path: backslash separators, no outer slashes, lower case."""
+    return path.replace("/", "\\").strip("\\").lower()
+
+
+def split_path(secret_path: str) -> PathKey:
+    """Split ``Folder\\Sub\\Name`` (or ``Folder/Sub/Name``) into its index key."""
+    folder, _, name = secret_path.replace("/", "\\").strip("\\").rpartition("\\")
+    return normalize_folder(folder), name.lower()
+
+
+def _pages(get: Getter, endpoint: str, params: Dict[str, str]) -> Iterator[Dict[str, Any]]:
+    """Yield every record of a paged Secret Server search."""
+    skip = 0
+    while True:
+        page = get(endpoint, dict(params, skip=str(skip), take=str(PAGE_SIZE)))
+        records = page.get("records") or []
+        yield from records
+        if not page.get("hasNext") or not records:
+            return
+        skip += len(records)
+
+
+def _folder_path(get: Getter, folder_id: Any, folders: Dict[Any, str]) -> Optional[str]:
+    if folder_id in folders:
+        return folders[folder_id]
+    if folder_id in (None, -1):
+        return ""
+    folder = get(f"/folders/{folder_id}", {})
+    path = normalize_folder(folder.get("folderPath") or "")
+    folders[folder_id] = path
+    return path
+
+
+def find_secret(
+    get: Getter,
+    secret_path: str,
+    folders: Optional[Dict[Any, str]] = None,
+) -> Optional[int]:
+    """Search Secret Server for the secret at *secret_path*; ``None`` if absent."""
+    folder, name = split_path(secret_path)
+    folders = {} if folders is None else folders
+    params = {"filter.searchText": name, "filter.includeSubFolders": "true"}
+    for record in _pages(get, "/secrets", params):
+        if str(record.get("name", "")).lower() != name:
+            continue
+        if _folder_path(get, record.get("folderId"), folders) == folder:
+            return int(record["id"])
+    return None
+
+
+class SecretIndex:
+    """Thread-safe path → secret ID index for the secrets one identity can see."""
+
+    MODIFIED_SINCE_PARAM = "filter.lastModifiedDate"
+
+    def __init__(
+        self,
+        get: Getter,
+        sync_interval: float = SYNC_INTERVAL,
+        folder_sync_interval: float = FOLDER_SYNC_INTERVAL,
+    ):
+        self.get = get
+        self.sync_interval = sync_interval
+        self.folder_sync_interval = folder_sync_interval
+        self._ids: Dict[PathKey, int] = {}
+        self._paths: Dict[int, PathKey] = {}
+        self._folder_ids: Dict[int, Any] = {}
+        self._folders: Dict[Any, str] = {}
+        self._synced_at: Optional[float] = None
+        self._next_sync = 0.0
+        self._next_folder_sync = 0.0
+        self._full_count = 0
+        self._warned_unfiltered = False
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def lookup(self, secret_path: str) -> Optional[int]:
+        """Return the indexed secret ID for *secret_path*, syncing when due."""
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        return self._ids.get(split_path(secret_path))
+
+    def relookup(self, secret_path: str) -> Optional[int]:
+        """Search for *secret_path* directly and correct the index with the result."""
+        key = split_path(secret_path)
+        # Folder paths are fetched afresh: the folder may have been renamed.
+        folders: Dict[Any, str] = {}
+        secret_id = find_secret(self.get, secret_path, folders)
+        with self._lock:
+            self._update_folders(folders)
+            stale = self._ids.pop(key, None)
+            if stale is not None:
+                self._paths.pop(stale, None)
+                self._folder_ids.pop(stale, None)
+            if secret_id is not None:
+                folder_id = next((f for f, path in folders.items() if path == key[0]), None)
+                self._set(secret_id, key, folder_id)
+        return secret_id
+
+    def sync(self) -> None:
+        """Build the index, or fetch secrets modified since the last sync.
+
+        Only one thread syncs at a time; concurrent callers keep reading the
+        current index instead of waiting.
+        """
+        if not self._sync_lock.acquire(blocking=self._synced_at is None):
+            return
+        try:
+            if time.monotonic() < self._next_sync:
+                return
+            started = time.time()
+            try:
+                folders, records = self._fetch()
+            except Exception as exc:
+                if self._synced_at is None:
+                    raise
+                # Keep serving the existing index; relookup() covers staleness.
+                logger.warning("Secret index sync failed: %s", type(exc).__name__)
+                self._next_sync = time.monotonic() + self.sync_interval
+                return
+            with self._lock:
+                self._update_folders(folders)
+                for record in records:
+                    folder_id = record.get("folderId")
+                    key = (self._folders.get(folder_id, ""), str(record.get("name", "")).lower())
+                    self._set(int(record["id"]), key, folder_id)
+            self._synced_at = started
+            self._next_sync = time.monotonic() + self.sync_interval
+        finally:
+            self._sync_lock.release()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ids)
+
+    def _after_fork(self) -> None:
+        """Reset the locks in a forked child; the index carries over."""
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def _fetch(self) -> Tuple[Dict[Any, str], List[Dict[str, Any]]]:
+        """Return folder paths to merge and the secret records to index."""
+        folders: Dict[Any, str] = {}
+        if time.monotonic() >= self._next_folder_sync:
+            folders = {
+                record.get("id"): normalize_folder(record.get("folderPath") or "")
+                for record in _pages(self.get, "/folders", {})
+            }
+            self._next_folder_sync = time.monotonic() + self.folder_sync_interval
+        params = {"filter.includeSubFolders": "true", "filter.includeInactive": "false"}
+        if self._synced_at is not None:
+            since = datetime.datetime.fromtimestamp(
+                self._synced_at - SYNC_OVERLAP, datetime.timezone.utc
+            )
+            params[self.MODIFIED_SINCE_PARAM] = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+        records = list(_pages(self.get, "/secrets", params))
+        if self.MODIFIED_SINCE_PARAM not in params:
+            self._full_count = len(records)
+        elif self._full_count > 1 and len(records) >= self._full_count:
+            if not self._warned_unfiltered:
+                self._warned_unfiltered = True
+                logger.warning(
+                    "Secret Server returned all %d secrets for an incremental index sync; "
+                    "it seems to ignore %s, so every sync is a full rescan",
+                    len(records),
+                    self.MODIFIED_SINCE_PARAM,
+                )
+        # Only folders not seen before are fetched, one by one.
+        with self._lock:
+            known = set(self._folders)
+        for record in records:
+            folder_id = record.get("folderId")
+            if folder_id not in known and folder_id not in folders:
+                _folder_path(self.get, folder_id, folders)
+        return folders, records
+
+    def _update_folders(self, folders: Dict[Any, str]) -> None:
+        """Merge fetched folder paths; re-index the secrets of renamed folders."""
+        renamed = {
+            folder_id
+            for folder_id, path in folders.items()
+            if folder_id in self._folders and self._folders[folder_id] != path
+        }
+        self._folders.update(folders)
+        for secret_id, folder_id in list(self._folder_ids.items()):
+            if folder_id in renamed:
+                name = self._paths[secret_id][1]
+                self._set(secret_id, (self._folders[folder_id], name), folder_id)
+
+    def _set(self, secret_id: int, key: PathKey, folder_id: Any) -> None:
+        # A moved or renamed secret keeps its ID: drop its previous path.
+        previous = self._paths.get(secret_id)
+        if previous is not None and previous != key:
+            self._ids.pop(previous, None)
+        self._ids[key] = secret_id
+        self._paths[secret_id] = key
+        self._folder_ids[secret_id] = folder_id
@@ -0,0 +1,143 @@
+"""
+Client-side rate limiting of outbound requests to one Secret Server.
+
+Secret Server (notably Secret Server Cloud) throttles token requests with
+HTTP 429.  A burst of job launches that all miss the token cache would
+otherwise hit that limit at once, and retrying immediately makes it worse.
+
+``RateLimiter`` keeps one token bucket per key (a Secret Server URL),
+shared by every thread in the process:
+
+- ``rate`` requests per second are allowed on average, with bursts of up to
+  ``burst``; a rate of 0 disables the bucket,
+- a caller over the limit reserves the next free slot and sleeps until
+  then, so callers are served in arrival order and traffic is smoothed
+  rather than rejected; a caller whose slot lies beyond its *timeout* is
+  refused instead,
+- ``pause()`` holds every caller back until a ``Retry-After`` has elapsed.
+
+``retry_after()`` parses a ``Retry-After`` header and ``backoff()`` returns a
+jittered exponential delay for retries without one.
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+
+class Throttled(Exception):
+    """Secret Server answered HTTP 429; ``retry_after`` is its hint in seconds."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Thread-safe token bucket handing out reservations in arrival order."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, timeout: Optional[float] = None) -> Optional[float]:
+        """Reserve one request; return the seconds to wait before sending it.
+
+        Returns ``None``, reserving nothing, when the wait would exceed
+        *timeout*.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._not_before)
+            wait = start - now
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                available = min(float(self.burst), self._tokens + wait * self.rate)
+                wait += max(0.0, (1.0 - available) / self.rate)
+            if timeout is not None and wait > timeout:
+                return None
+            if self.rate > 0:
+                # May go negative: later callers queue behind this reservation.
+                self._tokens -= 1.0
+            return wait
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request back for at least *seconds*."""
+        with self._lock:
+            self._not_before = max(self._not_before, time.monotonic() + seconds)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+class RateLimiter:
+    """Per-key token buckets with a common rate and burst."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, timeout: Optional[float] = None) -> bool:
+        """Wait for *key*'s next slot; ``False`` if it lies beyond *timeout*."""
+        wait = self._bucket(key).reserve(timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def pause(self, key: str, seconds: float) -> None:
+        """Hold every request for *key* back for at least *seconds*."""
+        self._bucket(key).pause(seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def _after_fork(self) -> None:
+        """Reset the locks in a forked child; reservations carry over."""
+        self._lock = threading.Lock()
+        for bucket in self._buckets.values():
+            bucket._after_fork()
+
+    def _bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+
+def retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def backoff(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff for retry *attempt* (0-based)."""
+    return random.uniform(0.0, min(cap, base * 2**attempt))
@@ -0,0 +1,452 @@
+"""
+Shared token stores sitting behind the in-process token cache.
+
+AWX resolves credential plugins in many dispatcher / callback worker
+processes, and AAP clusters run several nodes, so the in-process token cache
+in ``delinea_secret_server`` is split across them.  A ``TokenStore`` lets
+those processes share grants:
+
+- ``SqliteTokenStore`` — node-local SQLite database (WAL mode) that all
+  workers on a host read and write; survives worker recycling.
+- ``RedisTokenStore`` — cluster-wide store speaking the Redis protocol
+  (requires the optional ``redis`` extra), with TTLs matched to
+  ``expires_in`` and a distributed lock so one node grants per identity.
+- ``NullTokenStore`` — no-op fallback used when a store is unreachable.
+
+Grants are encrypted at rest.  Keys are derived with PBKDF2 from the full
+credential inputs (base URL, username, domain *and* password) plus a random
+per-database salt, so:
+
+- the row id reveals nothing about the identity or its password,
+- a worker holding different credentials derives a different row id and
+  different keys, and can never read (or forge) another identity's token.
+
+Only the standard library is used: the cipher is HMAC-SHA256 in counter
+mode with an HMAC-SHA256 tag over nonce, row id and ciphertext
+(encrypt-then-MAC).
+"""
+
+import abc
+import collections
+import contextlib
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, ContextManager, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PBKDF2_ITERATIONS = 100000
+LOCK_STRIPES = 64
+LOCK_TIMEOUT = 30.0
+
+_NONCE_SIZE = 16
+_TAG_SIZE = 32
+
+Credentials = Tuple[str, str, str, Optional[str]]
+
+
+class _Keys:
+    """Per-identity row id and cipher keys derived from the credential inputs."""
+
+    __slots__ = ("row_id", "enc_key", "mac_key")
+
+    def __init__(self, master: bytes):
+        self.row_id = hmac.new(master, b"row-id", hashlib.sha256).hexdigest()
+        self.enc_key = hmac.new(master, b"encrypt", hashlib.sha256).digest()
+        self.mac_key = hmac.new(master, b"authenticate", hashlib.sha256).digest()
+
+
+def _keystream(key: bytes, nonce: bytes, length: int) -> bytes:
+    blocks = []
+    for counter in range((length + 31) // 32):
+        blocks.append(hmac.new(key, nonce + counter.to_bytes(8, "big"), hashlib.sha256).digest())
+    return b"".join(blocks)[:length]
+
+
+def seal(keys: _Keys, plaintext: bytes) -> bytes:
+    """Encrypt and authenticate *plaintext* for the identity behind *keys*."""
+    nonce = os.urandom(_NONCE_SIZE)
+    stream = _keystream(keys.enc_key, nonce, len(plaintext))
+    ciphertext = bytes(a ^ b for a, b in zip(plaintext, stream))
+    tag = hmac.new(keys.mac_key, nonce + keys.row_id.encode() + ciphertext, hashlib.sha256).digest()
+    return nonce + ciphertext + tag
+
+
+def unseal(keys: _Keys, blob: bytes) -> Optional[bytes]:
+    """Return the plaintext of *blob*, or ``None`` if it fails authentication."""
+    if len(blob) < _NONCE_SIZE + _TAG_SIZE:
+        return None
+    nonce, ciphertext, tag = blob[:_NONCE_SIZE], blob[_NONCE_SIZE:-_TAG_SIZE], blob[-_TAG_SIZE:]
+    expected = hmac.new(
+        keys.mac_key, nonce + keys.row_id.encode() + ciphertext, hashlib.sha256
+    ).digest()
+    if not hmac.compare_digest(tag, expected):
+        return None
+    stream = _keystream(keys.enc_key, nonce, len(ciphertext))
+    return bytes(a ^ b for a, b in zip(ciphertext, stream))
+
+
+def _lock_wait(lock_timeout: float, timeout: Optional[float]) -> float:
+    """Seconds to wait for a lock: the store's limit, capped by the caller's."""
+    return lock_timeout if timeout is None else min(lock_timeout, timeout)
+
+
+class TokenStore(abc.ABC):
+    """Interface for stores that share grants between processes or nodes.
+
+    Payloads are dicts holding ``access_token`` and an absolute (epoch)
+    ``expires_at``, plus optional ``refresh_token`` / ``token_url``.
+    Implementations must treat their own failures as misses: a broken store
+    may slow a launch down, but never fail it.
+    """
+
+    def __init__(self, iterations: int = PBKDF2_ITERATIONS):
+        self.iterations = iterations
+        self._salt = b""
+        self._keys: "collections.OrderedDict[Tuple[str, ...], _Keys]" = collections.OrderedDict()
+        self._keys_lock = threading.Lock()
+
+    @abc.abstractmethod
+    def get(self, credentials: Credentials) -> Optional[Dict[str, Any]]:
+        """Return the stored payload for *credentials* if still valid."""
+
+    @abc.abstractmethod
+    def put(self, credentials: Credentials, payload: Dict[str, Any]) -> None:
+        """Store *payload* until its ``expires_at``."""
+
+    @abc.abstractmethod
+    def lock(
+        self, credentials: Credentials, timeout: Optional[float] = None
+    ) -> ContextManager[bool]:
+        """Context manager serialising grants for *credentials*.
+
+        Waits at most *timeout* seconds (e.g. what is left of the caller's
+        deadline) on top of the store's own limit.  Yields whether the lock
+        was actually acquired.
+        """
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """Delete every stored grant."""
+
+    def _derive(self, credentials: Credentials) -> _Keys:
+        base_url, username, password, domain = credentials
+        identity = [base_url.rstrip("/"), username, domain or ""]
+        memo_key = tuple(identity + [hashlib.sha256(password.encode("utf-8")).hexdigest()])
+        with self._keys_lock:
+            keys = self._keys.get(memo_key)
+            if keys is not None:
+                self._keys.move_to_end(memo_key)
+                return keys
+        master = hashlib.pbkdf2_hmac(
+            "sha256",
+            password.encode("utf-8"),
+            self._salt + json.dumps(identity).encode("utf-8"),
+            self.iterations,
+        )
+        keys = _Keys(master)
+        with self._keys_lock:
+            self._keys[memo_key] = keys
+            while len(self._keys) > 256:
+                self._keys.popitem(last=False)
+        return keys
+
+    def _decode(self, keys: _Keys, blob: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if blob is None:
+            return None
+        plaintext = unseal(keys, blob)
+        if plaintext is None:
+            return None
+        payload: Dict[str, Any] = json.loads(plaintext.decode("utf-8"))
+        if payload.get("expires_at", 0) <= time.time():
+            return None
+        return payload
+
+
+class NullTokenStore(TokenStore):
+    """A store that stores nothing; stands in when the real one is unreachable."""
+
+    def get(self, credentials: Credentials) -> Optional[Dict[str, Any]]:
+        return None
+
+    def put(self, credentials: Credentials, payload: Dict[str, Any]) -> None:
+        return None
+
+    @contextlib.contextmanager
+    def lock(self, credentials: Credentials, timeout: Optional[float] = None) -> Iterator[bool]:
+        yield False
+
+    def clear(self) -> None:
+        return None
+
+
+class SqliteTokenStore(TokenStore):
+    """Encrypted token store in a SQLite database shared across processes.
+
+    Store failures (locked or unwritable database, corrupt rows) are logged
+    and treated as cache misses so the caller falls back to a direct grant.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        iterations: int = PBKDF2_ITERATIONS,
+        lock_timeout: float = LOCK_TIMEOUT,
+    ):
+        super().__init__(iterations)
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self._local = threading.local()
+        self._salt = self._init_db()
+
+    # ── Public API ──────────────────────────────────────────────────────
+
+    def get(self, credentials: Credentials) -> Optional[Dict[str, Any]]:
+        """Return the stored grant payload for *credentials* if still valid."""
+        keys = self._derive(credentials)
+        try:
+            row = (
+                self._connect()
+                .execute("SELECT expires_at, blob FROM tokens WHERE id = ?", (keys.row_id,))
+                .fetchone()
+            )
+        except sqlite3.Error as exc:
+            logger.warning("Shared token store read failed: %s", exc)
+            return None
+        if row is None or row[0] <= time.time():
+            return None
+        return self._decode(keys, row[1])
+
+    def put(self, credentials: Credentials, payload: Dict[str, Any]) -> None:
+        """Store *payload* (must include an absolute ``expires_at``)."""
+        keys = self._derive(credentials)
+        blob = seal(keys, json.dumps(payload).encode("utf-8"))
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tokens (id, expires_at, blob) VALUES (?, ?, ?)",
+                    (keys.row_id, float(payload["expires_at"]), blob),
+                )
+                conn.execute("DELETE FROM tokens WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as exc:
+            logger.warning("Shared token store write failed: %s", exc)
+
+    @contextlib.contextmanager
+    def lock(self, credentials: Credentials, timeout: Optional[float] = None) -> Iterator[bool]:
+        """Hold the node-wide lock for *credentials* while granting.
+
+        Yields ``True`` when the lock was acquired.  Identities are spread
+        over ``LOCK_STRIPES`` lock files; after ``lock_timeout`` (or
+        *timeout*, if shorter) seconds the caller proceeds unlocked
+        (yielding ``False``) rather than stall.
+        """
+        import fcntl
+
+        keys = self._derive(credentials)
+        stripe = int(keys.row_id[:8], 16) % LOCK_STRIPES
+        lock_path = f"{self.path}.lock.{stripe}"
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        acquired = False
+        try:
+            wait = _lock_wait(self.lock_timeout, timeout)
+            deadline = time.monotonic() + wait
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        if wait >= self.lock_timeout:
+                            logger.warning("Timed out waiting for shared token lock")
+                        break
+                    time.sleep(0.01)
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def clear(self) -> None:
+        """Delete every stored grant."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tokens")
+
+    # ── Internals ───────────────────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and process: sqlite3 connections must not
+        # be shared across threads, nor survive a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_db(self) -> bytes:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Create the file up front so SQLite (and its -wal/-shm files)
+        # inherit owner-only permissions.
+        os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value BLOB)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tokens "
+            "(id TEXT PRIMARY KEY, expires_at REAL NOT NULL, blob BLOB NOT NULL)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (name, value) VALUES ('salt', ?)", (os.urandom(16),)
+        )
+        salt: bytes = conn.execute("SELECT value FROM meta WHERE name = 'salt'").fetchone()[0]
+        return salt
+
+
+class RedisTokenStore(TokenStore):
+    """Encrypted cluster-wide token store speaking the Redis protocol.
+
+    Each grant is stored under a key derived from the credential inputs with
+    a TTL matching its remaining lifetime.  ``lock()`` is a ``SET NX PX``
+    lease released by compare-and-delete, so one node grants per identity.
+
+    When the server is unreachable the store behaves like ``NullTokenStore``
+    and retries the connection after ``retry_after`` seconds, so an outage
+    costs at most one connect timeout per interval instead of one per call.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        prefix: str = "tss:",
+        iterations: int = PBKDF2_ITERATIONS,
+        lock_timeout: float = LOCK_TIMEOUT,
+        lock_ttl: float = 60.0,
+        retry_after: float = 30.0,
+    ):
+        super().__init__(iterations)
+        self.client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.lock_ttl = lock_ttl
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._salt = self._init_salt()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RedisTokenStore":
+        """Connect to ``redis://`` / ``rediss://`` *url* (needs ``redis`` installed)."""
+        import redis
+        from redis.backoff import NoBackoff
+        from redis.retry import Retry
+
+        # No client-side retries: an unreachable store should cost one
+        # connect timeout, after which the launch falls back to a grant.
+        client = redis.Redis.from_url(
+            url,
+            socket_timeout=2.0,
+            socket_connect_timeout=2.0,
+            retry=Retry(NoBackoff(), 0),
+        )
+        return cls(client, **kwargs)
+
+    def get(self, credentials: Credentials) -> Optional[Dict[str, Any]]:
+        if not self._ready():
+            return None
+        keys = self._derive(credentials)
+        blob = self._call(self.client.get, self.prefix + "token:" + keys.row_id)
+        return self._decode(keys, blob)
+
+    def put(self, credentials: Credentials, payload: Dict[str, Any]) -> None:
+        ttl_ms = int((float(payload["expires_at"]) - time.time()) * 1000)
+        if ttl_ms <= 0 or not self._ready():
+            return
+        keys = self._derive(credentials)
+        blob = seal(keys, json.dumps(payload).encode("utf-8"))
+        self._call(self.client.set, self.prefix + "token:" + keys.row_id, blob, px=ttl_ms)
+
+    @contextlib.contextmanager
+    def lock(self, credentials: Credentials, timeout: Optional[float] = None) -> Iterator[bool]:
+        if not self._ready():
+            yield False
+            return
+        keys = self._derive(credentials)
+        name = self.prefix + "lock:" + keys.row_id
+        owner = os.urandom(16).hex()
+        ttl_ms = int(self.lock_ttl * 1000)
+        wait = _lock_wait(self.lock_timeout, timeout)
+        deadline = time.monotonic() + wait
+        acquired = False
+        while not self._is_down():
+            if self._call(self.client.set, name, owner, nx=True, px=ttl_ms):
+                acquired = True
+                break
+            if time.monotonic() >= deadline:
+                if wait >= self.lock_timeout:
+                    logger.warning("Timed out waiting for distributed token lock")
+                break
+            time.sleep(0.02)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._release(name, owner)
+
+    def clear(self) -> None:
+        for name in self.client.scan_iter(match=self.prefix + "token:*"):
+            self.client.delete(name)
+
+    def _release(self, name: str, owner: str) -> None:
+        # Compare-and-delete without Lua so any Redis-protocol server works:
+        # only delete the lease if it is still ours.
+        import redis
+
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.watch(name)
+                current = pipe.get(name)
+                if current is not None and current.decode() == owner:
+                    pipe.multi()
+                    pipe.delete(name)
+                    pipe.execute()
+        except redis.WatchError:
+            pass
+        except redis.RedisError as exc:
+            logger.warning("Failed to release distributed token lock: %s", exc)
+
+    def _init_salt(self) -> bytes:
+        # Every node must derive the same keys, so the salt lives in the store.
+        name = self.prefix + "salt"
+        self._call(self.client.set, name, os.urandom(16), nx=True)
+        salt = self._call(self.client.get, name)
+        return b"" if salt is None else bytes(salt)
+
+    def _ready(self) -> bool:
+        """Fetch the shared salt if a previous attempt found the server down."""
+        if not self._salt and not self._is_down():
+            self._salt = self._init_salt()
+        return bool(self._salt)
+
+    def _is_down(self) -> bool:
+        return time.monotonic() < self._down_until
+
+    def _call(self, fn: Any, *args: Any, **kwargs: Any) -> Any:
+        import redis
+
+        if self._is_down():
+            return None
+        try:
+            return fn(*args, **kwargs)
+        except redis.RedisError as exc:
+            logger.warning("Token store unreachable (%s); bypassing for %ss", exc, self.retry_after)
+            self._down_until = time.monotonic() + self.retry_after
+            return None
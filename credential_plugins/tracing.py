@@ -0,0 +1,256 @@
+"""
+Per-phase timing spans and sampled profiling for credential resolution.
+
+``backend()`` runs in a ``backend`` span, and the phases below it open
+child spans:
+
+- ``dns`` — address resolution, on a DNS cache miss,
+- ``connect`` — TCP connect to one address,
+- ``tls`` — TLS handshake (``tls.resumed`` for resumed sessions),
+- ``grant`` — the OAuth2 token request, i.e. the time Secret Server spends
+  on the grant plus the transfer,
+- ``api_request`` / ``health_check`` — REST API and server-detection calls.
+
+Every span carries ``self_seconds``: its duration minus that of its child
+spans.  On the ``backend`` span this is the plugin's own processing time.
+
+Spans only carry the attributes listed above, the identifier, base URL and
+a truncated SHA-256 of the identity (``identity_hash()``).  They never
+carry a password, token or secret value.
+
+Spans are off until a consumer is registered:
+
+- ``add_span_callback(fn)`` calls ``fn(span)`` with a ``Span`` record as
+  each span ends,
+- ``set_tracer(tracer)`` forwards spans to an OpenTelemetry tracer (any
+  object with ``start_as_current_span(name, attributes=...)``), so they
+  nest under the host's current span.
+
+While neither is registered, ``span()`` returns a shared no-op context.
+
+``Profiler`` captures a cProfile profile or a tracemalloc snapshot of a
+sampled fraction of calls, one file per sampled call.
+"""
+
+import collections
+import contextvars
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# A finished span.  ``start`` is a Unix timestamp; ``error`` is the name of
+# the exception type that ended the span, if any.
+Span = collections.namedtuple(
+    "Span",
+    ["name", "trace_id", "span_id", "parent_id", "start", "duration", "attributes", "error"],
+)
+
+SpanCallback = Callable[[Span], None]
+
+_callbacks: List[SpanCallback] = []
+_tracer: Any = None
+_current: "contextvars.ContextVar[Optional[_ActiveSpan]]" = contextvars.ContextVar(
+    "tss_span", default=None
+)
+
+
+def add_span_callback(callback: SpanCallback) -> None:
+    """Call *callback* with every finished ``Span``."""
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+
+
+def remove_span_callback(callback: SpanCallback) -> None:
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def set_tracer(tracer: Any) -> None:
+    """Forward spans to an OpenTelemetry *tracer*; ``None`` stops forwarding."""
+    global _tracer
+    _tracer = tracer
+
+
+def use_opentelemetry() -> None:
+    """Forward spans to the globally configured OpenTelemetry tracer provider."""
+    from opentelemetry import trace
+
+    set_tracer(trace.get_tracer("credential_plugins"))
+
+
+def enabled() -> bool:
+    """Whether any span consumer is registered."""
+    return bool(_callbacks) or _tracer is not None
+
+
+def identity_hash(base_url: str, username: str, domain: Optional[str] = None) -> str:
+    """Short, stable digest identifying a service account in spans."""
+    text = "\0".join((base_url.rstrip("/"), domain or "", username))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def log_span(span: Span) -> None:
+    """Span callback logging each span as one structured DEBUG record."""
+    logger.debug(
+        "span %s %.6fs",
+        span.name,
+        span.duration,
+        extra={"tss_span": span._asdict()},
+    )
+
+
+class _NoopSpan:
+    def __enter__(self) -> Dict[str, Any]:
+        return {}
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+class _ActiveSpan:
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.children = 0.0
+        self.parent: Optional[_ActiveSpan] = None
+        self.trace_id = ""
+        self.span_id = ""
+        self.start = 0.0
+        self._started = 0.0
+        self._otel_context: Any = None
+        self._otel: Any = None
+
+    def __enter__(self) -> Dict[str, Any]:
+        self.parent = _current.get()
+        self.trace_id = self.parent.trace_id if self.parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        if _tracer is not None:
+            self._otel_context = _tracer.start_as_current_span(
+                self.name, attributes=dict(self.attributes)
+            )
+            self._otel = self._otel_context.__enter__()
+        return self.attributes
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        duration = time.perf_counter() - self._started
+        _current.reset(self._token)
+        if self.parent is not None:
+            self.parent.children += duration
+        self.attributes["self_seconds"] = max(duration - self.children, 0.0)
+        if self._otel_context is not None:
+            for key, value in self.attributes.items():
+                self._otel.set_attribute(f"tss.{key}", value)
+            self._otel_context.__exit__(exc_type, exc, tb)
+        record = Span(
+            self.name,
+            self.trace_id,
+            self.span_id,
+            self.parent.span_id if self.parent else None,
+            self.start,
+            duration,
+            self.attributes,
+            exc_type.__name__ if exc_type is not None else None,
+        )
+        for callback in list(_callbacks):
+            try:
+                callback(record)
+            except Exception:  # a broken consumer must not fail the call
+                logger.debug("span callback failed", exc_info=True)
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """Context manager timing one phase; yields its mutable attribute dict."""
+    if not _callbacks and _tracer is None:
+        return _NOOP
+    return _ActiveSpan(name, attributes)
+
+
+class Profiler:
+    """Profile a sampled fraction of calls with cProfile or tracemalloc.
+
+    One call is profiled at a time; calls sampled while another is being
+    profiled run unprofiled.  Output files are named
+    ``tss-<time>-<pid>-<n>.prof`` (load with ``pstats``) or
+    ``.tracemalloc`` (load with ``tracemalloc.Snapshot.load``).
+    """
+
+    def __init__(self, sample: float, kind: str = "cprofile", directory: str = ""):
+        if kind not in ("cprofile", "tracemalloc"):
+            raise ValueError(f"Unknown profiler '{kind}'. Valid values: 'cprofile', 'tracemalloc'.")
+        self.sample = sample
+        self.kind = kind
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def run(self, fn: Callable[[], T]) -> T:
+        """Call *fn*, profiling it when sampled."""
+        if random.random() >= self.sample or not self._lock.acquire(blocking=False):
+            return fn()
+        try:
+            self._count += 1
+            if not self.directory:
+                import tempfile
+
+                self.directory = tempfile.gettempdir()
+            path = os.path.join(
+                self.directory, f"tss-{int(time.time())}-{os.getpid()}-{self._count}"
+            )
+            if self.kind == "cprofile":
+                return self._cprofile(fn, path + ".prof")
+            return self._tracemalloc(fn, path + ".tracemalloc")
+        finally:
+            self._lock.release()
+
+    def _cprofile(self, fn: Callable[[], T], path: str) -> T:
+        import cProfile
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler (e.g. a debugger) is active
+            return fn()
+        try:
+            return fn()
+        finally:
+            profile.disable()
+            _write_profile(profile.dump_stats, path)
+
+    def _tracemalloc(self, fn: Callable[[], T], path: str) -> T:
+        import tracemalloc
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            return fn()
+        finally:
+            _write_profile(tracemalloc.take_snapshot().dump, path)
+            if started:
+                tracemalloc.stop()
+
+
+def _write_profile(write: Callable[[str], None], path: str) -> None:
+    """Call ``write(path)``, logging rather than raising when it fails."""
+    try:
+        write(path)
+    except OSError as exc:
+        # Profiling must never break credential resolution.
+        logger.warning("Could not write profile %s: %s", path, exc)
@@ -0,0 +1,345 @@
+"""
+Pooled HTTP transport for Secret Server requests.
+
+The Delinea SDK issues every request through module-level ``requests``
+calls, which open a new TCP + TLS connection each time.  ``SessionPool``
+keeps one keep-alive ``requests.Session`` per Secret Server origin so
+token (and secret) requests reuse warm connections, and closes sessions
+that have sat idle longer than ``idle_timeout``.
+
+Connections that still have to be opened (idle pools closed, workers
+recycled) are made cheaper too:
+
+- ``TLSSessionCache`` keeps the last TLS session per host so new
+  connections resume it instead of doing a full handshake.
+- ``DNSCache`` keeps resolved addresses per host for ``ttl`` seconds.
+  ``getaddrinfo`` does not expose record TTLs, so the TTL is configured.
+
+``stats()`` reports resumed vs full handshakes and DNS hits/misses.
+"""
+
+import collections
+import socket
+import ssl
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .tracing import span
+
+POOL_SIZE = 10
+IDLE_TIMEOUT = 60.0
+DNS_TTL = 60.0
+CACHE_SIZE = 128
+
+
+class DNSCache:
+    """Bounded cache of ``(host, port)`` → resolved addresses."""
+
+    def __init__(self, ttl: float = DNS_TTL, max_size: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "collections.OrderedDict[Tuple[str, int], Tuple[List[str], float]]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        """Return the addresses for *host*; an empty list if resolution fails."""
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+        try:
+            with span("dns", host=host):
+                infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        except OSError:
+            return []
+        addresses = list(dict.fromkeys(str(info[4][0]) for info in infos))
+        if self.ttl > 0 and addresses:
+            with self._lock:
+                self._entries[key] = (addresses, now + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return addresses
+
+    def invalidate(self, host: str) -> None:
+        """Forget every cached address of *host* (e.g. after connect failures)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == host]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+class TLSSessionCache:
+    """Bounded cache of the latest TLS session per server hostname.
+
+    TLS 1.3 delivers session tickets after the handshake, so besides the
+    session seen at handshake time the cache keeps a weak reference to the
+    newest socket and re-reads its session when the next connection opens
+    (and when the connection is closed).
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE):
+        self.max_size = max_size
+        self.full_handshakes = 0
+        self.resumed_handshakes = 0
+        self._entries: "collections.OrderedDict[str, Tuple[Optional[ssl.SSLSession], Any]]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, hostname: str) -> Optional[ssl.SSLSession]:
+        with self._lock:
+            entry = self._entries.get(hostname)
+            if entry is None:
+                return None
+            session, sock_ref = entry
+            sock = sock_ref()
+            latest = _current_session(sock) if sock is not None else None
+            if latest is not None and latest is not session:
+                session = latest
+                self._entries[hostname] = (session, sock_ref)
+            return session
+
+    def record(self, hostname: str, sock: ssl.SSLSocket, resumed: bool) -> None:
+        with self._lock:
+            if resumed:
+                self.resumed_handshakes += 1
+            else:
+                self.full_handshakes += 1
+            self._entries[hostname] = (_current_session(sock), weakref.ref(sock))
+            self._entries.move_to_end(hostname)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def capture(self, hostname: str, sock: Any) -> None:
+        """Keep *sock*'s latest session before it is closed."""
+        session = _current_session(sock)
+        if session is None:
+            return
+        with self._lock:
+            if hostname in self._entries:
+                self._entries[hostname] = (session, self._entries[hostname][1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+def _current_session(sock: Any) -> Optional[ssl.SSLSession]:
+    try:
+        session: Optional[ssl.SSLSession] = sock.session
+    except (AttributeError, OSError, ValueError):
+        return None
+    return session
+
+
+dns_cache = DNSCache()
+tls_sessions = TLSSessionCache()
+
+
+class _ResumingSSLContext(ssl.SSLContext):
+    """SSL context that offers the cached session for the target host."""
+
+    def wrap_socket(self, sock: Any, *args: Any, **kwargs: Any) -> Any:  # type: ignore[override]
+        hostname = kwargs.get("server_hostname")
+        injected = False
+        if hostname and kwargs.get("session") is None:
+            session = tls_sessions.get(hostname)
+            if session is not None:
+                kwargs["session"] = session
+                injected = True
+        with span("tls", host=hostname or "") as attributes:
+            try:
+                ssl_sock = super().wrap_socket(sock, *args, **kwargs)
+            except ssl.SSLError:
+                # Handshake failures (e.g. SSLCertVerificationError, also a
+                # ValueError) leave the socket unusable; report them as-is.
+                raise
+            except ValueError:
+                if not injected:
+                    raise
+                # A cached session the context refuses (e.g. from another
+                # context) is rejected before the handshake: do a full one.
+                kwargs.pop("session", None)
+                ssl_sock = super().wrap_socket(sock, *args, **kwargs)
+            resumed = bool(ssl_sock.session_reused)
+            attributes["tls.resumed"] = resumed
+        if hostname:
+            tls_sessions.record(hostname, ssl_sock, resumed)
+        return ssl_sock
+
+
+def create_ssl_context() -> ssl.SSLContext:
+    """Build the client context shared by every pooled HTTPS connection.
+
+    Hostname checking is left to urllib3 (as with its own contexts), so
+    ``verify=False`` / ``REQUESTS_CA_BUNDLE`` keep working unchanged.
+    """
+    context = _ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_REQUIRED
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.options |= ssl.OP_NO_COMPRESSION
+    return context
+
+
+class _CachedDNSMixin:
+    """Connect through ``dns_cache`` instead of resolving on every connect."""
+
+    _dns_host: str
+    port: int
+
+    def _new_conn(self) -> socket.socket:
+        # urllib3 connects to ``_dns_host`` but uses ``host`` for SNI and the
+        # Host header; swap in each cached address only around the connect.
+        host = self._dns_host
+        last_error: Optional[Exception] = None
+        for address in dns_cache.resolve(host, self.port):
+            self._dns_host = address
+            try:
+                with span("connect", host=host, address=address):
+                    sock: socket.socket = super()._new_conn()  # type: ignore[misc]
+                return sock
+            except Exception as exc:
+                last_error = exc
+            finally:
+                self._dns_host = host
+        if last_error is not None:
+            dns_cache.invalidate(host)
+            raise last_error
+        sock = super()._new_conn()  # type: ignore[misc]
+        return sock
+
+
+class _CachedHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _CachedHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    def close(self) -> None:
+        if self.sock is not None:
+            tls_sessions.capture(self.host, self.sock)
+        super().close()
+
+
+class _CachedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedHTTPConnection
+
+
+class _CachedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """``HTTPAdapter`` using the shared SSL context and cached-DNS connections."""
+
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs: Any):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("ssl_context", self._ssl_context)
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CachedHTTPConnectionPool,
+            "https": _CachedHTTPSConnectionPool,
+        }
+
+
+def stats() -> Dict[str, int]:
+    """Counters for checking the gain of TLS resumption and DNS caching."""
+    return {
+        "tls_full_handshakes": tls_sessions.full_handshakes,
+        "tls_resumed_handshakes": tls_sessions.resumed_handshakes,
+        "dns_cache_hits": dns_cache.hits,
+        "dns_cache_misses": dns_cache.misses,
+    }
+
+
+def origin(url: str) -> str:
+    """Return the ``scheme://host:port`` part of *url* used to key sessions."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class SessionPool:
+    """Thread-safe map of origin → keep-alive ``requests.Session``."""
+
+    def __init__(self, pool_size: int = POOL_SIZE, idle_timeout: float = IDLE_TIMEOUT):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, Tuple[requests.Session, float]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = create_ssl_context()
+
+    def session(self, url: str) -> requests.Session:
+        """Return the pooled session for *url*'s origin, creating it if needed."""
+        key = origin(url)
+        now = time.monotonic()
+        with self._lock:
+            self._reap_locked(now)
+            entry = self._sessions.get(key)
+            session = entry[0] if entry is not None else self._new_session()
+            self._sessions[key] = (session, now)
+            return session
+
+    def reap(self) -> int:
+        """Close sessions idle for longer than ``idle_timeout``; return how many."""
+        with self._lock:
+            return self._reap_locked(time.monotonic())
+
+    def close(self) -> None:
+        """Close every pooled session and its connections."""
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = _PooledAdapter(self._ssl_context, pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _reap_locked(self, now: float) -> int:
+        idle = [
+            key
+            for key, (_, last_used) in self._sessions.items()
+            if now - last_used > self.idle_timeout
+        ]
+        for key in idle:
+            session, _ = self._sessions.pop(key)
+            session.close()
+        return len(idle)
@@ -0,0 +1,233 @@
+"""
+Micro-benchmarks of backend() against the local fake Secret Server.
+
+Run with:  make bench   (or TSS_BENCHMARK=1 pytest tests/test_benchmarks.py)
+
+Each scenario measures throughput and p50 / p99 latency of backend() calls:
+
+- ``cached_token`` — one thread, token served from the cache,
+- ``cold_grant``   — one thread, every call performs a password grant,
+- ``threads``      — 8 threads sharing 4 service accounts,
+- ``processes``    — 4 worker processes sharing 4 service accounts.
+
+Results are compared with ``tests/benchmark_baseline.json``; a scenario
+fails when its time per call, p50 or p99 grows by more than
+``TSS_BENCH_TOLERANCE`` (default 1.0, i.e. twice as slow) *and* by more than
+``TSS_BENCH_FLOOR`` seconds (default 0.001).  The p50 / p99 of the in-memory
+scenarios (cached token, threads) are recorded but not gated: at microsecond
+scale, a single preemption decides them.  The baseline is scaled to the
+machine by a fixed CPU workload timed in the same run, so a slower CI runner
+is not mistaken for a regression.  Re-record the baseline with
+``TSS_BENCH_UPDATE=1``.
+
+Skipped unless pytest-benchmark is installed and ``TSS_BENCHMARK=1``.
+"""
+
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+if os.environ.get("TSS_BENCHMARK") != "1":
+    pytest.skip("Benchmarks run with TSS_BENCHMARK=1 (make bench)", allow_module_level=True)
+
+import credential_plugins.delinea_secret_server  # noqa: E402,F401
+from credential_plugins.delinea_secret_server import backend  # noqa: E402
+from credential_plugins.fake_server import FakeSecretServer  # noqa: E402
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+TOLERANCE = float(os.environ.get("TSS_BENCH_TOLERANCE", "1.0"))
+FLOOR = float(os.environ.get("TSS_BENCH_FLOOR", "0.001"))
+UPDATE = os.environ.get("TSS_BENCH_UPDATE") == "1"
+
+# Round-trip time added by the fake server to every request.
+SERVER_LATENCY = 0.002
+ACCOUNTS = 4
+CALLS_PER_WORKER = 250
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    yield
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeSecretServer(latency=SERVER_LATENCY) as fake:
+        yield fake
+
+
+def _credentials(url: str, index: int) -> Dict[str, str]:
+    return dict(base_url=url, username=f"svc-{index % ACCOUNTS}", password="s3cret")
+
+
+def _call_loop(url: str, worker: int, calls: int) -> Tuple[List[float], float, float]:
+    """Resolve *calls* tokens; return per-call latencies and the loop's wall-clock span."""
+    latencies = []
+    started = time.time()
+    for call in range(calls):
+        kwargs = _credentials(url, worker + call)
+        before = time.perf_counter()
+        backend(**kwargs)
+        latencies.append(time.perf_counter() - before)
+    return latencies, started, time.time()
+
+
+def _percentile(latencies: List[float], q: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+
+@functools.lru_cache(maxsize=None)
+def _reference_seconds() -> float:
+    """Best-of-five time of a fixed CPU workload, measuring this machine's speed."""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for n in range(20000):
+            _plugin_mod._cache_key("https://tss.example.com/SecretServer", f"svc-{n}", "s3cret")
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _check_baseline(
+    benchmark, name: str, latencies: List[float], elapsed: float, percentiles: bool = True
+) -> None:
+    """Record the scenario's results and fail on a regression past the baseline.
+
+    *percentiles* gates p50 / p99 too; without it only the time per call is.
+    """
+    result = {
+        "throughput": len(latencies) / elapsed,
+        "p50": _percentile(latencies, 50),
+        "p99": _percentile(latencies, 99),
+    }
+    benchmark.extra_info.update(result)
+    try:
+        with open(BASELINE_PATH, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    except FileNotFoundError:
+        baseline = {}
+
+    if UPDATE:
+        baseline[name] = {key: round(value, 6) for key, value in result.items()}
+        baseline["reference"] = {"seconds": round(_reference_seconds(), 6)}
+        with open(BASELINE_PATH, "w", encoding="utf-8") as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        return
+    expected = baseline.get(name)
+    if expected is None:
+        pytest.skip(f"No baseline for '{name}'; record one with TSS_BENCH_UPDATE=1")
+
+    # Only a slower machine relaxes the limit; a faster one keeps the baseline's.
+    reference = baseline.get("reference", {}).get("seconds")
+    scale = max(1.0, _reference_seconds() / reference) if reference else 1.0
+    limit = (1.0 + TOLERANCE) * scale
+    benchmark.extra_info["machine_scale"] = scale
+    regressions = []
+    per_call, expected_per_call = 1.0 / result["throughput"], 1.0 / expected["throughput"]
+    if per_call > expected_per_call * limit + FLOOR:
+        regressions.append(
+            f"throughput {result['throughput']:.0f}/s vs baseline {expected['throughput']:.0f}/s"
+        )
+    for key in ("p50", "p99") if percentiles else ():
+        if result[key] > expected[key] * limit + FLOOR:
+            regressions.append(
+                f"{key} {result[key] * 1000:.3f}ms vs baseline {expected[key] * 1000:.3f}ms"
+            )
+    assert not regressions, f"{name} regressed (machine scale {scale:.2f}): " + "; ".join(
+        regressions
+    )
+
+
+def _round_times(benchmark) -> Tuple[List[float], float]:
+    data = list(benchmark.stats.stats.data)
+    return data, sum(data)
+
+
+# ── Scenarios ───────────────────────────────────────────────────────────
+
+
+def test_cached_token(benchmark, server):
+    """Single thread, token cache hit."""
+    kwargs = _credentials(server.url, 0)
+    backend(**kwargs)
+
+    benchmark.pedantic(backend, kwargs=kwargs, rounds=2000, iterations=1, warmup_rounds=50)
+
+    _check_baseline(benchmark, "cached_token", *_round_times(benchmark), percentiles=False)
+
+
+def test_cold_grant(benchmark, server):
+    """Single thread, every call performs a password grant over HTTP."""
+    kwargs = _credentials(server.url, 0)
+
+    def setup():
+        _plugin_mod._token_cache.clear()
+        return (), kwargs
+
+    server.reset_stats()
+    benchmark.pedantic(backend, setup=setup, rounds=100, warmup_rounds=5)
+
+    assert server.stats().get("connections", 0) <= 1
+    _check_baseline(benchmark, "cold_grant", *_round_times(benchmark))
+
+
+def test_threads(benchmark, server):
+    """Eight threads sharing four service accounts."""
+    results: List[Tuple[List[float], float, float]] = []
+
+    def run():
+        results.clear()
+        threads = [
+            threading.Thread(
+                target=lambda w=w: results.append(_call_loop(server.url, w, CALLS_PER_WORKER))
+            )
+            for w in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    server.reset_stats()
+    benchmark.pedantic(run, rounds=1, iterations=1)
+
+    assert server.stats()["POST /oauth2/token"] == ACCOUNTS
+    latencies = [latency for worker in results for latency in worker[0]]
+    elapsed = max(r[2] for r in results) - min(r[1] for r in results)
+    _check_baseline(benchmark, "threads", latencies, elapsed, percentiles=False)
+
+
+def test_processes(benchmark, server):
+    """Four worker processes sharing four service accounts."""
+    context = multiprocessing.get_context("spawn")
+    results: List[Tuple[List[float], float, float]] = []
+
+    with ProcessPoolExecutor(4, mp_context=context) as pool:
+        # Start the workers before timing so interpreter start-up is not measured.
+        list(pool.map(_call_loop, [server.url] * 4, range(4), [0] * 4))
+
+        def run():
+            results[:] = pool.map(_call_loop, [server.url] * 4, range(4), [CALLS_PER_WORKER] * 4)
+
+        benchmark.pedantic(run, rounds=1, iterations=1)
+
+    latencies = [latency for worker in results for latency in worker[0]]
+    elapsed = max(r[2] for r in results) - min(r[1] for r in results)
+    _check_baseline(benchmark, "processes", latencies, elapsed)
@@ -0,0 +1,309 @@
+"""Unit tests for the local token broker."""
+
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.broker import (
+    MAX_FRAME,
+    BrokerClient,
+    BrokerError,
+    BrokerServer,
+    BrokerTimeout,
+    BrokerUnavailable,
+    main,
+    recv_frame,
+    send_frame,
+)
+from credential_plugins.delinea_secret_server import DeadlineExceeded, Grant, backend
+from credential_plugins.fake_server import FakeSecretServer
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+FAKE_SERVER = "https://myserver.example.com/SecretServer"
+FAKE_TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCJ9.fakepayload.fakesig"
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "broker.sock")
+
+
+@pytest.fixture
+def broker(socket_path):
+    """Run a broker whose resolver records calls and fails for 'wrong'."""
+    calls = []
+
+    def resolve(base_url, username, password, domain):
+        calls.append((base_url, username, domain))
+        if password == "wrong":
+            raise PermissionError("Authentication failed")
+        return FAKE_TOKEN
+
+    server = BrokerServer(socket_path, resolve)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    server.calls = calls
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=5)
+
+
+def test_framing_round_trip():
+    """Frames survive a socket pair unchanged."""
+    left, right = socket.socketpair()
+    with left, right:
+        send_frame(left, {"op": "ping", "n": 1})
+        assert recv_frame(right) == {"op": "ping", "n": 1}
+
+
+def test_framing_rejects_oversized_frames():
+    """A peer announcing a huge frame is rejected before reading it."""
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall((MAX_FRAME + 1).to_bytes(4, "big"))
+        with pytest.raises(ValueError, match="too large"):
+            recv_frame(right)
+        with pytest.raises(ValueError, match="too large"):
+            send_frame(left, {"op": "x" * MAX_FRAME})
+
+
+def test_broker_socket_is_owner_only(broker):
+    """The socket file is created with 0600 permissions."""
+    assert stat.S_IMODE(os.stat(broker.path).st_mode) == 0o600
+
+
+def test_broker_replaces_leftover_socket_file(socket_path):
+    """A socket file left by a crashed broker does not stop a new one binding."""
+    open(socket_path, "w").close()
+    server = BrokerServer(socket_path, lambda *args: FAKE_TOKEN)
+    try:
+        assert stat.S_ISSOCK(os.stat(socket_path).st_mode)
+    finally:
+        server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_client_resolves_token(broker):
+    """The client returns the broker's token over a persistent connection."""
+    client = BrokerClient(broker.path)
+    assert client.token(FAKE_SERVER, "appuser", "s3cret") == FAKE_TOKEN
+    assert client.token(FAKE_SERVER, "appuser", "s3cret", "CORP") == FAKE_TOKEN
+    assert broker.calls == [(FAKE_SERVER, "appuser", None), (FAKE_SERVER, "appuser", "CORP")]
+    client.close()
+
+
+def test_client_propagates_broker_errors(broker):
+    """Resolution errors come back as BrokerError without the password."""
+    client = BrokerClient(broker.path)
+    with pytest.raises(BrokerError, match="Authentication failed") as excinfo:
+        client.token(FAKE_SERVER, "appuser", "wrong")
+    assert excinfo.value.error_type == "PermissionError"
+    assert "wrong" not in str(excinfo.value)
+    client.close()
+
+
+def test_client_unavailable_without_broker(socket_path):
+    """A missing socket raises BrokerUnavailable."""
+    with pytest.raises(BrokerUnavailable):
+        BrokerClient(socket_path).token(FAKE_SERVER, "appuser", "s3cret")
+
+
+def test_client_reconnects_after_broker_restart(socket_path, broker):
+    """A stale pooled connection is replaced transparently."""
+    client = BrokerClient(socket_path)
+    assert client.token(FAKE_SERVER, "appuser", "s3cret") == FAKE_TOKEN
+    client._local.sock.shutdown(socket.SHUT_RDWR)
+
+    assert client.token(FAKE_SERVER, "appuser", "s3cret") == FAKE_TOKEN
+    client.close()
+
+
+def test_client_unavailable_when_retry_fails(socket_path):
+    """A connection dropped again after the stale-socket retry raises BrokerUnavailable."""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+    accepted = []
+
+    def hang_up():
+        for _ in range(2):
+            conn, _ = listener.accept()
+            accepted.append(conn)
+            conn.close()
+
+    thread = threading.Thread(target=hang_up, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(BrokerUnavailable):
+            BrokerClient(socket_path).token(FAKE_SERVER, "appuser", "s3cret")
+    finally:
+        thread.join(timeout=5)
+        listener.close()
+    assert len(accepted) == 2
+
+
+@pytest.fixture
+def slow_broker(socket_path):
+    """Run a broker whose resolver takes two seconds."""
+    release = threading.Event()
+
+    def resolve(base_url, username, password, domain):
+        release.wait(2)
+        return FAKE_TOKEN
+
+    server = BrokerServer(socket_path, resolve)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    release.set()
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=5)
+
+
+def test_client_times_out_per_request(slow_broker):
+    """A request waits at most its own timeout, and the client stays usable."""
+    client = BrokerClient(slow_broker.path)
+    started = time.monotonic()
+    with pytest.raises(BrokerTimeout):
+        client.token(FAKE_SERVER, "appuser", "s3cret", timeout=0.2)
+    assert time.monotonic() - started < 1
+    assert client.request({"op": "ping"}) == {"ok": True}
+    client.close()
+
+
+def test_backend_honours_deadline_with_broker(slow_broker):
+    """A slow broker raises DeadlineExceeded at the deadline, without a direct grant."""
+    with patch.object(_plugin_mod, "BROKER_SOCKET", slow_broker.path), patch.object(
+        _plugin_mod, "_fetch_grant"
+    ) as mock_fetch:
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            backend(base_url=FAKE_SERVER, username="appuser", password="s3cret", timeout="0.3")
+
+    assert time.monotonic() - started < 1
+    mock_fetch.assert_not_called()
+
+
+def test_backend_uses_broker(broker):
+    """backend() resolves through the broker when TSS_BROKER_SOCKET is set."""
+    with patch.object(_plugin_mod, "BROKER_SOCKET", broker.path), patch.object(
+        _plugin_mod, "_fetch_grant"
+    ) as mock_fetch:
+        result = backend(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+
+    assert result == FAKE_TOKEN
+    mock_fetch.assert_not_called()
+
+
+@pytest.fixture
+def granting_broker(socket_path):
+    """Run a broker that grants from a fake Secret Server and keeps its own token."""
+    with FakeSecretServer() as fake:
+        held = {}
+        renewals = []
+
+        def resolve(base_url, username, password, domain):
+            if "token" not in held:
+                held["token"] = _plugin_mod._fetch_grant(base_url, username, password).access_token
+            return held["token"]
+
+        def renew(base_url, username, password, domain, rejected):
+            renewals.append(rejected)
+            if held.get("token") == rejected:
+                del held["token"]
+            return resolve(base_url, username, password, domain)
+
+        server = BrokerServer(socket_path, resolve, renew)
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        server.fake, server.renewals = fake, renewals
+        yield server
+        server.shutdown()
+        server.server_close()
+        thread.join(timeout=5)
+
+
+def test_backend_renews_rejected_tokens_through_broker(granting_broker):
+    """A token the API rejects is replaced in the broker, so later calls skip the 401."""
+    fake = granting_broker.fake
+    secret = dict(
+        base_url=fake.url,
+        username="appuser",
+        password="s3cret",
+        identifier="secret",
+        secret_id="1",
+        secret_field="password",
+    )
+    with patch.object(_plugin_mod, "BROKER_SOCKET", granting_broker.path):
+        assert backend(**secret) == "hunter2"
+        fake.revoke_tokens()
+        fake.reset_stats()
+        for _ in range(3):
+            _plugin_mod._secret_cache.clear()
+            assert backend(**secret) == "hunter2"
+
+    assert len(granting_broker.renewals) == 1
+    assert fake.stats()["POST /oauth2/token"] == 1
+    assert fake.stats()["GET /api/v1/secrets/{id}"] == 4
+
+
+def test_broker_refuses_renew_without_renewer(broker):
+    """A broker built without a renewer reports renew as an unknown op."""
+    client = BrokerClient(broker.path)
+    with pytest.raises(BrokerError, match="Unknown op 'renew'"):
+        client.renew(FAKE_TOKEN, FAKE_SERVER, "appuser", "s3cret")
+    client.close()
+
+
+def test_main_serves_tokens_until_interrupted(socket_path):
+    """tss-token-broker resolves and renews tokens, then cleans up on Ctrl-C."""
+    serve_forever = BrokerServer.serve_forever
+    replies = []
+
+    def serve_then_interrupt(server):
+        thread = threading.Thread(target=serve_forever, args=(server, 0.05), daemon=True)
+        thread.start()
+        client = BrokerClient(socket_path)
+        try:
+            replies.append(client.token(FAKE_SERVER, "appuser", "s3cret"))
+            replies.append(client.renew(replies[0], FAKE_SERVER, "appuser", "s3cret"))
+        finally:
+            client.close()
+            server.shutdown()
+            thread.join(timeout=5)
+        raise KeyboardInterrupt
+
+    grants = iter([Grant("first", 1200, None, None), Grant("second", 1200, None, None)])
+    with patch.object(BrokerServer, "serve_forever", serve_then_interrupt), patch.object(
+        _plugin_mod, "_fetch_grant", side_effect=lambda *args: next(grants)
+    ), patch.object(_plugin_mod._token_refresher, "ratio", 0.0):
+        try:
+            assert main(["--socket", socket_path, "--refresh-ratio", "0"]) == 0
+        finally:
+            _plugin_mod._token_cache.clear()
+
+    assert replies == ["first", "second"]
+    assert not os.path.exists(socket_path)
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_backend_falls_back_without_broker(mock_cls, socket_path):
+    """backend() resolves directly when the broker is not running."""
+    mock_cls.return_value.get_access_token.return_value = FAKE_TOKEN
+    with patch.object(_plugin_mod, "BROKER_SOCKET", socket_path):
+        result = backend(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+
+    assert result == FAKE_TOKEN
+    mock_cls.assert_called_once()
@@ -1,16 +1,34 @@
 """Unit tests for the Delinea Secret Server credential plugin."""
 
+import asyncio
+import itertools
 import sys
+import threading
+import time
+import traceback
 from unittest.mock import MagicMock, patch
 
 import pytest
+from delinea.secrets.server import SecretServerError
 
 import credential_plugins.delinea_secret_server  # noqa: F401
 from credential_plugins.delinea_secret_server import (
     INPUTS,
+    DeadlineExceeded,
+    Grant,
+    SecretCache,
+    SingleFlight,
+    TokenCache,
+    TokenRefresher,
+    _cache_key,
+    _fetch_grant,
     _get_authorizer,
+    _http_timeout,
+    abackend,
+    aresolve_many,
     backend,
     delinea_secret_server,
+    resolve_many,
 )
 
 # The __init__.py re-export shadows the module name on the package object,
@@ -22,6 +40,27 @@ FAKE_SERVER = "https://myserver.example.com/SecretServer"
 FAKE_TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCJ9.fakepayload.fakesig"
 
 
+@pytest.fixture(autouse=True)
+def _clear_token_cache():
+    """Every test starts with empty module-level caches and closed circuits."""
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    _plugin_mod._auth_errors.clear()
+    _plugin_mod._circuits.clear()
+    yield
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    _plugin_mod._auth_errors.clear()
+    _plugin_mod._circuits.clear()
+
+
+def _fake_authorizer(token=FAKE_TOKEN, expires_in=1200):
+    """Build an authorizer mock that reports a real ``access_grant``."""
+    authorizer = MagicMock(get_access_token=MagicMock(return_value=token))
+    authorizer.access_grant = {"access_token": token, "expires_in": expires_in}
+    return authorizer
+
+
 # ── _get_authorizer tests ───────────────────────────────────────────────
 
 
@@ -149,13 +188,818 @@ def test_backend_sdk_error_propagates(mock_cls):
         )
 
 
+# ── Token cache tests ───────────────────────────────────────────────────
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_backend_token_is_cached(mock_cls):
+    """A second launch for the same identity is served without a new grant."""
+    mock_cls.return_value = _fake_authorizer()
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+
+    assert backend(**kwargs) == FAKE_TOKEN
+    assert backend(**kwargs) == FAKE_TOKEN
+    assert mock_cls.call_count == 1
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_backend_cache_keyed_by_password(mock_cls):
+    """A rotated password never reuses the token of the previous password."""
+    mock_cls.side_effect = [_fake_authorizer("tok-a"), _fake_authorizer("tok-b")]
+
+    assert backend(base_url=FAKE_SERVER, username="appuser", password="old") == "tok-a"
+    assert backend(base_url=FAKE_SERVER, username="appuser", password="new") == "tok-b"
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_backend_skips_cache_when_lifetime_within_margin(mock_cls):
+    """Tokens that would expire inside the safety margin are not cached."""
+    mock_cls.return_value = _fake_authorizer(expires_in=_plugin_mod.TOKEN_CACHE_MARGIN)
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+
+    backend(**kwargs)
+    backend(**kwargs)
+    assert mock_cls.call_count == 2
+
+
+def test_cache_key_does_not_contain_password():
+    """Only a digest of the password is part of the cache key."""
+    key = _cache_key(FAKE_SERVER + "/", "appuser", "s3cret", None)
+    assert "s3cret" not in key
+    assert key[0] == FAKE_SERVER
+
+
+def test_token_cache_expires_entries():
+    """Entries are dropped once ``expires_in - margin`` has elapsed."""
+    cache = TokenCache(max_size=4, margin=10)
+    key = _cache_key(FAKE_SERVER, "appuser", "s3cret")
+    with patch.object(_plugin_mod.time, "monotonic", return_value=1000.0):
+        cache.put(key, FAKE_TOKEN, 60)
+    with patch.object(_plugin_mod.time, "monotonic", return_value=1049.0):
+        assert cache.get(key) == FAKE_TOKEN
+    with patch.object(_plugin_mod.time, "monotonic", return_value=1050.0):
+        assert cache.get(key) is None
+    assert len(cache) == 0
+
+
+def test_token_cache_evicts_least_recently_used():
+    """The cache never grows past ``max_size``."""
+    cache = TokenCache(max_size=2, margin=0)
+    keys = [_cache_key(FAKE_SERVER, f"user{i}", "pw") for i in range(3)]
+    cache.put(keys[0], "t0", 600)
+    cache.put(keys[1], "t1", 600)
+    cache.get(keys[0])
+    cache.put(keys[2], "t2", 600)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "t0"
+    assert cache.get(keys[2]) == "t2"
+
+
+def test_env_knobs_fall_back_on_invalid_values(monkeypatch):
+    """A malformed tuning variable keeps the default instead of failing the import."""
+    monkeypatch.setenv("TSS_TEST_KNOB", "lots")
+    assert _plugin_mod._env_int("TSS_TEST_KNOB", 7) == 7
+    assert _plugin_mod._env_float("TSS_TEST_KNOB", 1.5) == 1.5
+    monkeypatch.setenv("TSS_TEST_KNOB", "3")
+    assert _plugin_mod._env_int("TSS_TEST_KNOB", 7) == 3
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_grant_rechecks_cache_inside_flight(mock_fetch):
+    """A token cached while the caller queued for the flight is used without a grant."""
+    _plugin_mod._token_cache.put(KEY, FAKE_TOKEN, 1200)
+    with patch.object(_plugin_mod._token_cache, "get", return_value=None):
+        assert backend(base_url=FAKE_SERVER, username="appuser", password="s3cret") == FAKE_TOKEN
+    mock_fetch.assert_not_called()
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_renewal_uses_token_already_replaced(mock_fetch):
+    """A rejected token another caller already replaced is not granted again."""
+    _plugin_mod._token_cache.put(KEY, "fresh", 1200)
+    assert _plugin_mod._renew_token(CREDS, "stale") == "fresh"
+    mock_fetch.assert_not_called()
+
+
+def test_non_auth_api_errors_are_not_renewed():
+    """Only a rejected token triggers a new grant; other API errors propagate."""
+    _plugin_mod._token_cache.put(KEY, FAKE_TOKEN, 1200)
+
+    def fail(token):
+        raise ValueError("not found")
+
+    with patch.object(_plugin_mod, "_renew_token") as mock_renew, pytest.raises(ValueError):
+        _plugin_mod._with_token(CREDS, fail)
+    mock_renew.assert_not_called()
+
+
+# ── Negative cache tests ────────────────────────────────────────────────
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_rejected_grant_is_remembered(mock_cls):
+    """A rejected password fails again at once, without another grant."""
+    from delinea.secrets.server import SecretServerClientError
+
+    mock_cls.return_value.get_access_token.side_effect = SecretServerClientError("invalid_grant")
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="stale")
+
+    for _ in range(3):
+        with pytest.raises(SecretServerClientError):
+            backend(**kwargs)
+    assert mock_cls.call_count == 1
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_remembered_error_is_raised_afresh(mock_cls):
+    """Each hit raises a new error, so its traceback does not grow or pin old calls."""
+    from delinea.secrets.server import SecretServerClientError
+
+    mock_cls.return_value.get_access_token.side_effect = SecretServerClientError("invalid_grant")
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="stale")
+    with pytest.raises(SecretServerClientError):
+        backend(**kwargs)
+
+    depths = []
+    for _ in range(5):
+        with pytest.raises(SecretServerClientError) as info:
+            backend(**kwargs)
+        assert info.value.message == "invalid_grant"
+        depths.append(len(traceback.extract_tb(info.value.__traceback__)))
+    assert len(set(depths)) == 1
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_new_password_bypasses_remembered_error(mock_cls):
+    """Rotating the password is tried immediately."""
+    from delinea.secrets.server import SecretServerClientError
+
+    mock_cls.side_effect = [SecretServerClientError("invalid_grant"), _fake_authorizer()]
+    with pytest.raises(SecretServerClientError):
+        backend(base_url=FAKE_SERVER, username="appuser", password="stale")
+    assert backend(base_url=FAKE_SERVER, username="appuser", password="rotated") == FAKE_TOKEN
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_server_errors_are_not_remembered(mock_cls):
+    """Only rejected credentials are cached; outages are retried."""
+    mock_cls.side_effect = [ConnectionError("refused"), _fake_authorizer()]
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+    with pytest.raises(ConnectionError):
+        backend(**kwargs)
+    assert backend(**kwargs) == FAKE_TOKEN
+
+
+def test_auth_error_cache_is_bounded_and_can_be_disabled():
+    """The oldest error is evicted when full; a zero TTL remembers nothing."""
+    cache = _plugin_mod.AuthErrorCache(max_size=1, ttl=10)
+    cache.put("a", ValueError("a"))
+    cache.put("b", ValueError("b"))
+    assert len(cache) == 1
+    assert cache.get("a") is None and cache.get("b").args == ("b",)
+
+    disabled = _plugin_mod.AuthErrorCache(max_size=1, ttl=0)
+    disabled.put("a", ValueError("a"))
+    assert len(disabled) == 0
+
+
+def test_auth_error_cache_expires_entries():
+    """Remembered errors are dropped after the TTL."""
+    cache = _plugin_mod.AuthErrorCache(max_size=4, ttl=10)
+    error = ValueError("rejected")
+    with patch.object(_plugin_mod.time, "monotonic", return_value=0.0):
+        cache.put("k", error)
+        remembered = cache.get("k")
+        assert type(remembered) is ValueError and remembered.args == ("rejected",)
+    with patch.object(_plugin_mod.time, "monotonic", return_value=11.0):
+        assert cache.get("k") is None
+
+
+# ── Single-flight tests ─────────────────────────────────────────────────
+
+
+def _run_concurrently(fn, count):
+    """Call *fn* from *count* threads released at once; collect results/errors."""
+    barrier = threading.Barrier(count)
+    results, errors = [], []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(fn())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    return results, errors
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    """Concurrent callers for one key share a single execution."""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "value"
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results, errors = _run_concurrently(lambda: flight.do("k", slow), 8)
+    timer.cancel()
+
+    assert errors == []
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_single_flight_shares_errors():
+    """Waiters re-raise the leader's exception instead of retrying."""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        release.wait(timeout=5)
+        raise RuntimeError("Authentication failed")
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results, errors = _run_concurrently(lambda: flight.do("k", failing), 4)
+    timer.cancel()
+
+    assert results == []
+    assert len(errors) == 4
+    assert all(str(e) == "Authentication failed" for e in errors)
+    assert len(calls) == 1
+
+
+def test_single_flight_runs_again_after_completion():
+    """A finished flight does not pin its result; the next call runs anew."""
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_backend_concurrent_launches_share_one_grant(mock_fetch):
+    """A launch burst for one identity issues a single password grant."""
+    release = threading.Event()
+
+    def grant(*args):
+        release.wait(timeout=5)
+        return Grant(FAKE_TOKEN, 1200, None, None)
+
+    mock_fetch.side_effect = grant
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results, errors = _run_concurrently(
+        lambda: backend(base_url=FAKE_SERVER, username="appuser", password="s3cret"), 16
+    )
+    timer.cancel()
+
+    assert errors == []
+    assert results == [FAKE_TOKEN] * 16
+    assert mock_fetch.call_count == 1
+
+
+# ── Background refresh tests ────────────────────────────────────────────
+
+CREDS = (FAKE_SERVER, "appuser", "s3cret", None)
+KEY = _cache_key(*CREDS[:3])
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_fetch_grant_reads_refresh_token(mock_cls):
+    """_fetch_grant() keeps the refresh token and token URL from the SDK."""
+    authorizer = _fake_authorizer()
+    authorizer.access_grant["refresh_token"] = "refresh-1"
+    authorizer.token_url = FAKE_SERVER + "/oauth2/token"
+    mock_cls.return_value = authorizer
+
+    grant = _fetch_grant(*CREDS)
+
+    assert grant == Grant(FAKE_TOKEN, 1200, "refresh-1", FAKE_SERVER + "/oauth2/token")
+
+
+def test_refresher_disabled_by_default():
+    """Background refresh is opt-in."""
+    refresher = TokenRefresher(TokenCache(), ratio=0)
+    refresher.schedule(KEY, Grant(FAKE_TOKEN, 1200, None, None), CREDS)
+    assert len(refresher) == 0
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+@patch.object(_plugin_mod, "_refresh_grant")
+def test_refresher_prefers_refresh_token(mock_refresh, mock_fetch):
+    """A grant with a refresh token is renewed without the password grant."""
+    cache = TokenCache(margin=0)
+    refresher = TokenRefresher(cache, ratio=0.8)
+    mock_refresh.return_value = Grant("renewed", 1200, "refresh-2", "url")
+    entry = _plugin_mod._RefreshEntry(
+        CREDS, Grant(FAKE_TOKEN, 1200, "refresh-1", "url"), 0, time.monotonic()
+    )
+
+    with patch.object(refresher, "_ensure_thread"):
+        refresher._refresh(KEY, entry)
+
+    assert cache.get(KEY) == "renewed"
+    mock_fetch.assert_not_called()
+    assert len(refresher) == 1
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+@patch.object(_plugin_mod, "_refresh_grant")
+def test_refresher_falls_back_to_password_grant(mock_refresh, mock_fetch):
+    """A rejected refresh token falls back to the _get_authorizer path."""
+    cache = TokenCache(margin=0)
+    refresher = TokenRefresher(cache, ratio=0.8)
+    mock_refresh.side_effect = Exception("invalid_grant")
+    mock_fetch.return_value = Grant("regranted", 1200, None, None)
+    entry = _plugin_mod._RefreshEntry(
+        CREDS, Grant(FAKE_TOKEN, 1200, "refresh-1", "url"), 0, time.monotonic()
+    )
+
+    with patch.object(refresher, "_ensure_thread"):
+        refresher._refresh(KEY, entry)
+
+    assert cache.get(KEY) == "regranted"
+    mock_fetch.assert_called_once_with(*CREDS)
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_refresher_drops_idle_identities(mock_fetch):
+    """Identities not requested within the idle timeout are not renewed."""
+    cache = TokenCache(margin=0)
+    refresher = TokenRefresher(cache, ratio=0.8, idle_timeout=60)
+    entry = _plugin_mod._RefreshEntry(
+        CREDS, Grant(FAKE_TOKEN, 1200, None, None), 0, time.monotonic() - 61
+    )
+
+    refresher._refresh(KEY, entry)
+
+    mock_fetch.assert_not_called()
+    assert cache.get(KEY) is None
+    assert len(refresher) == 0
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_refresher_thread_renews_before_expiry(mock_fetch):
+    """The daemon thread swaps in a fresh token before the old one expires."""
+    cache = TokenCache(margin=0)
+    refresher = TokenRefresher(cache, ratio=0.5)
+    mock_fetch.return_value = Grant("renewed", 600, None, None)
+    cache.put(KEY, FAKE_TOKEN, 0.2)
+    try:
+        refresher.schedule(KEY, Grant(FAKE_TOKEN, 0.2, None, None), CREDS)
+        deadline = time.monotonic() + 5
+        while cache.get(KEY) != "renewed" and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        refresher.stop()
+
+    assert cache.get(KEY) == "renewed"
+
+
+def test_refresher_touch_keeps_identity_in_use():
+    """A request for a scheduled identity resets its idle clock."""
+    refresher = TokenRefresher(TokenCache(margin=0), ratio=0.8, idle_timeout=60)
+    with patch.object(refresher, "_ensure_thread"):
+        refresher.schedule(KEY, Grant(FAKE_TOKEN, 1200, None, None), CREDS, last_used=0.0)
+        refresher.touch(KEY)
+        refresher.touch(("unscheduled",))
+
+    assert refresher._entries[KEY].last_used > 0.0
+
+
+@patch.object(_plugin_mod, "_fetch_grant", side_effect=ConnectionError("refused"))
+@patch.object(_plugin_mod, "_refresh_grant", side_effect=Exception("invalid_grant"))
+def test_refresher_keeps_current_token_when_renewal_fails(mock_refresh, mock_fetch, caplog):
+    """When both grant types fail, the current token stays until it expires."""
+    cache = TokenCache(margin=0)
+    cache.put(KEY, FAKE_TOKEN, 1200)
+    refresher = TokenRefresher(cache, ratio=0.8)
+    entry = _plugin_mod._RefreshEntry(
+        CREDS, Grant(FAKE_TOKEN, 1200, "refresh-1", "url"), 0, time.monotonic()
+    )
+
+    refresher._refresh(KEY, entry)
+
+    assert cache.get(KEY) == FAKE_TOKEN
+    assert "Background token refresh failed: ConnectionError" in caplog.text
+    assert "refused" not in caplog.text
+
+
+# ── Async and batched resolution tests ──────────────────────────────────
+
+
+def _grant_per_user(base_url, username, *_):
+    return Grant(f"tok-{username}", 1200, None, None)
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_abackend_matches_backend(mock_cls):
+    """abackend() returns the same values as backend()."""
+    mock_cls.return_value = _fake_authorizer()
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+
+    assert asyncio.run(abackend(**kwargs)) == FAKE_TOKEN
+    assert asyncio.run(abackend(identifier="base_url", **kwargs)) == FAKE_SERVER
+    assert backend(**kwargs) == FAKE_TOKEN
+    mock_cls.assert_called_once()
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_abackend_serves_cache_hits_on_the_loop(mock_fetch):
+    """A cached token is returned without handing off to a worker thread."""
+    mock_fetch.return_value = Grant(FAKE_TOKEN, 1200, None, None)
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+    backend(**kwargs)
+
+    with patch.object(_plugin_mod, "_get_async_executor") as mock_executor:
+        assert asyncio.run(abackend(**kwargs)) == FAKE_TOKEN
+    mock_executor.assert_not_called()
+
+
+@patch.object(_plugin_mod, "_fetch_grant", side_effect=_grant_per_user)
+def test_resolve_many_dedupes_and_keeps_order(mock_fetch):
+    """Duplicate identities are granted once; results follow input order."""
+    requests = [
+        dict(base_url=FAKE_SERVER, username=name, password="s3cret")
+        for name in ("a", "b", "a", "c", "b")
+    ]
+
+    results = resolve_many(requests, max_concurrency=2)
+
+    assert [r.value for r in results] == ["tok-a", "tok-b", "tok-a", "tok-c", "tok-b"]
+    assert all(r.error is None for r in results)
+    assert mock_fetch.call_count == 3
+
+
+def test_resolve_many_bounds_concurrency():
+    """No more than max_concurrency distinct grants run at once."""
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def fetch(*_):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return Grant(FAKE_TOKEN, 1200, None, None)
+
+    requests = [dict(base_url=FAKE_SERVER, username=f"u{i}", password="p") for i in range(8)]
+    with patch.object(_plugin_mod, "_fetch_grant", side_effect=fetch):
+        resolve_many(requests, max_concurrency=3)
+
+    assert peak[0] == 3
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_resolve_many_reports_errors_per_item(mock_fetch):
+    """A failing item carries its exception; the others still resolve."""
+
+    def fetch(base_url, username, password, domain=None):
+        if password == "wrong":
+            raise PermissionError("Authentication failed")
+        return Grant(FAKE_TOKEN, 1200, None, None)
+
+    mock_fetch.side_effect = fetch
+    results = resolve_many(
+        [
+            dict(base_url=FAKE_SERVER, username="appuser", password="s3cret"),
+            dict(base_url=FAKE_SERVER, username="appuser", password="wrong"),
+            dict(base_url=FAKE_SERVER, username="appuser", password="s3cret", identifier="x"),
+        ]
+    )
+
+    assert results[0] == (FAKE_TOKEN, None)
+    assert isinstance(results[1].error, PermissionError)
+    assert isinstance(results[2].error, ValueError)
+
+
+def test_resolve_many_accepts_empty_batch():
+    """An empty batch resolves to an empty list without starting a pool."""
+    assert resolve_many([]) == []
+
+
+@patch.object(_plugin_mod, "_fetch_grant", side_effect=PermissionError("Authentication failed"))
+def test_aresolve_many_reports_errors_per_item(mock_fetch):
+    """The async batch API carries each failure in its item instead of raising."""
+    results = asyncio.run(
+        aresolve_many([dict(base_url=FAKE_SERVER, username="appuser", password="wrong")])
+    )
+
+    assert results[0].value is None
+    assert isinstance(results[0].error, PermissionError)
+
+
+def test_abackend_resolves_secrets_off_the_loop(secret_api):
+    """Secret lookups are not answered from the token fast path."""
+    assert asyncio.run(abackend(**_secret_kwargs("password"))) == "hunter2"
+
+
+@patch.object(_plugin_mod, "_fetch_grant", side_effect=_grant_per_user)
+def test_aresolve_many_dedupes_and_keeps_order(mock_fetch):
+    """The async batch API dedupes identities and keeps input order."""
+    requests = [
+        dict(base_url=FAKE_SERVER, username="a", password="s3cret"),
+        dict(base_url=FAKE_SERVER, username="b", password="s3cret"),
+        dict(base_url=FAKE_SERVER, username="a", password="s3cret"),
+        dict(base_url=FAKE_SERVER, username="a", password="s3cret", identifier="base_url"),
+    ]
+
+    results = asyncio.run(aresolve_many(requests, max_concurrency=2))
+
+    assert [r.value for r in results] == ["tok-a", "tok-b", "tok-a", FAKE_SERVER]
+    assert mock_fetch.call_count == 2
+
+
+# ── Secret field tests ──────────────────────────────────────────────────
+
+SECRET_JSON = {
+    "id": 42,
+    "name": "db-admin",
+    "items": [
+        {"fieldName": "Username", "slug": "username", "itemValue": "dbadmin"},
+        {"fieldName": "Password", "slug": "password", "itemValue": "hunter2"},
+        {"fieldName": "Notes", "slug": "notes", "itemValue": None},
+    ],
+}
+
+
+def _secret_kwargs(field, password="s3cret"):
+    return dict(
+        base_url=FAKE_SERVER,
+        username="appuser",
+        password=password,
+        identifier="secret",
+        secret_id="42",
+        secret_field=field,
+    )
+
+
+@pytest.fixture
+def secret_api():
+    """Serve SECRET_JSON for any secret GET and a fixed token for any grant."""
+    with patch.object(_plugin_mod, "_get_json", return_value=SECRET_JSON) as mock_get, patch.object(
+        _plugin_mod, "_fetch_grant", return_value=Grant(FAKE_TOKEN, 1200, None, None)
+    ):
+        yield mock_get
+
+
+def test_backend_returns_secret_fields(secret_api):
+    """Fields are matched by slug or display name, case-insensitively."""
+    assert backend(**_secret_kwargs("password")) == "hunter2"
+    assert backend(**_secret_kwargs("Username")) == "dbadmin"
+    assert backend(**_secret_kwargs("notes")) == ""
+    secret_api.assert_called_once_with(f"{FAKE_SERVER}/api/v1/secrets/42", FAKE_TOKEN, None)
+
+
+def test_backend_secret_fetched_once_per_launch(secret_api):
+    """Concurrent lookups of several fields of one secret share one fetch."""
+    next_field = itertools.cycle(["username", "password"]).__next__
+    results, errors = _run_concurrently(lambda: backend(**_secret_kwargs(next_field())), 10)
+
+    assert errors == []
+    assert sorted(results) == sorted(["dbadmin", "hunter2"] * 5)
+    assert secret_api.call_count == 1
+
+
+def test_backend_secret_cache_keyed_by_identity(secret_api):
+    """Another identity fetches the secret itself instead of reading the cache."""
+    backend(**_secret_kwargs("password"))
+    backend(**_secret_kwargs("password", password="other"))
+    assert secret_api.call_count == 2
+
+
+def test_backend_secret_unknown_field(secret_api):
+    """A missing field raises ValueError naming the field, not its values."""
+    with pytest.raises(ValueError, match="no field 'pin'") as excinfo:
+        backend(**_secret_kwargs("pin"))
+    assert "hunter2" not in str(excinfo.value)
+
+
+def test_backend_secret_requires_selectors():
+    """identifier='secret' without secret_id / secret_field is rejected."""
+    kwargs = _secret_kwargs("password")
+    del kwargs["secret_id"]
+    with pytest.raises(ValueError, match="secret_id"):
+        backend(**kwargs)
+
+
+def test_secret_cache_expires_and_is_bounded():
+    """Entries expire after the TTL and the oldest is evicted when full."""
+    cache = SecretCache(max_size=2, ttl=30)
+    with patch("credential_plugins.delinea_secret_server.time.monotonic", return_value=0.0):
+        cache.put(("a", "1"), {"f": "1"})
+        cache.put(("a", "2"), {"f": "2"})
+        cache.put(("a", "3"), {"f": "3"})
+        assert cache.get(("a", "1")) is None
+        assert cache.get(("a", "3")) == {"f": "3"}
+    with patch("credential_plugins.delinea_secret_server.time.monotonic", return_value=31.0):
+        assert cache.get(("a", "3")) is None
+
+
+def test_secret_cache_can_be_disabled():
+    """A zero TTL turns the secret cache off."""
+    cache = SecretCache(max_size=2, ttl=0)
+    cache.put(("a", "1"), {"f": "1"})
+    assert len(cache) == 0
+
+
+def test_secret_fetch_rechecks_cache_inside_flight(secret_api):
+    """A secret cached while the caller queued for the flight is not fetched again."""
+    _plugin_mod._secret_cache.put((KEY, "42"), {"password": "cached"})
+    with patch.object(_plugin_mod._secret_cache, "get", return_value=None):
+        assert backend(**_secret_kwargs("password")) == "cached"
+    secret_api.assert_not_called()
+
+
+def test_api_url_resolves_platform_vault():
+    """On Platform, the default active vault is looked up once per base URL."""
+    vaults = {
+        "vaults": [
+            {"isDefault": True, "isActive": False, "connection": {"url": "https://old"}},
+            {"isDefault": True, "isActive": True, "connection": {"url": "https://vault/"}},
+        ]
+    }
+    with patch.object(_plugin_mod, "_server_types", {FAKE_SERVER: "platform"}), patch.object(
+        _plugin_mod, "_vault_urls", {}
+    ), patch.object(_plugin_mod, "_get_json", return_value=vaults) as mock_get:
+        assert _plugin_mod._api_url(FAKE_SERVER, FAKE_TOKEN) == "https://vault/api/v1"
+        assert _plugin_mod._api_url(FAKE_SERVER, FAKE_TOKEN) == "https://vault/api/v1"
+        assert mock_get.call_count == 1
+
+        mock_get.return_value = {"vaults": []}
+        _plugin_mod._vault_urls.clear()
+        with pytest.raises(SecretServerError):
+            _plugin_mod._api_url(FAKE_SERVER, FAKE_TOKEN)
+
+
+def test_api_get_uses_first_listed_endpoint():
+    """With several endpoints listed, a healthy first node serves the request."""
+    with patch.object(_plugin_mod, "_get_json", return_value={"id": 1}) as mock_get:
+        result = _plugin_mod._api_get("https://a.example,https://b.example", FAKE_TOKEN, "/x")
+
+    assert result == {"id": 1}
+    mock_get.assert_called_once_with("https://a.example/api/v1/x", FAKE_TOKEN, None)
+
+
+# ── Deadline tests ──────────────────────────────────────────────────────
+
+
+def test_http_timeout_is_capped_by_deadline():
+    """Connect / read timeouts shrink to the time left in the call."""
+    assert _http_timeout() == (_plugin_mod.HTTP_CONNECT_TIMEOUT, _plugin_mod.HTTP_TIMEOUT)
+    reset = _plugin_mod._deadline.set(time.monotonic() + 2)
+    try:
+        connect, read = _http_timeout()
+        assert connect <= min(_plugin_mod.HTTP_CONNECT_TIMEOUT, 2)
+        assert 1 < read <= 2
+    finally:
+        _plugin_mod._deadline.reset(reset)
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_backend_raises_when_deadline_passes(mock_cls):
+    """Work left after the deadline fails fast with DeadlineExceeded."""
+
+    def slow_authorizer(*args):
+        time.sleep(0.1)
+        _http_timeout()  # the next request would start past the deadline
+        return _fake_authorizer()
+
+    mock_cls.side_effect = slow_authorizer
+    with pytest.raises(DeadlineExceeded):
+        backend(base_url=FAKE_SERVER, username="appuser", password="s3cret", timeout="0.05")
+
+
+def test_single_flight_waiter_stops_at_deadline():
+    """A waiter does not outlive its own deadline behind a stalled leader."""
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+
+    reset = _plugin_mod._deadline.set(time.monotonic() + 0.05)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            flight.do("k", lambda: None)
+    finally:
+        _plugin_mod._deadline.reset(reset)
+        release.set()
+        leader.join()
+
+
+def _with_deadline(seconds, fn):
+    """Run *fn* under a call deadline *seconds* from now."""
+    reset = _plugin_mod._deadline.set(time.monotonic() + seconds)
+    try:
+        return fn()
+    finally:
+        _plugin_mod._deadline.reset(reset)
+
+
+def test_single_flight_waiter_outlives_leader_deadline():
+    """A waiter with time left runs the call again when the leader's deadline expires."""
+    flight = SingleFlight()
+    calls = []
+
+    def grant():
+        calls.append(1)
+        if len(calls) == 1:
+            while True:  # the first leader stalls until its deadline
+                _plugin_mod._remaining()
+                time.sleep(0.01)
+        return "value"
+
+    leader_errors = []
+
+    def leader():
+        try:
+            _with_deadline(0.3, lambda: flight.do("k", grant))
+        except DeadlineExceeded as exc:
+            leader_errors.append(exc)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    time.sleep(0.1)
+    try:
+        assert _with_deadline(30, lambda: flight.do("k", grant)) == "value"
+    finally:
+        thread.join()
+
+    assert len(leader_errors) == 1
+    assert len(calls) == 2
+
+
+def test_single_flight_shares_leader_timeouts_before_its_deadline():
+    """A leader timing out with its deadline still ahead is a real failure and is shared."""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        release.wait(timeout=5)
+        raise TimeoutError("read timed out")
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results, errors = _run_concurrently(
+        lambda: _with_deadline(30, lambda: flight.do("k", failing)), 4
+    )
+    timer.cancel()
+
+    assert results == []
+    assert len(errors) == 4
+    assert len(calls) == 1
+
+
+def test_backend_rejects_invalid_timeout():
+    """A non-numeric timeout is reported, not ignored."""
+    with pytest.raises(ValueError, match="Timeout must be a number"):
+        backend(
+            base_url=FAKE_SERVER,
+            username="appuser",
+            password="s3cret",
+            identifier="base_url",
+            timeout="soon",
+        )
+
+
+def test_backend_zero_timeout_means_no_deadline():
+    """timeout=0 disables the call deadline rather than failing at once."""
+    with patch.object(_plugin_mod, "_resolve", return_value="ok") as mock_resolve:
+        backend(base_url=FAKE_SERVER, username="appuser", password="s3cret", timeout="0")
+        assert mock_resolve.call_count == 1
+    assert _plugin_mod._deadline.get() is None
+
+
+def test_backend_clears_deadline_after_call():
+    """The deadline is scoped to one backend() call."""
+    backend(base_url=FAKE_SERVER, username="appuser", password="s3cret", identifier="base_url")
+    assert _plugin_mod._deadline.get() is None
+
+
 # ── INPUTS schema tests ─────────────────────────────────────────────────
 
 
 def test_inputs_has_required_fields():
     """INPUTS must declare the expected authentication fields."""
     field_ids = {f["id"] for f in INPUTS["fields"]}
-    assert {"base_url", "username", "password", "domain"} == field_ids
+    assert {"base_url", "username", "password", "domain", "timeout"} == field_ids
 
 
 def test_inputs_password_is_secret():
@@ -178,6 +1022,14 @@ def test_inputs_identifier_has_choices():
     assert "choices" in identifier
     assert "token" in identifier["choices"]
     assert "base_url" in identifier["choices"]
+    assert "secret" in identifier["choices"]
+
+
+def test_inputs_metadata_has_secret_selectors():
+    """Metadata lets a linked field pick a secret and one of its fields."""
+    metadata_ids = {m["id"] for m in INPUTS["metadata"]}
+    assert {"secret_id", "secret_field"} <= metadata_ids
+    assert "secret_id" not in INPUTS["required"]
 
 
 def test_inputs_identifier_has_default():
@@ -0,0 +1,337 @@
+"""Unit tests for multi-endpoint selection and failover."""
+
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from delinea.secrets.server import SecretServerClientError, SecretServerServiceError
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.delinea_secret_server import _fetch_grant, backend
+from credential_plugins.endpoints import (
+    CircuitBreaker,
+    CircuitOpen,
+    EndpointHealth,
+    LatencyWindow,
+    canonical_url,
+    hedge,
+    split_endpoints,
+)
+from credential_plugins.throttle import RateLimiter
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+NODE_A = "https://ss-a.example.com/SecretServer"
+NODE_B = "https://ss-b.example.com/SecretServer"
+FAKE_TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCJ9.fakepayload.fakesig"
+
+
+def _always(exc):
+    return True
+
+
+def test_split_endpoints_accepts_lists_and_separators():
+    """Comma, whitespace and newline separated lists keep their order."""
+    assert split_endpoints(f"{NODE_A}, {NODE_B}") == [NODE_A, NODE_B]
+    assert split_endpoints(f"{NODE_B}\n{NODE_A}\n") == [NODE_B, NODE_A]
+    assert split_endpoints([NODE_A, NODE_A, NODE_B]) == [NODE_A, NODE_B]
+    assert canonical_url(f"{NODE_A} {NODE_B}") == NODE_A
+
+
+def test_health_prefers_listed_order_until_measured():
+    """Unmeasured endpoints keep their order; a faster node then moves first."""
+    health = EndpointHealth()
+    assert health.order([NODE_A, NODE_B]) == [NODE_A, NODE_B]
+
+    health.record(NODE_A, 0.8, error=False)
+    assert health.order([NODE_A, NODE_B]) == [NODE_A, NODE_B]
+    health.record(NODE_B, 0.1, error=False)
+    assert health.order([NODE_A, NODE_B]) == [NODE_B, NODE_A]
+
+
+def test_health_demotes_failing_endpoint_and_recovers():
+    """Errors push a node back; the error rate decays while it is unused."""
+    health = EndpointHealth(error_half_life=10)
+    with patch("credential_plugins.endpoints.time.monotonic", return_value=0.0):
+        health.record(NODE_A, 0.1, error=False)
+        health.record(NODE_B, 0.2, error=False)
+        health.record(NODE_A, 5.0, error=True)
+        assert health.order([NODE_A, NODE_B]) == [NODE_B, NODE_A]
+    with patch("credential_plugins.endpoints.time.monotonic", return_value=100.0):
+        assert health.order([NODE_A, NODE_B]) == [NODE_A, NODE_B]
+
+
+def test_call_fails_over_within_one_call():
+    """A failing node is skipped and the next one answers the same call."""
+    health = EndpointHealth()
+    fn = MagicMock(side_effect=[ConnectionError("refused"), "ok"])
+
+    assert health.call([NODE_A, NODE_B], fn, _always) == "ok"
+    assert [c.args[0] for c in fn.call_args_list] == [NODE_A, NODE_B]
+    assert health.snapshot()[NODE_A]["error_rate"] > 0
+    assert health.snapshot()[NODE_B]["error_rate"] == 0
+
+
+def test_call_raises_last_error_when_all_fail():
+    """When every node fails, the last error is raised."""
+    health = EndpointHealth()
+    fn = MagicMock(side_effect=[ConnectionError("a"), TimeoutError("b")])
+    with pytest.raises(TimeoutError):
+        health.call([NODE_A, NODE_B], fn, _always)
+
+
+def test_call_does_not_fail_over_non_retryable_errors():
+    """Errors the predicate rejects are raised at once and not held against the node."""
+    health = EndpointHealth()
+    fn = MagicMock(side_effect=PermissionError("bad password"))
+    with pytest.raises(PermissionError):
+        health.call([NODE_A, NODE_B], fn, lambda exc: False)
+    assert fn.call_count == 1
+    assert health.snapshot()[NODE_A]["error_rate"] == 0
+
+
+def test_circuit_opens_after_consecutive_failures():
+    """Past the threshold, calls fail fast without running."""
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+    fn = MagicMock(side_effect=ConnectionError("refused"))
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(NODE_A, fn, _always)
+    with pytest.raises(CircuitOpen):
+        breaker.call(NODE_A, fn, _always)
+
+    assert fn.call_count == 2
+    assert breaker.state(NODE_A) == "open"
+    assert breaker.state(NODE_B) == "closed"
+
+
+def test_circuit_half_open_probe_closes_or_reopens():
+    """After the reset timeout one probe decides the circuit's state."""
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+    with patch("credential_plugins.endpoints.time.monotonic", return_value=0.0):
+        with pytest.raises(ConnectionError):
+            breaker.call(NODE_A, MagicMock(side_effect=ConnectionError()), _always)
+    with patch("credential_plugins.endpoints.time.monotonic", return_value=11.0):
+        assert breaker.state(NODE_A) == "half-open"
+        with pytest.raises(ConnectionError):
+            breaker.call(NODE_A, MagicMock(side_effect=ConnectionError()), _always)
+        assert breaker.state(NODE_A) == "open"
+    with patch("credential_plugins.endpoints.time.monotonic", return_value=22.0):
+        assert breaker.call(NODE_A, lambda: "ok", _always) == "ok"
+        assert breaker.state(NODE_A) == "closed"
+
+
+def test_circuit_lets_one_probe_through():
+    """Concurrent callers fail fast while a half-open probe is in flight."""
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    with pytest.raises(ConnectionError):
+        breaker.call(NODE_A, MagicMock(side_effect=ConnectionError()), _always)
+
+    def probe():
+        with pytest.raises(CircuitOpen):
+            breaker.call(NODE_A, lambda: "second", _always)
+        return "probe"
+
+    assert breaker.call(NODE_A, probe, _always) == "probe"
+    assert breaker.state(NODE_A) == "closed"
+
+
+def test_circuit_ignores_non_failures():
+    """Errors that show the endpoint answering do not open the circuit."""
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30)
+    with pytest.raises(PermissionError):
+        breaker.call(NODE_A, MagicMock(side_effect=PermissionError()), lambda exc: False)
+    assert breaker.state(NODE_A) == "closed"
+
+
+def test_latency_window_percentile():
+    """Percentiles need enough samples and only cover the latest window."""
+    window = LatencyWindow(size=100)
+    assert window.percentile(95) is None
+    for ms in range(1, 101):
+        window.add(ms / 1000.0)
+    assert window.percentile(95) == 0.095
+    assert window.percentile(95, min_samples=101) is None
+    window.add(1.0)
+    assert len(window) == 100
+    assert window.percentile(100) == 1.0
+
+
+def test_hedge_fast_primary_sends_no_backup():
+    """A primary answering within the delay is used alone."""
+    backup = MagicMock(return_value="backup")
+    assert hedge(lambda: "primary", backup, delay=1.0) == "primary"
+    backup.assert_not_called()
+
+
+def test_hedge_slow_primary_backup_wins():
+    """A backup started after the delay answers for a stalled primary."""
+    release = threading.Event()
+
+    def primary():
+        release.wait(5)
+        return "primary"
+
+    started = time.monotonic()
+    try:
+        assert hedge(primary, lambda: "backup", delay=0.05) == "backup"
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2
+
+
+def test_hedge_waits_for_other_attempt_after_failure():
+    """Once hedged, one failed attempt does not fail the call."""
+
+    def primary():
+        time.sleep(0.1)
+        return "primary"
+
+    def backup():
+        raise ConnectionError("refused")
+
+    assert hedge(primary, backup, delay=0.01) == "primary"
+    with pytest.raises(ConnectionError):
+        hedge(MagicMock(side_effect=ConnectionError("early")), backup, delay=1.0)
+
+
+def test_hedge_skips_backup_when_not_admitted():
+    """A backup refused by *admit* is not sent; the primary is awaited."""
+
+    def primary():
+        time.sleep(0.1)
+        return "primary"
+
+    backup = MagicMock(return_value="backup")
+    assert hedge(primary, backup, delay=0.01, admit=lambda: False) == "primary"
+    backup.assert_not_called()
+
+
+# ── Plugin integration ──────────────────────────────────────────────────
+
+
+@pytest.fixture
+def health():
+    fresh = EndpointHealth()
+    with patch.object(_plugin_mod, "_endpoint_health", fresh), patch.object(
+        _plugin_mod, "_circuits", CircuitBreaker(threshold=2)
+    ):
+        yield fresh
+
+
+def _authorizer_by_node(errors):
+    """PasswordGrantAuthorizer stand-in failing with errors[base_url], if any."""
+
+    def build(base_url, username, password):
+        authorizer = MagicMock(access_grant={"access_token": FAKE_TOKEN, "expires_in": 1200})
+        error = errors.get(base_url)
+        authorizer.get_access_token.side_effect = error
+        authorizer.get_access_token.return_value = FAKE_TOKEN
+        return authorizer
+
+    return build
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_fetch_grant_fails_over_to_next_node(mock_cls, health):
+    """A down node does not fail the grant while another node answers."""
+    mock_cls.side_effect = _authorizer_by_node({NODE_A: SecretServerServiceError("503")})
+
+    grant = _fetch_grant(f"{NODE_A},{NODE_B}", "appuser", "s3cret")
+
+    assert grant.access_token == FAKE_TOKEN
+    assert [c.args[0] for c in mock_cls.call_args_list] == [NODE_A, NODE_B]
+    assert health.order([NODE_A, NODE_B]) == [NODE_B, NODE_A]
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_fetch_grant_does_not_fail_over_rejected_credentials(mock_cls, health):
+    """A 4xx (e.g. bad password) is not retried on the other nodes."""
+    mock_cls.side_effect = _authorizer_by_node({NODE_A: SecretServerClientError("invalid")})
+
+    with pytest.raises(SecretServerClientError):
+        _fetch_grant(f"{NODE_A},{NODE_B}", "appuser", "s3cret")
+    assert mock_cls.call_count == 1
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_fetch_grant_hedges_slow_node(mock_cls, health):
+    """With hedging on, a stalled node's grant is answered by the next node."""
+    release = threading.Event()
+    build = _authorizer_by_node({})
+
+    def authorizer(base_url, username, password):
+        if base_url == NODE_A:
+            release.wait(5)
+        return build(base_url, username, password)
+
+    mock_cls.side_effect = authorizer
+    window = LatencyWindow()
+    for _ in range(20):
+        window.add(0.02)
+    with patch.object(_plugin_mod, "HEDGE_PERCENTILE", 95.0), patch.object(
+        _plugin_mod, "_grant_latency", window
+    ):
+        try:
+            grant = _fetch_grant(f"{NODE_A},{NODE_B}", "appuser", "s3cret")
+        finally:
+            release.set()
+
+    assert grant.access_token == FAKE_TOKEN
+    assert NODE_B in [c.args[0] for c in mock_cls.call_args_list]
+
+
+@pytest.mark.parametrize("burst, hedged", [(1, False), (2, True)])
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_fetch_grant_hedge_takes_a_rate_limit_slot(mock_cls, health, burst, hedged):
+    """A backup grant needs its own slot; without a free one the hedge is skipped."""
+    build = _authorizer_by_node({})
+
+    def authorizer(base_url, username, password):
+        if base_url == NODE_A:
+            time.sleep(0.2)
+        return build(base_url, username, password)
+
+    mock_cls.side_effect = authorizer
+    window = LatencyWindow()
+    for _ in range(20):
+        window.add(0.02)
+    limiter = RateLimiter(rate=0.01, burst=burst)
+    with patch.object(_plugin_mod, "HEDGE_PERCENTILE", 95.0), patch.object(
+        _plugin_mod, "_grant_latency", window
+    ), patch.object(_plugin_mod, "_grant_limiter", limiter):
+        grant = _fetch_grant(f"{NODE_A},{NODE_B}", "appuser", "s3cret")
+
+    assert grant.access_token == FAKE_TOKEN
+    assert (NODE_B in [c.args[0] for c in mock_cls.call_args_list]) is hedged
+    assert limiter.acquire(NODE_A, 0.0) is False
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_open_circuit_skips_node(mock_cls, health):
+    """Once a node's circuit opens, grants go straight to the next node."""
+    mock_cls.side_effect = _authorizer_by_node({NODE_A: SecretServerServiceError("503")})
+    for _ in range(2):
+        health.clear()  # keep listed order, so NODE_A is tried first
+        _fetch_grant(f"{NODE_A},{NODE_B}", "appuser", "s3cret")
+    health.clear()
+    mock_cls.reset_mock()
+
+    grant = _fetch_grant(f"{NODE_A},{NODE_B}", "appuser", "s3cret")
+
+    assert grant.access_token == FAKE_TOKEN
+    assert [c.args[0] for c in mock_cls.call_args_list] == [NODE_B]
+    assert _plugin_mod._circuits.state(NODE_A) == "open"
+
+
+def test_backend_returns_canonical_base_url():
+    """identifier='base_url' returns the first listed endpoint."""
+    result = backend(
+        base_url=f"{NODE_A}, {NODE_B}",
+        username="appuser",
+        password="s3cret",
+        identifier="base_url",
+    )
+    assert result == NODE_A
@@ -0,0 +1,226 @@
+"""Tests for the local stand-in Secret Server, and the plugin run against it."""
+
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+from delinea.secrets.server import SecretServerClientError
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.delinea_secret_server import backend
+from credential_plugins.fake_server import FakeSecretServer, main
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Every test starts with empty module-level caches."""
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    _plugin_mod._auth_errors.clear()
+    yield
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    _plugin_mod._auth_errors.clear()
+
+
+@pytest.fixture
+def server():
+    with FakeSecretServer() as fake:
+        yield fake
+
+
+def _request(url, data=None, token=None):
+    """Return ``(status, headers, json body)`` for one request."""
+    request = urllib.request.Request(url, data=data)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.headers, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.headers, json.loads(exc.read())
+
+
+def _grant(server):
+    return _request(server.url + "/oauth2/token", b"grant_type=password&username=u&password=p")
+
+
+# ── Server behaviour ────────────────────────────────────────────────────
+
+
+def test_grant_and_secret_read(server):
+    """A granted token reads secrets; a missing or unknown token is rejected."""
+    status, _, grant = _grant(server)
+    assert status == 200
+    assert grant["expires_in"] == server.token_lifetime
+
+    status, _, secret = _request(server.url + "/api/v1/secrets/1", token=grant["access_token"])
+    assert status == 200
+    assert {item["slug"]: item["itemValue"] for item in secret["items"]}["password"] == "hunter2"
+    assert _request(server.url + "/api/v1/secrets/1")[0] == 401
+    assert _request(server.url + "/api/v1/secrets/9", token=grant["access_token"])[0] == 404
+
+
+def test_tokens_expire_after_configured_lifetime(server):
+    """Tokens are rejected once ``token_lifetime`` has passed."""
+    server.token_lifetime = 0
+    token = _grant(server)[2]["access_token"]
+    time.sleep(0.01)
+    assert _request(server.url + "/api/v1/secrets/1", token=token)[0] == 401
+
+
+def test_injected_throttling_and_errors(server):
+    """``throttle_rate`` answers 429 with Retry-After; ``error_rate`` answers 503."""
+    server.throttle_rate = 1.0
+    server.retry_after = 7
+    status, headers, _ = _grant(server)
+    assert (status, headers["Retry-After"]) == (429, "7")
+
+    server.throttle_rate = 0.0
+    server.error_rate = 1.0
+    assert _grant(server)[0] == 503
+
+
+def test_latency_is_added_to_requests(server):
+    """Every request waits at least ``latency`` seconds."""
+    server.latency = 0.05
+    started = time.perf_counter()
+    _request(server.url + "/api/v1/healthcheck")
+    assert time.perf_counter() - started >= 0.05
+
+
+def test_stats_group_requests_by_route(server):
+    """Counts collapse IDs so each endpoint has one entry."""
+    token = _grant(server)[2]["access_token"]
+    _request(server.url + "/api/v1/secrets/1", token=token)
+    _request(server.url + "/api/v1/secrets/2", token=token)
+
+    stats = server.stats()
+    assert stats["POST /oauth2/token"] == 1
+    assert stats["GET /api/v1/secrets/{id}"] == 2
+    server.reset_stats()
+    assert server.stats() == {}
+
+
+def test_grant_types_and_users_are_checked(server):
+    """Wrong passwords, unknown refresh tokens and other grant types are refused."""
+    server.users = {"u": "p"}
+    token = _grant(server)[2]["access_token"]
+    url = server.url + "/oauth2/token"
+
+    assert _request(url, b"grant_type=password&username=u&password=x")[0] == 400
+    assert _request(url, b"grant_type=refresh_token&refresh_token=" + token.encode())[0] == 200
+    assert _request(url, b"grant_type=refresh_token&refresh_token=nope")[0] == 400
+    assert _request(url, b"grant_type=client_credentials")[2] == {"error": "unsupported_grant_type"}
+
+
+def test_folders_and_unknown_routes(server):
+    """Folders are listed and fetched by ID; anything else is a 404."""
+    token = _grant(server)[2]["access_token"]
+    folders = _request(server.url + "/api/v1/folders", token=token)[2]["records"]
+    folder = folders[0]
+
+    assert _request(server.url + f"/api/v1/folders/{folder['id']}", token=token)[2] == folder
+    assert _request(server.url + "/api/v1/folders/999", token=token)[0] == 404
+    assert _request(server.url + "/api/v1/users", token=token)[0] == 404
+    assert _request(server.url + "/api/v1/secrets/1", data=b"", token=token)[0] == 404
+    assert _request(server.url.rsplit("/", 1)[0] + "/other")[0] == 404
+
+
+def test_main_serves_until_interrupted(capsys):
+    """``main()`` reports its URL and exits cleanly on Ctrl-C."""
+    with patch.object(FakeSecretServer, "serve_forever", side_effect=KeyboardInterrupt):
+        assert main(["--port", "0", "--latency", "0.1"]) == 0
+    assert "Fake Secret Server listening on http://127.0.0.1:" in capsys.readouterr().out
+
+
+def test_main_rejects_unknown_options():
+    """The command line is parsed before the server binds."""
+    with pytest.raises(SystemExit):
+        main(["--no-such-option"])
+
+
+# ── Plugin against the fake server ──────────────────────────────────────
+
+
+def test_backend_resolves_every_identifier(server):
+    """Token, base URL and secret fields resolve over real HTTP."""
+    kwargs = dict(base_url=server.url, username="appuser", password="s3cret")
+
+    token = backend(**kwargs)
+    assert server.token_valid(token)
+    assert backend(**kwargs, identifier="base_url") == server.url
+    secret = backend(**kwargs, identifier="secret", secret_id="1", secret_field="password")
+    assert secret == "hunter2"
+    by_path = backend(
+        **kwargs,
+        identifier="secret",
+        secret_path="\\Servers\\db-admin",
+        secret_field="username",
+    )
+    assert by_path == "dbadmin"
+
+    stats = server.stats()
+    assert stats["POST /oauth2/token"] == 1
+    assert stats["connections"] == 1
+
+
+def test_backend_rejects_bad_credentials(server):
+    """A rejected grant surfaces the SDK's client error."""
+    server.users = {"appuser": "s3cret"}
+    with pytest.raises(SecretServerClientError):
+        backend(base_url=server.url, username="appuser", password="wrong")
+
+
+def test_backend_retries_throttled_grants(server):
+    """A throttled grant is retried after Retry-After."""
+    server.throttle_rate = 1.0
+    server.retry_after = 0
+
+    def stop_throttling(attempt):
+        server.throttle_rate = 0.0
+        return 0.0
+
+    with patch.object(_plugin_mod, "backoff", side_effect=stop_throttling):
+        assert backend(base_url=server.url, username="appuser", password="s3cret")
+    assert server.stats()["POST /oauth2/token"] == 2
+
+
+def test_backend_replaces_rejected_tokens(server):
+    """A cached token the API rejects (401) is replaced with one new grant."""
+    kwargs = dict(base_url=server.url, username="appuser", password="s3cret")
+    secret = dict(kwargs, identifier="secret", secret_id="1", secret_field="password")
+    backend(**secret)
+    server.revoke_tokens()
+
+    for _ in range(3):
+        _plugin_mod._secret_cache.clear()
+        assert backend(**secret) == "hunter2"
+
+    assert server.stats()["POST /oauth2/token"] == 2
+    assert server.token_valid(backend(**kwargs))
+
+
+def test_refresh_grant_renews_against_server(server):
+    """A grant's refresh token yields a new, valid access token."""
+    grant = _plugin_mod._fetch_grant(server.url, "appuser", "s3cret")
+    renewed = _plugin_mod._refresh_grant(grant)
+
+    assert renewed.access_token != grant.access_token
+    assert server.token_valid(renewed.access_token)
+    assert server.stats()["POST /oauth2/token"] == 2
+
+
+def test_backend_rejects_non_numeric_secret_ids(server):
+    """Secret IDs must be numeric before they are put into the API path."""
+    kwargs = dict(base_url=server.url, username="appuser", password="s3cret")
+    for secret_id in ("1/../2", "abc", "-1", "²"):
+        with pytest.raises(ValueError, match="numeric secret ID"):
+            backend(**kwargs, identifier="secret", secret_id=secret_id, secret_field="password")
+    assert server.stats().get("POST /oauth2/token", 0) == 0
@@ -0,0 +1,244 @@
+"""Tests for the plugin's module-level state across ``os.fork()``."""
+
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+import pytest
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.delinea_secret_server import backend, disable_metrics, enable_metrics
+from credential_plugins.endpoints import CircuitBreaker
+from credential_plugins.fake_server import FakeSecretServer
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+pytestmark = [
+    pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork()"),
+    # Forking a multi-threaded process is exactly what these tests exercise.
+    pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning"),
+]
+
+CHILD_TIMEOUT = 20  # seconds before a hung child counts as deadlocked
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Every test starts with empty module-level caches."""
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    _plugin_mod._auth_errors.clear()
+    yield
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    _plugin_mod._auth_errors.clear()
+    _plugin_mod._token_refresher.stop()
+    _plugin_mod._token_refresher.ratio = 0.0
+
+
+@pytest.fixture
+def server():
+    with FakeSecretServer() as fake:
+        yield fake
+
+
+def _inputs(server, user="svc"):
+    return {"base_url": server.url, "username": user, "password": "s3cret"}
+
+
+def _fork(child):
+    """Run *child* in a forked process; return its exit status (-1 if it hung)."""
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            signal.alarm(CHILD_TIMEOUT)
+            child()
+            status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(status)
+    return _wait(pid)
+
+
+def _wait(pid):
+    deadline = time.monotonic() + CHILD_TIMEOUT + 5
+    while time.monotonic() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+        time.sleep(0.01)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+    return -1
+
+
+def _resolve_concurrently(server, users, threads=4):
+    """Resolve a token and a secret for each of *users* from several threads."""
+    errors = []
+
+    def work():
+        try:
+            for user in users:
+                backend(**_inputs(server, user))
+                backend(
+                    **_inputs(server, user),
+                    identifier="secret",
+                    secret_id="1",
+                    secret_field="password",
+                )
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(CHILD_TIMEOUT)
+    assert not any(worker.is_alive() for worker in workers), "resolution deadlocked"
+    assert errors == []
+
+
+# ── Carried-over state ──────────────────────────────────────────────────
+
+
+def test_child_reuses_unexpired_tokens(server):
+    """A forked child answers from the inherited token cache without a grant."""
+    token = backend(**_inputs(server))
+
+    def child():
+        assert _plugin_mod._http_pool is None
+        assert backend(**_inputs(server)) == token
+
+    assert _fork(child) == 0
+    assert server.stats()["POST /oauth2/token"] == 1
+
+
+def test_child_starts_refresher_lazily(server):
+    """The refresh schedule carries over; its thread restarts on first use."""
+    _plugin_mod._token_refresher.ratio = 0.5
+    backend(**_inputs(server))
+    assert _plugin_mod._token_refresher._thread.is_alive()
+
+    def child():
+        refresher = _plugin_mod._token_refresher
+        assert refresher._thread is None
+        assert len(refresher) == 1
+        backend(**_inputs(server))
+        assert refresher._thread is not None and refresher._thread.is_alive()
+
+    assert _fork(child) == 0
+
+
+def test_child_gets_fresh_locks_and_pool(server):
+    """Locks held by parent threads at fork time do not block the child."""
+    backend(**_inputs(server))
+    pool = _plugin_mod._http_pool
+    held = [
+        _plugin_mod._http_pool_lock,
+        _plugin_mod._token_flight._lock,
+        _plugin_mod._endpoint_health._lock,
+        _plugin_mod._circuits._lock,
+        _plugin_mod._grant_latency._lock,
+        _plugin_mod._secret_cache._lock,
+        _plugin_mod._auth_errors._lock,
+    ]
+    for lock in held:
+        lock.acquire()
+
+    def child():
+        _resolve_concurrently(server, ["svc", "svc-new"])
+        assert _plugin_mod._http_pool is not pool
+
+    try:
+        status = _fork(child)
+    finally:
+        for lock in held:
+            lock.release()
+    assert status == 0
+
+
+def test_child_clears_inflight_circuit_probes():
+    """A half-open probe running in a parent thread does not block the child."""
+    circuits = CircuitBreaker(threshold=1, reset_timeout=0.0)
+    with pytest.raises(OSError):
+        circuits.call("node", _fail, lambda exc: True)
+    circuits._allow("node")  # a parent thread is probing
+    assert circuits._circuits["node"].probing
+
+    circuits._after_fork()
+
+    assert circuits.call("node", lambda: "ok", lambda exc: True) == "ok"
+
+
+def _fail():
+    raise OSError("down")
+
+
+def test_child_hook_resets_locks_and_keeps_state(server, monkeypatch):
+    """The at-fork child hook, run in-process: fresh locks, discarded clients, kept caches."""
+    from credential_plugins.secret_index import SecretIndex
+    from credential_plugins.tracing import Profiler
+
+    token = backend(**_inputs(server))
+    index = SecretIndex(lambda endpoint, params: {})
+    monkeypatch.setitem(_plugin_mod._secret_indexes, ("key",), index)
+    monkeypatch.setattr(_plugin_mod, "_profiler", Profiler(0.0))
+    old_lock, old_index_lock = _plugin_mod._token_cache._lock, index._lock
+    enable_metrics()
+    try:
+        old_metrics = _plugin_mod._metrics
+        _plugin_mod._after_fork_in_child()
+        assert _plugin_mod._metrics is not old_metrics
+    finally:
+        disable_metrics()
+
+    assert _plugin_mod._http_pool is None
+    assert _plugin_mod._token_cache._lock is not old_lock
+    assert index._lock is not old_index_lock
+    assert backend(**_inputs(server)) == token
+
+
+# ── Forking under load ──────────────────────────────────────────────────
+
+
+def test_fork_under_load(server):
+    """Children forked while threads hammer backend() resolve without deadlock."""
+    users = [f"svc-{n}" for n in range(4)]
+    stop = threading.Event()
+    errors = []
+
+    def hammer(user):
+        while not stop.is_set():
+            _plugin_mod._token_cache.clear()  # keep every call on the grant path
+            try:
+                backend(**_inputs(server, user))
+                backend(
+                    **_inputs(server, user),
+                    identifier="secret",
+                    secret_id="1",
+                    secret_field="password",
+                )
+            except Exception as exc:
+                errors.append(exc)
+                return
+
+    threads = [threading.Thread(target=hammer, args=(user,)) for user in users * 2]
+    for thread in threads:
+        thread.start()
+    try:
+        statuses = []
+        for _ in range(10):
+            time.sleep(0.02)
+            statuses.append(_fork(lambda: _resolve_concurrently(server, users)))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(CHILD_TIMEOUT)
+
+    assert statuses == [0] * 10
+    assert errors == []
@@ -0,0 +1,67 @@
+"""Import-time regression tests.
+
+AWX imports every credential plugin at startup, so importing the package
+must not pull in the SDK or the HTTP stack.  Each check runs in a fresh
+interpreter, since the rest of the suite has already imported everything.
+"""
+
+import json
+import subprocess
+import sys
+
+# Modules that only the first backend() call may load.
+HEAVY_MODULES = ("delinea", "requests", "urllib3", "ssl", "sqlite3", "socketserver")
+
+# Generous budget for ``import credential_plugins`` (cumulative, µs); the
+# eager imports it replaces cost ~200 ms on a developer laptop.
+IMPORT_BUDGET_US = 100_000
+
+
+def _run(code, *flags):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def _cumulative_us(stderr, module):
+    """Cumulative import time of *module* from ``-X importtime`` output."""
+    for line in stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} not in importtime output")
+
+
+def test_import_skips_sdk_and_http_stack():
+    """Importing the plugin and reading its metadata loads no heavy module."""
+    result = _run(
+        "import json, sys\n"
+        "from credential_plugins import delinea_secret_server as plugin\n"
+        "plugin.inputs['fields']\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    assert json.loads(result.stdout) == []
+
+
+def test_import_time_within_budget():
+    """``import credential_plugins`` stays well below the eager-import cost."""
+    stderr = _run("import credential_plugins", "-X", "importtime").stderr
+    assert _cumulative_us(stderr, "credential_plugins") < IMPORT_BUDGET_US
+
+
+def test_backend_loads_sdk_on_first_call():
+    """The SDK is imported by the first grant and the plugin still works."""
+    result = _run(
+        "import sys\n"
+        "from unittest.mock import patch\n"
+        "from credential_plugins import delinea_secret_server as mod\n"
+        "print('delinea' in sys.modules)\n"
+        "with patch('delinea.secrets.server.PasswordGrantAuthorizer.get_access_token',\n"
+        "           return_value='tok'):\n"
+        "    print(mod.backend(base_url='https://ss.example.com', username='u',\n"
+        "                      password='p'))\n"
+    )
+    assert result.stdout.split() == ["False", "tok"]
@@ -0,0 +1,146 @@
+"""Tests for the launch-burst load replay CLI."""
+
+import json
+import sys
+
+import pytest
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.fake_server import FakeSecretServer
+from credential_plugins.loadtest import (
+    Launch,
+    Target,
+    main,
+    parse_mix,
+    percentiles,
+    read_trace,
+    run,
+    synthetic_profile,
+)
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Every test starts with empty module-level caches."""
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    _plugin_mod._auth_errors.clear()
+    yield
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    _plugin_mod._auth_errors.clear()
+
+
+@pytest.fixture
+def server():
+    with FakeSecretServer() as fake:
+        yield fake
+
+
+def _target(server):
+    return Target(server.url, "svc", "s3cret", None, "1", "password")
+
+
+def test_parse_mix_reads_fields_and_weights():
+    """Field sets are ``+``-joined with an optional weight."""
+    assert parse_mix(["token+base_url:3", "secret"]) == [
+        (("token", "base_url"), 3.0),
+        (("secret",), 1.0),
+    ]
+    with pytest.raises(ValueError, match="Invalid mix"):
+        parse_mix(["token+password"])
+    with pytest.raises(ValueError, match="weight"):
+        parse_mix(["token:lots"])
+
+
+def test_synthetic_profile_spaces_launches_at_rate():
+    """Launches are spaced at the rate, cycle accounts and follow the mix."""
+    launches = synthetic_profile(6, 2.0, parse_mix(["token"]), accounts=2)
+    assert [launch.at for launch in launches] == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5]
+    assert [launch.account for launch in launches] == [0, 1, 0, 1, 0, 1]
+    assert {launch.fields for launch in launches} == {("token",)}
+    burst = synthetic_profile(3, 0, parse_mix(["token"]))
+    assert {launch.at for launch in burst} == {0.0}
+
+
+def test_read_trace_sorts_and_defaults(tmp_path):
+    """Trace launches are sorted by offset; missing fields come from the mix."""
+    path = tmp_path / "trace.jsonl"
+    path.write_text(
+        '{"at": 1.5, "fields": ["base_url"], "account": 2}\n' "\n" '{"at": 0.5}\n',
+        encoding="utf-8",
+    )
+    assert read_trace(str(path), parse_mix(["token"])) == [
+        Launch(0.5, ("token",), 0),
+        Launch(1.5, ("base_url",), 2),
+    ]
+    path.write_text('{"at": 0, "fields": ["password"]}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="trace.jsonl:1"):
+        read_trace(str(path), parse_mix(["token"]))
+
+
+def test_percentiles_summarise_values():
+    """Percentiles pick from the sorted values."""
+    summary = percentiles([float(n) for n in range(100, 0, -1)])
+    assert (summary["p50"], summary["p99"], summary["max"]) == (51.0, 100.0, 100.0)
+    assert percentiles([]) == {"count": 0}
+
+
+def test_run_reports_throughput_latency_and_requests(server):
+    """A burst reports every resolution and counts outbound requests per kind."""
+    launches = synthetic_profile(40, 0, parse_mix(["token+base_url:1", "secret:1"]), accounts=2)
+
+    report = run(launches, _target(server), threads=4)
+
+    assert report["launches"] == 40
+    assert report["resolutions"] == sum(len(launch.fields) for launch in launches)
+    assert report["latency_seconds"]["launch"]["count"] == 40
+    assert report["throughput"]["launches_per_second"] > 0
+    requests = report["outbound_requests"]
+    assert requests["by_kind"]["grant"] == 2
+    assert requests["by_kind"]["api"] == 2
+    assert requests["total"] == sum(requests["by_kind"].values())
+    assert requests["per_resolution"] < 1
+    assert report["errors"]["total"] == 0
+
+
+def test_run_breaks_down_errors_by_type(server):
+    """Failed resolutions are counted by exception type, and the replay goes on."""
+    server.users = {"svc": "other"}
+    report = run(synthetic_profile(5, 0, parse_mix(["token"])), _target(server), threads=2)
+
+    assert report["errors"]["total"] == 5
+    assert report["errors"]["rate"] == 1.0
+    assert report["errors"]["by_type"] == {"SecretServerClientError": 5}
+
+
+def test_run_spreads_launches_over_processes(server):
+    """Worker processes each replay their share and results are merged."""
+    launches = synthetic_profile(20, 0, parse_mix(["token"]), accounts=2)
+
+    report = run(launches, _target(server), threads=2, processes=2)
+
+    assert report["processes"] == 2
+    assert report["resolutions"] == 20
+    assert report["outbound_requests"]["by_kind"]["grant"] == 2
+
+
+def test_main_writes_json_report(tmp_path):
+    """``--fake`` runs against a local fake server and writes the report."""
+    output = tmp_path / "report.json"
+
+    assert main(["--fake", "--launches", "10", "--threads", "2", "-o", str(output)]) == 0
+
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert report["launches"] == 10
+    assert report["resolutions"] == 20
+    assert set(report) >= {"throughput", "latency_seconds", "outbound_requests", "errors"}
+
+
+def test_main_requires_password_for_url(monkeypatch):
+    """Against a real URL the password must come from the environment."""
+    monkeypatch.delenv("TSS_PASSWORD", raising=False)
+    with pytest.raises(SystemExit):
+        main(["--url", "https://tss.example.com/SecretServer"])
@@ -0,0 +1,215 @@
+"""Unit tests for the opt-in Prometheus metrics."""
+
+import asyncio
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.delinea_secret_server import (
+    SecretCache,
+    TokenCache,
+    abackend,
+    backend,
+    disable_metrics,
+    enable_metrics,
+    resolve_many,
+)
+from credential_plugins.fake_server import FakeSecretServer
+from credential_plugins.metrics import Counter, Gauge, Histogram, Registry, TextfileWriter
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+FAKE_SERVER = "https://myserver.example.com/SecretServer"
+FAKE_TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCJ9.fakepayload.fakesig"
+
+
+def test_registry_renders_text_format():
+    """Counters, gauges and histograms render in the exposition format."""
+    registry = Registry()
+    counter = registry.register(Counter("c_total", "A counter.", ("kind",)))
+    gauge = registry.register(Gauge("g", "A gauge."))
+    histogram = registry.register(Histogram("h_seconds", "A histogram.", (), buckets=(0.1, 1)))
+    counter.inc('a"b\\c')
+    counter.inc('a"b\\c', amount=2)
+    gauge.inc()
+    gauge.dec(amount=3)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = registry.render()
+
+    assert "# TYPE c_total counter\n" in text
+    assert 'c_total{kind="a\\"b\\\\c"} 3.0\n' in text
+    assert "g -2.0\n" in text
+    assert 'h_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'h_seconds_bucket{le="1.0"} 2\n' in text
+    assert 'h_seconds_bucket{le="+Inf"} 3\n' in text
+    assert "h_seconds_sum 5.55\n" in text
+    assert "h_seconds_count 3\n" in text
+
+
+def test_write_textfile_replaces_file(tmp_path):
+    """The textfile is replaced as a whole, leaving no temporary files."""
+    registry = Registry()
+    registry.register(Counter("c_total", "A counter.")).inc()
+    path = tmp_path / "tss.prom"
+    path.write_text("stale")
+
+    registry.write_textfile(str(path))
+
+    assert path.read_text() == registry.render()
+    assert [p.name for p in tmp_path.iterdir()] == ["tss.prom"]
+
+
+def test_metrics_disabled_by_default():
+    """Without opting in, nothing is collected."""
+    assert _plugin_mod._metrics is None
+
+
+# ── Plugin integration ──────────────────────────────────────────────────
+
+
+@pytest.fixture
+def metrics():
+    enable_metrics()
+    _plugin_mod._token_cache.clear()
+    try:
+        yield _plugin_mod._metrics
+    finally:
+        disable_metrics()
+        _plugin_mod._token_cache.clear()
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_backend_calls_and_grants_are_recorded(mock_cls, metrics):
+    """Each call is timed per identifier and base URL; grants are counted."""
+    authorizer = MagicMock(get_access_token=MagicMock(return_value=FAKE_TOKEN))
+    authorizer.access_grant = {"access_token": FAKE_TOKEN, "expires_in": 1200}
+    mock_cls.return_value = authorizer
+    kwargs = dict(base_url=FAKE_SERVER + "/", username="appuser", password="s3cret")
+
+    backend(**kwargs)
+    backend(**kwargs)
+
+    assert metrics.calls.count("token", FAKE_SERVER) == 2
+    assert metrics.grants.value(FAKE_SERVER, "ok") == 1
+    assert metrics.grant_duration.count(FAKE_SERVER) == 1
+    assert metrics.cache.value("token", "hit") == 1
+    assert metrics.cache.value("token", "miss") == 1
+    assert metrics.in_flight.value("token") == 0
+    assert metrics.grants_in_flight.value(FAKE_SERVER) == 0
+    assert "tss_backend_duration_seconds_bucket" in metrics.registry.render()
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_backend_errors_are_counted_by_type(mock_cls, metrics):
+    """Failed calls count under their exception type; no label carries secrets."""
+    mock_cls.return_value.get_access_token.side_effect = ConnectionError("refused")
+
+    with pytest.raises(ConnectionError):
+        backend(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+
+    assert metrics.errors.value("token", "ConnectionError") == 1
+    assert metrics.grants.value(FAKE_SERVER, "error") == 1
+    assert "s3cret" not in metrics.registry.render()
+    assert "appuser" not in metrics.registry.render()
+
+
+def test_cache_lookups_are_counted_once(metrics):
+    """A cold and a warm lookup count one miss and one hit, on every path."""
+    _plugin_mod._secret_cache.clear()
+    with FakeSecretServer() as server:
+        kwargs = dict(base_url=server.url, username="svc", password="s3cret")
+        secret = dict(kwargs, identifier="secret", secret_id="1", secret_field="password")
+        try:
+            backend(**secret)
+            backend(**secret)
+            resolve_many([kwargs, dict(kwargs, username="other")])
+        finally:
+            _plugin_mod._secret_cache.clear()
+
+    assert metrics.cache.value("secret", "miss") == 1
+    assert metrics.cache.value("secret", "hit") == 1
+    # The secret's grant missed once; resolve_many hit it and missed "other".
+    assert metrics.cache.value("token", "miss") == 2
+    assert metrics.cache.value("token", "hit") == 1
+
+
+def test_cache_evictions_are_counted(metrics):
+    """Entries pushed out of a full cache are counted per cache."""
+    tokens = TokenCache(max_size=1, margin=0)
+    tokens.put(("a",) * 4, "tok-a", 60)
+    tokens.put(("b",) * 4, "tok-b", 60)
+    assert tokens.get(("a",) * 4) is None
+    secrets = SecretCache(max_size=1, ttl=60)
+    secrets.put((("a",) * 4, "1"), {})
+    secrets.put((("a",) * 4, "2"), {})
+
+    assert metrics.evictions.value("token") == 1
+    assert metrics.evictions.value("secret") == 1
+    assert metrics.cache.value("token", "miss") == 1
+
+
+def test_enable_metrics_writes_textfile(tmp_path):
+    """With a textfile path, metrics are written for the textfile collector."""
+    path = tmp_path / "tss.prom"
+    try:
+        registry = enable_metrics(str(path), interval=3600)
+        backend(base_url=FAKE_SERVER, username="appuser", password="s3cret", identifier="base_url")
+        _plugin_mod._metrics_writer.write()
+    finally:
+        disable_metrics()
+
+    assert path.read_text() == registry.render()
+    assert 'identifier="base_url"' in path.read_text()
+
+
+def test_textfile_writer_skips_forked_copies(tmp_path):
+    """A writer inherited through fork() leaves the parent's textfile alone."""
+    path = tmp_path / "tss.prom"
+    writer = TextfileWriter(Registry(), str(path), interval=3600)
+    writer._pid += 1  # as seen from a forked child
+
+    writer.write()
+
+    assert not path.exists()
+
+
+def test_failed_textfile_write_is_cleaned_up_and_ignored(tmp_path):
+    """A write that cannot replace the target leaves no temp file and does not raise."""
+    target = tmp_path / "tss.prom"
+    target.mkdir()  # os.replace() cannot put a file over a directory
+    with pytest.raises(OSError):
+        Registry().write_textfile(str(target))
+    assert [p.name for p in tmp_path.iterdir()] == ["tss.prom"]
+
+    TextfileWriter(Registry(), str(target), interval=3600).write()
+
+
+def test_textfile_writer_thread_writes_periodically(tmp_path):
+    """Once started, the writer refreshes the textfile every interval."""
+    path = tmp_path / "tss.prom"
+    writer = TextfileWriter(Registry(), str(path), interval=0.01)
+    writer.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        writer.stop()
+    assert path.exists()
+
+
+def test_abackend_cache_hits_are_counted(metrics):
+    """A token served on the event loop still counts as a cache hit."""
+    _plugin_mod._token_cache.put(
+        _plugin_mod._cache_key(FAKE_SERVER, "appuser", "s3cret"), FAKE_TOKEN, 1200
+    )
+    result = asyncio.run(abackend(base_url=FAKE_SERVER, username="appuser", password="s3cret"))
+
+    assert result == FAKE_TOKEN
+    assert metrics.cache.value("token", "hit") == 1
@@ -0,0 +1,177 @@
+"""Tests for token cache pre-warming."""
+
+import json
+import sys
+import threading
+
+import pytest
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.delinea_secret_server import backend, prewarm
+from credential_plugins.fake_server import FakeSecretServer
+from credential_plugins.prewarm import load_inputs, main, watch
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Every test starts with empty module-level caches."""
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._auth_errors.clear()
+    yield
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._auth_errors.clear()
+    _plugin_mod._token_refresher.stop()
+    _plugin_mod._token_refresher.ratio = 0.0
+
+
+@pytest.fixture
+def server():
+    with FakeSecretServer() as fake:
+        yield fake
+
+
+def _write(tmp_path, entries):
+    path = tmp_path / "credentials.json"
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    return str(path)
+
+
+# ── Loading inputs ──────────────────────────────────────────────────────
+
+
+def test_load_inputs_reads_passwords_from_env(tmp_path, monkeypatch):
+    """``password_env`` names the variable holding the password."""
+    monkeypatch.setenv("TSS_PASSWORD_AWX", "s3cret")
+    path = _write(
+        tmp_path,
+        [
+            {"base_url": "https://a", "username": "svc", "password_env": "TSS_PASSWORD_AWX"},
+            {"base_url": "https://b", "username": "svc2", "password": "inline", "domain": "CORP"},
+        ],
+    )
+
+    assert load_inputs(path) == [
+        {"base_url": "https://a", "username": "svc", "password": "s3cret"},
+        {"base_url": "https://b", "username": "svc2", "password": "inline", "domain": "CORP"},
+    ]
+
+
+def test_load_inputs_rejects_incomplete_entries(tmp_path, monkeypatch):
+    """Entries without a usable password are rejected by number."""
+    monkeypatch.delenv("TSS_PASSWORD_AWX", raising=False)
+    path = _write(
+        tmp_path, [{"base_url": "https://a", "username": "svc", "password_env": "TSS_PASSWORD_AWX"}]
+    )
+    with pytest.raises(ValueError, match=r"Credential 1: \$TSS_PASSWORD_AWX"):
+        load_inputs(path)
+    with pytest.raises(ValueError, match="missing password"):
+        load_inputs(_write(tmp_path, [{"base_url": "https://a", "username": "svc"}]))
+    with pytest.raises(ValueError, match="JSON list"):
+        load_inputs(_write(tmp_path, {"base_url": "https://a"}))
+
+
+def test_load_inputs_defaults_to_env(monkeypatch):
+    """Without a file, one credential comes from the TSS_* variables."""
+    monkeypatch.setenv("TSS_BASE_URL", "https://a")
+    monkeypatch.setenv("TSS_USERNAME", "svc")
+    monkeypatch.setenv("TSS_PASSWORD", "s3cret")
+    monkeypatch.delenv("TSS_DOMAIN", raising=False)
+
+    assert load_inputs() == [{"base_url": "https://a", "username": "svc", "password": "s3cret"}]
+
+
+# ── prewarm() ───────────────────────────────────────────────────────────
+
+
+def test_prewarm_fills_token_cache(server):
+    """Pre-warmed identities resolve later without another grant."""
+    inputs = [
+        {"base_url": server.url, "username": f"svc-{n}", "password": "s3cret"} for n in range(3)
+    ]
+
+    results = prewarm(inputs + inputs[:1])
+
+    assert [result.error for result in results] == [None] * 4
+    assert server.stats()["POST /oauth2/token"] == 3
+    assert backend(**inputs[0]) == results[0].value
+    assert server.stats()["POST /oauth2/token"] == 3
+
+
+def test_prewarm_connects_to_standby_nodes(server):
+    """Every web node of a multi-node base URL gets a pooled connection."""
+    with FakeSecretServer() as standby:
+        base_url = f"{server.url},{standby.url}"
+        prewarm([{"base_url": base_url, "username": "svc", "password": "s3cret"}])
+
+        assert standby.stats()["GET /api/v1/healthcheck"] == 1
+        assert standby.stats()["connections"] == 1
+
+
+def test_prewarm_reports_errors_per_input(server):
+    """A rejected credential is reported without failing the others."""
+    server.users = {"svc": "s3cret"}
+    results = prewarm(
+        [
+            {"base_url": server.url, "username": "svc", "password": "s3cret"},
+            {"base_url": server.url, "username": "svc", "password": "wrong"},
+        ]
+    )
+
+    assert results[0].error is None
+    assert type(results[1].error).__name__ == "SecretServerClientError"
+
+
+# ── Command line ────────────────────────────────────────────────────────
+
+
+def test_main_exit_status_reflects_failures(server, tmp_path):
+    """One-shot runs exit 1 when any credential failed."""
+    server.users = {"svc": "s3cret"}
+    good = {"base_url": server.url, "username": "svc", "password": "s3cret"}
+    bad = dict(good, password="wrong")
+
+    assert main(["--file", _write(tmp_path, [good])]) == 0
+    assert main(["--file", _write(tmp_path, [good, bad])]) == 1
+    with pytest.raises(SystemExit):
+        main(["--file", str(tmp_path / "missing.json")])
+
+
+def test_watch_rewarms_expired_tokens(server, tmp_path):
+    """Each watch pass re-reads the file and re-grants expired tokens."""
+    server.token_lifetime = 0
+    path = _write(tmp_path, [{"base_url": server.url, "username": "svc", "password": "s3cret"}])
+
+    watch(path, interval=0.01, max_concurrency=2, cycles=3)
+
+    assert server.stats()["POST /oauth2/token"] == 3
+
+
+def test_watch_stops_when_asked(server, tmp_path):
+    """Setting the stop event ends the watch loop."""
+    path = _write(tmp_path, [{"base_url": server.url, "username": "svc", "password": "s3cret"}])
+    stop = threading.Event()
+    thread = threading.Thread(target=watch, args=(path, 60.0, 2), kwargs={"stop": stop})
+    thread.start()
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_main_watch_enables_refresher(server, tmp_path):
+    """``--watch`` schedules background renewal of the warmed tokens."""
+    path = _write(tmp_path, [{"base_url": server.url, "username": "svc", "password": "s3cret"}])
+    scheduled = []
+    original = _plugin_mod._token_refresher.schedule
+
+    def record(key, grant, credentials, last_used=None):
+        scheduled.append(_plugin_mod._token_refresher.enabled)
+        original(key, grant, credentials, last_used)
+
+    _plugin_mod._token_refresher.schedule = record
+    try:
+        assert main(["--file", path, "--watch", "--cycles", "1", "--refresh-ratio", "0.5"]) == 0
+    finally:
+        del _plugin_mod._token_refresher.schedule
+    assert scheduled == [True]
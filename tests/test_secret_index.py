@@ -0,0 +1,275 @@
+"""Unit tests for the secret path index."""
+
+import sys
+from unittest.mock import patch
+
+import pytest
+from delinea.secrets.server import SecretServerClientError
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.delinea_secret_server import backend
+from credential_plugins.secret_index import SecretIndex, find_secret, split_path
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+FAKE_SERVER = "https://myserver.example.com/SecretServer"
+
+FOLDERS = [
+    {"id": 1, "folderPath": "\\Servers"},
+    {"id": 2, "folderPath": "\\Servers\\Linux"},
+]
+
+
+class FakeApi:
+    """Stand-in for the REST API: folders, a paged secret search, call log.
+
+    Secrets changed through ``modify()`` are the ones a modified-since search
+    returns, unless *filtered* is false (a server ignoring the filter).
+    """
+
+    def __init__(self, secrets, page_size=2, filtered=True):
+        self.secrets = dict(secrets)
+        self.folders = [dict(folder) for folder in FOLDERS]
+        self.page_size = page_size
+        self.filtered = filtered
+        self.modified = set()
+        self.calls = []
+
+    def modify(self, secret_id, folder_id, name):
+        self.secrets[secret_id] = (folder_id, name)
+        self.modified.add(secret_id)
+
+    def __call__(self, endpoint, params):
+        self.calls.append((endpoint, dict(params)))
+        if endpoint == "/folders":
+            return {"records": self.folders, "hasNext": False}
+        if endpoint.startswith("/folders/"):
+            folder_id = int(endpoint.rsplit("/", 1)[1])
+            return next(f for f in self.folders if f["id"] == folder_id)
+        since = self.filtered and SecretIndex.MODIFIED_SINCE_PARAM in params
+        records = [
+            {"id": secret_id, "name": name, "folderId": folder_id}
+            for secret_id, (folder_id, name) in sorted(self.secrets.items())
+            if name.lower() == params.get("filter.searchText", name).lower()
+            and (not since or secret_id in self.modified)
+        ]
+        skip = int(params.get("skip", 0))
+        end = skip + self.page_size
+        return {"records": records[skip:end], "hasNext": end < len(records)}
+
+    def searches(self):
+        return [params for endpoint, params in self.calls if endpoint == "/secrets"]
+
+
+@pytest.fixture
+def api():
+    return FakeApi({10: (2, "db-admin"), 11: (2, "web-admin"), 12: (1, "db-admin")})
+
+
+def test_split_path_normalizes_separators_and_case():
+    """Forward and back slashes, outer slashes and case are all equivalent."""
+    assert split_path("\\Servers\\Linux\\DB-Admin") == ("servers\\linux", "db-admin")
+    assert split_path("/servers/linux/db-admin") == ("servers\\linux", "db-admin")
+    assert split_path("db-admin") == ("", "db-admin")
+
+
+def test_index_builds_once_and_pages_results(api):
+    """The first lookup pages through the search; later lookups make no calls."""
+    index = SecretIndex(api, sync_interval=300)
+
+    assert index.lookup("Servers\\Linux\\db-admin") == 10
+    calls = len(api.calls)
+    assert index.lookup("Servers/db-admin") == 12
+    assert index.lookup("Servers\\Linux\\web-admin") == 11
+    assert index.lookup("Servers\\Linux\\missing") is None
+
+    assert len(api.calls) == calls
+    assert len(index) == 3
+    assert len(api.searches()) == 2  # three secrets, two per page
+
+
+def test_index_syncs_incrementally(api):
+    """Syncs after the first only ask for secrets modified since the last one."""
+    index = SecretIndex(api, sync_interval=0)
+    index.lookup("Servers\\Linux\\db-admin")
+    built = len(api.searches())
+    api.modify(10, 1, "db-moved")
+    index.lookup("Servers\\db-moved")
+
+    searches = api.searches()
+    assert not any(SecretIndex.MODIFIED_SINCE_PARAM in params for params in searches[:built])
+    assert all(SecretIndex.MODIFIED_SINCE_PARAM in params for params in searches[built:])
+    assert index.lookup("Servers\\db-moved") == 10
+    assert index.lookup("Servers\\Linux\\db-admin") is None
+
+
+def test_incremental_sync_fetches_only_new_folders(api):
+    """Incremental syncs skip the folder listing and fetch unknown folders by ID."""
+    index = SecretIndex(api, sync_interval=0, folder_sync_interval=300)
+    index.lookup("Servers\\db-admin")
+    api.folders.append({"id": 3, "folderPath": "\\Servers\\Windows"})
+    api.calls.clear()
+    api.modify(30, 3, "ad-admin")
+
+    assert index.lookup("Servers\\Windows\\ad-admin") == 30
+    assert [endpoint for endpoint, _ in api.calls] == ["/secrets", "/folders/3"]
+    assert index.lookup("Servers\\db-admin") == 12
+
+
+def test_unfiltered_incremental_sync_is_logged(caplog):
+    """A server returning everything for a modified-since search is reported once."""
+    api = FakeApi({10: (2, "db-admin"), 11: (2, "web-admin")}, filtered=False)
+    index = SecretIndex(api, sync_interval=0)
+    with caplog.at_level("WARNING", logger="credential_plugins.secret_index"):
+        for _ in range(3):
+            index.lookup("Servers\\Linux\\db-admin")
+
+    warnings = [r for r in caplog.records if SecretIndex.MODIFIED_SINCE_PARAM in r.getMessage()]
+    assert len(warnings) == 1
+
+
+def test_renamed_folder_reindexes_its_secrets(api):
+    """Secrets of a renamed folder move to the new path on the next folder sync."""
+    index = SecretIndex(api, sync_interval=0, folder_sync_interval=0)
+    index.lookup("Servers\\Linux\\db-admin")
+    api.folders[1]["folderPath"] = "\\Servers\\Unix"
+
+    assert index.lookup("Servers\\Unix\\db-admin") == 10
+    assert index.lookup("Servers\\Unix\\web-admin") == 11
+    assert index.lookup("Servers\\Linux\\db-admin") is None
+
+
+def test_relookup_follows_renamed_folder(api):
+    """Between folder syncs, a direct search picks up a renamed folder."""
+    index = SecretIndex(api, sync_interval=300)
+    index.lookup("Servers\\Linux\\db-admin")
+    api.folders[1]["folderPath"] = "\\Servers\\Unix"
+
+    assert index.lookup("Servers\\Unix\\db-admin") is None
+    assert index.relookup("Servers\\Unix\\db-admin") == 10
+    assert index.lookup("Servers\\Unix\\web-admin") == 11
+    assert index.lookup("Servers\\Linux\\web-admin") is None
+
+
+def test_index_keeps_serving_when_sync_fails(api):
+    """A failed incremental sync leaves the existing index in place."""
+    index = SecretIndex(api, sync_interval=0)
+    index.lookup("Servers\\Linux\\db-admin")
+
+    with patch.object(index, "get", side_effect=OSError("down")):
+        assert index.lookup("Servers\\Linux\\db-admin") == 10
+
+
+def test_relookup_corrects_stale_entries(api):
+    """A direct search replaces the indexed ID for a path."""
+    index = SecretIndex(api, sync_interval=300)
+    index.lookup("Servers\\Linux\\db-admin")
+    del api.secrets[10]
+    api.secrets[20] = (2, "db-admin")
+
+    assert index.relookup("Servers\\Linux\\db-admin") == 20
+    assert index.lookup("Servers\\Linux\\db-admin") == 20
+
+
+def test_find_secret_matches_folder(api):
+    """Same-named secrets in other folders are not returned."""
+    assert find_secret(api, "Servers\\db-admin") == 12
+    assert find_secret(api, "Other\\db-admin") is None
+
+
+# ── Plugin integration ──────────────────────────────────────────────────
+
+
+def _path_kwargs(path="Servers\\Linux\\db-admin"):
+    return dict(
+        base_url=FAKE_SERVER,
+        username="appuser",
+        password="s3cret",
+        identifier="secret",
+        secret_path=path,
+        secret_field="password",
+    )
+
+
+@pytest.fixture
+def plugin_api(api):
+    """Route the plugin's REST calls to the fake API with indexing enabled."""
+    with patch.object(_plugin_mod, "_api_getter", return_value=api), patch.object(
+        _plugin_mod, "_secret_indexes", {}
+    ), patch.object(_plugin_mod, "SECRET_INDEX_SYNC", 300.0):
+        yield api
+
+
+@patch.object(_plugin_mod, "_secret_field", return_value="hunter2")
+def test_backend_resolves_secret_path(mock_field, plugin_api):
+    """secret_path resolves through the index to the secret ID."""
+    assert backend(**_path_kwargs()) == "hunter2"
+    assert backend(**_path_kwargs()) == "hunter2"
+
+    assert mock_field.call_args[0][4:] == ("10", "password")
+    assert len(plugin_api.searches()) == 2  # the initial build only
+
+
+def test_backend_stale_index_entry_relooks_once(plugin_api):
+    """A secret recreated under a new ID is found with one direct search."""
+
+    def field(base_url, username, password, domain, secret_id, secret_field):
+        if int(secret_id) not in plugin_api.secrets:
+            raise SecretServerClientError("Access Denied")
+        return f"value-of-{secret_id}"
+
+    with patch.object(_plugin_mod, "_secret_field", side_effect=field):
+        assert backend(**_path_kwargs()) == "value-of-10"
+        del plugin_api.secrets[10]
+        plugin_api.secrets[20] = (2, "db-admin")
+        searches = len(plugin_api.searches())
+        assert backend(**_path_kwargs()) == "value-of-20"
+
+    assert len(plugin_api.searches()) == searches + 1
+
+
+def test_backend_finds_secret_created_since_sync(plugin_api):
+    """A path missing from the index is searched for directly before giving up."""
+    with patch.object(_plugin_mod, "_secret_field", return_value="hunter2") as mock_field:
+        backend(**_path_kwargs())
+        plugin_api.secrets[30] = (2, "new-admin")
+        assert backend(**_path_kwargs("Servers\\Linux\\new-admin")) == "hunter2"
+
+    assert mock_field.call_args[0][4] == "30"
+
+
+def test_backend_denied_secret_with_current_id_is_raised(plugin_api):
+    """Access denied on an ID the server still lists is the caller's error."""
+    denied = SecretServerClientError("Access Denied")
+    with patch.object(_plugin_mod, "_secret_field", side_effect=denied):
+        with pytest.raises(SecretServerClientError):
+            backend(**_path_kwargs())
+
+
+def test_backend_secret_path_without_index(api):
+    """With indexing disabled, secret_path costs one direct search per lookup."""
+    with patch.object(_plugin_mod, "_api_getter", return_value=api), patch.object(
+        _plugin_mod, "_secret_field", return_value="hunter2"
+    ) as mock_field:
+        assert backend(**_path_kwargs("Servers\\db-admin")) == "hunter2"
+        with pytest.raises(ValueError, match="No secret found"):
+            backend(**_path_kwargs("Servers\\nothing"))
+
+    assert mock_field.call_args[0][4] == "12"
+
+
+def test_secret_indexes_are_bounded_and_dropped_on_rotation(plugin_api):
+    """Indexes are kept LRU, and a rotated password drops the old index."""
+    indexes = _plugin_mod._secret_indexes
+    with patch.object(_plugin_mod, "SECRET_INDEX_SIZE", 2), patch.object(
+        _plugin_mod, "_secret_field", return_value="hunter2"
+    ):
+        backend(**_path_kwargs())
+        backend(**dict(_path_kwargs(), password="rotated"))
+        assert [key[1] for key in indexes] == ["appuser"]
+        backend(**dict(_path_kwargs(), username="other"))
+        backend(**dict(_path_kwargs(), password="rotated"))
+        backend(**dict(_path_kwargs(), username="third"))
+
+    assert [key[1] for key in indexes] == ["appuser", "third"]
+    assert _plugin_mod._cache_key(FAKE_SERVER, "appuser", "rotated") in indexes
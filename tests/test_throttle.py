@@ -0,0 +1,151 @@
+"""Unit tests for client-side grant rate limiting."""
+
+import email.utils
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.delinea_secret_server import DeadlineExceeded, Grant, _fetch_grant
+from credential_plugins.throttle import RateLimiter, Throttled, TokenBucket, backoff, retry_after
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+FAKE_SERVER = "https://myserver.example.com/SecretServer"
+GRANT = Grant("tok", 1200, None, None)
+
+
+def test_bucket_allows_burst_then_spaces_requests():
+    """Up to ``burst`` requests go at once; later ones queue at the rate."""
+    with patch("credential_plugins.throttle.time.monotonic", return_value=0.0):
+        bucket = TokenBucket(rate=10, burst=2)
+        waits = [bucket.reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1)
+    assert waits[3] == pytest.approx(0.2)
+
+
+def test_bucket_refuses_reservation_past_timeout():
+    """A caller whose slot lies beyond its timeout is refused, reserving nothing."""
+    with patch("credential_plugins.throttle.time.monotonic", return_value=0.0):
+        bucket = TokenBucket(rate=1, burst=1)
+        assert bucket.reserve(timeout=0) == 0.0
+        assert bucket.reserve(timeout=0.5) is None
+        assert bucket.reserve(timeout=1.5) == pytest.approx(1.0)
+
+
+def test_bucket_pause_holds_every_caller():
+    """A Retry-After pause applies even when the rate is unlimited."""
+    with patch("credential_plugins.throttle.time.monotonic", return_value=0.0):
+        bucket = TokenBucket(rate=0, burst=1)
+        assert bucket.reserve() == 0.0
+        bucket.pause(2.0)
+        assert bucket.reserve() == pytest.approx(2.0)
+        assert bucket.reserve(timeout=1.0) is None
+
+
+def test_limiter_smooths_concurrent_callers():
+    """Threads over the limit are spread out rather than rejected."""
+    limiter = RateLimiter(rate=50, burst=1)
+    done = []
+
+    def worker():
+        assert limiter.acquire(FAKE_SERVER, timeout=5)
+        done.append(time.monotonic())
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(done) == 6
+    assert max(done) - started >= 0.09  # five queued slots at 20ms each
+
+
+def test_retry_after_parses_seconds_and_dates():
+    """Both Retry-After forms are understood; garbage is ignored."""
+    assert retry_after("7") == 7.0
+    assert retry_after(None) is None
+    assert retry_after("soon") is None
+    later = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= retry_after(later) <= 30
+
+
+def test_backoff_is_jittered_and_capped():
+    """Delays stay within the exponential envelope and its cap."""
+    for attempt in range(10):
+        assert 0.0 <= backoff(attempt, base=0.5, cap=4.0) <= min(4.0, 0.5 * 2**attempt)
+
+
+# ── Plugin integration ──────────────────────────────────────────────────
+
+
+@pytest.fixture
+def limiter():
+    fresh = RateLimiter(rate=0, burst=1)
+    with patch.object(_plugin_mod, "_grant_limiter", fresh), patch.object(
+        _plugin_mod, "backoff", return_value=0.0
+    ):
+        yield fresh
+
+
+def test_throttled_grant_is_retried_after_retry_after(limiter):
+    """A 429 pauses grants for Retry-After, then the grant is retried."""
+    grant_from = MagicMock(side_effect=[Throttled("429", retry_after=0.05), GRANT])
+    with patch.object(_plugin_mod, "_grant_from", grant_from):
+        started = time.monotonic()
+        assert _fetch_grant(FAKE_SERVER, "appuser", "s3cret") == GRANT
+
+    assert grant_from.call_count == 2
+    assert time.monotonic() - started >= 0.05
+
+
+def test_throttled_grant_gives_up_after_retries(limiter):
+    """Persistent throttling surfaces as Throttled after the configured retries."""
+    grant_from = MagicMock(side_effect=Throttled("429", retry_after=0))
+    with patch.object(_plugin_mod, "_grant_from", grant_from), patch.object(
+        _plugin_mod, "GRANT_RETRIES", 2
+    ):
+        with pytest.raises(Throttled):
+            _fetch_grant(FAKE_SERVER, "appuser", "s3cret")
+    assert grant_from.call_count == 3
+
+
+def test_throttled_grant_not_retried_past_deadline(limiter):
+    """A Retry-After longer than the time left is not waited for."""
+    grant_from = MagicMock(side_effect=Throttled("429", retry_after=60))
+    reset = _plugin_mod._deadline.set(time.monotonic() + 1)
+    try:
+        with patch.object(_plugin_mod, "_grant_from", grant_from):
+            with pytest.raises(Throttled):
+                _fetch_grant(FAKE_SERVER, "appuser", "s3cret")
+    finally:
+        _plugin_mod._deadline.reset(reset)
+    assert grant_from.call_count == 1
+
+
+def test_queued_grant_stops_at_deadline(limiter):
+    """A caller whose grant slot lies past its deadline fails fast."""
+    limiter.pause(FAKE_SERVER, 60)
+    reset = _plugin_mod._deadline.set(time.monotonic() + 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            _fetch_grant(FAKE_SERVER, "appuser", "s3cret")
+    finally:
+        _plugin_mod._deadline.reset(reset)
+
+
+def test_request_access_grant_raises_throttled_on_429():
+    """The pooled token request maps HTTP 429 and its Retry-After to Throttled."""
+    response = MagicMock(status_code=429, headers={"Retry-After": "12"})
+    pool = MagicMock()
+    pool.session.return_value.post.return_value = response
+    with patch.object(_plugin_mod, "_get_http_pool", return_value=pool):
+        with pytest.raises(Throttled) as info:
+            _plugin_mod._request_access_grant(FAKE_SERVER + "/oauth2/token", {})
+    assert info.value.retry_after == 12.0
@@ -0,0 +1,394 @@
+"""Unit tests for the shared token stores."""
+
+import multiprocessing
+import os
+import stat
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins.delinea_secret_server import (
+    DeadlineExceeded,
+    Grant,
+    backend,
+    set_token_store,
+)
+from credential_plugins.token_store import NullTokenStore, RedisTokenStore, SqliteTokenStore
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+FAKE_SERVER = "https://myserver.example.com/SecretServer"
+FAKE_TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCJ9.fakepayload.fakesig"
+CREDS = (FAKE_SERVER, "appuser", "s3cret", None)
+
+
+def _payload(token=FAKE_TOKEN, lifetime=600):
+    return {"access_token": token, "expires_at": time.time() + lifetime}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SqliteTokenStore(str(tmp_path / "tokens.db"), iterations=1000)
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+@pytest.fixture
+def redis_store(fake_redis):
+    return RedisTokenStore(fake_redis, iterations=1000)
+
+
+@pytest.fixture
+def shared_cache(tmp_path):
+    """Point the plugin at a fresh shared store with an empty in-process cache."""
+    path = str(tmp_path / "shared.db")
+    _plugin_mod._token_cache.clear()
+    with patch.object(_plugin_mod, "SHARED_CACHE_PATH", path), patch.object(
+        _plugin_mod, "_shared_store", None
+    ):
+        yield path
+    _plugin_mod._token_cache.clear()
+
+
+def test_store_round_trip(store):
+    """A stored grant is returned to the same identity."""
+    store.put(CREDS, _payload())
+    assert store.get(CREDS)["access_token"] == FAKE_TOKEN
+
+
+def test_store_isolates_identities(store):
+    """Different passwords, users or domains never see each other's token."""
+    store.put(CREDS, _payload())
+
+    assert store.get((FAKE_SERVER, "appuser", "other", None)) is None
+    assert store.get((FAKE_SERVER, "otheruser", "s3cret", None)) is None
+    assert store.get((FAKE_SERVER, "appuser", "s3cret", "CORP")) is None
+
+
+def test_store_drops_expired_grants(store):
+    """Expired grants are treated as misses."""
+    store.put(CREDS, _payload(lifetime=-1))
+    assert store.get(CREDS) is None
+
+
+def test_store_encrypts_at_rest(store):
+    """Neither the token nor the password appear in the database file."""
+    store.put(CREDS, _payload())
+    store._connect().execute("PRAGMA wal_checkpoint(FULL)")
+
+    raw = b""
+    for suffix in ("", "-wal"):
+        if os.path.exists(store.path + suffix):
+            with open(store.path + suffix, "rb") as fh:
+                raw += fh.read()
+
+    assert FAKE_TOKEN.encode() not in raw
+    assert b"s3cret" not in raw
+
+
+def test_store_rejects_tampered_rows(store):
+    """A row that fails authentication is ignored."""
+    store.put(CREDS, _payload())
+    conn = store._connect()
+    blob = bytearray(conn.execute("SELECT blob FROM tokens").fetchone()[0])
+    blob[20] ^= 0xFF
+    conn.execute("UPDATE tokens SET blob = ?", (bytes(blob),))
+
+    assert store.get(CREDS) is None
+
+
+def test_store_rejects_truncated_rows(store):
+    """A row too short to hold a nonce and tag is ignored."""
+    store.put(CREDS, _payload())
+    store._connect().execute("UPDATE tokens SET blob = ?", (b"short",))
+
+    assert store.get(CREDS) is None
+
+
+def test_store_database_errors_are_misses(store, caplog):
+    """A broken database is logged and treated as empty, never raised."""
+    store._connect().execute("DROP TABLE tokens")
+
+    store.put(CREDS, _payload())
+    assert store.get(CREDS) is None
+    assert "Shared token store write failed" in caplog.text
+    assert "Shared token store read failed" in caplog.text
+
+
+def test_store_clear_drops_every_grant(store):
+    store.put(CREDS, _payload())
+    store.clear()
+    assert store.get(CREDS) is None
+
+
+def test_store_file_is_owner_only(store):
+    """The database file is created with 0600 permissions."""
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o600
+
+
+def test_store_survives_reopen(store):
+    """A new store instance (e.g. a recycled worker) reads existing grants."""
+    store.put(CREDS, _payload())
+    reopened = SqliteTokenStore(store.path, iterations=1000)
+    assert reopened.get(CREDS)["access_token"] == FAKE_TOKEN
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_backend_reads_shared_cache(mock_fetch, shared_cache):
+    """A worker with a cold in-process cache picks up another worker's grant."""
+    mock_fetch.return_value = Grant(FAKE_TOKEN, 1200, None, None)
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+
+    assert backend(**kwargs) == FAKE_TOKEN
+    _plugin_mod._token_cache.clear()
+    assert backend(**kwargs) == FAKE_TOKEN
+
+    assert mock_fetch.call_count == 1
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_backend_replaces_shared_grant_near_expiry(mock_fetch, shared_cache):
+    """A shared grant within the cache margin of expiry is replaced and republished."""
+    mock_fetch.return_value = Grant("fresh-token", 1200, None, None)
+    _plugin_mod._get_shared_store().put(CREDS, _payload(lifetime=2))
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+
+    for _ in range(3):
+        assert backend(**kwargs) == "fresh-token"
+        _plugin_mod._token_cache.clear()
+
+    assert mock_fetch.call_count == 1
+    assert _plugin_mod._get_shared_store().get(CREDS)["access_token"] == "fresh-token"
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_backend_lock_wait_honours_deadline(mock_fetch, shared_cache):
+    """A held node lock is waited for only until the call deadline."""
+    holder = _plugin_mod._get_shared_store()
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret", timeout="0.5")
+
+    with holder.lock(CREDS) as held:
+        assert held is True
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            backend(**kwargs)
+        elapsed = time.monotonic() - started
+
+    assert elapsed < 2
+    mock_fetch.assert_not_called()
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_backend_uses_grant_published_while_waiting(mock_fetch, store):
+    """A grant another worker stored while we waited for the lock is reused."""
+    published = Grant(FAKE_TOKEN, 600, None, None)
+    set_token_store(store)
+    try:
+        with patch.object(_plugin_mod, "_load_shared", side_effect=[None, published]):
+            assert (
+                backend(base_url=FAKE_SERVER, username="appuser", password="s3cret") == FAKE_TOKEN
+            )
+    finally:
+        set_token_store(None)
+        _plugin_mod._token_cache.clear()
+
+    mock_fetch.assert_not_called()
+
+
+@pytest.mark.parametrize("setting", ["TOKEN_STORE_URL", "SHARED_CACHE_PATH"])
+def test_unavailable_store_falls_back_to_null_store(setting, tmp_path, caplog):
+    """A store that cannot be opened degrades to granting without sharing."""
+    (tmp_path / "not-a-dir").write_text("")
+    values = {
+        "TOKEN_STORE_URL": "unsupported://store",
+        "SHARED_CACHE_PATH": str(tmp_path / "not-a-dir" / "shared.db"),
+    }
+    with patch.object(_plugin_mod, setting, values[setting]):
+        store = _plugin_mod._open_token_store()
+
+    assert isinstance(store, NullTokenStore)
+    assert "unavailable" in caplog.text
+
+
+def test_store_lock_wait_is_capped_by_timeout(store):
+    """lock() gives up after the caller's timeout when it is below lock_timeout."""
+    with store.lock(CREDS) as held:
+        started = time.monotonic()
+        with SqliteTokenStore(store.path, iterations=1000).lock(CREDS, 0.1) as waited:
+            assert held is True and waited is False
+        assert time.monotonic() - started < 2
+
+
+def _grant_in_child(path, log_path):
+    """Resolve a token in a forked worker, logging each real grant."""
+
+    def fetch(*args):
+        with open(log_path, "a") as fh:
+            fh.write("grant\n")
+        time.sleep(0.2)
+        return Grant(FAKE_TOKEN, 1200, None, None)
+
+    with patch.object(_plugin_mod, "_fetch_grant", side_effect=fetch):
+        token = backend(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+    sys.exit(0 if token == FAKE_TOKEN else 1)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fork and flock are POSIX only")
+def test_backend_one_grant_per_node(shared_cache, tmp_path):
+    """Concurrent worker processes share a single grant through the store."""
+    log_path = str(tmp_path / "grants.log")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_grant_in_child, args=(shared_cache, log_path)) for _ in range(6)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(timeout=30)
+
+    assert [proc.exitcode for proc in procs] == [0] * 6
+    with open(log_path) as fh:
+        assert fh.read().count("grant") == 1
+
+
+# ── NullTokenStore ──────────────────────────────────────────────────────
+
+
+def test_null_store_stores_nothing():
+    """The no-op fallback never returns a grant and never locks."""
+    store = NullTokenStore()
+    store.put(CREDS, _payload())
+    store.clear()
+    assert store.get(CREDS) is None
+    with store.lock(CREDS) as acquired:
+        assert acquired is False
+
+
+# ── RedisTokenStore ─────────────────────────────────────────────────────
+
+
+def test_redis_store_round_trip_with_ttl(redis_store, fake_redis):
+    """Grants are stored encrypted with a TTL matching their lifetime."""
+    redis_store.put(CREDS, _payload(lifetime=600))
+
+    assert redis_store.get(CREDS)["access_token"] == FAKE_TOKEN
+    (name,) = list(fake_redis.scan_iter(match="tss:token:*"))
+    assert 0 < fake_redis.pttl(name) <= 600 * 1000
+    assert FAKE_TOKEN.encode() not in fake_redis.get(name)
+
+
+def test_redis_store_isolates_identities(redis_store):
+    """Another identity derives another key and cannot read the grant."""
+    redis_store.put(CREDS, _payload())
+    assert redis_store.get((FAKE_SERVER, "appuser", "other", None)) is None
+
+
+def test_redis_store_shared_between_nodes(fake_redis):
+    """Two nodes on the same server agree on the salt and share grants."""
+    node_a = RedisTokenStore(fake_redis, iterations=1000)
+    node_b = RedisTokenStore(fake_redis, iterations=1000)
+
+    node_a.put(CREDS, _payload())
+
+    assert node_b.get(CREDS)["access_token"] == FAKE_TOKEN
+
+
+def test_redis_store_lock_is_exclusive(fake_redis):
+    """Only one holder at a time gets the distributed lock for an identity."""
+    node_a = RedisTokenStore(fake_redis, iterations=1000)
+    node_b = RedisTokenStore(fake_redis, iterations=1000, lock_timeout=0.05)
+
+    with node_a.lock(CREDS) as held_a:
+        with node_b.lock(CREDS) as held_b:
+            assert held_a is True
+            assert held_b is False
+    with node_b.lock(CREDS) as held_b:
+        assert held_b is True
+
+
+def test_redis_store_lock_wait_is_capped_by_timeout(fake_redis):
+    """The distributed lock is waited for no longer than the caller's timeout."""
+    node_a = RedisTokenStore(fake_redis, iterations=1000)
+    node_b = RedisTokenStore(fake_redis, iterations=1000)
+
+    with node_a.lock(CREDS):
+        started = time.monotonic()
+        with node_b.lock(CREDS, 0.05) as held_b:
+            assert held_b is False
+        assert time.monotonic() - started < 2
+
+
+def test_redis_store_unreachable_is_a_miss():
+    """An unreachable server degrades to a no-op instead of failing launches."""
+    redis = pytest.importorskip("redis")
+    from redis.backoff import NoBackoff
+    from redis.retry import Retry
+
+    client = redis.Redis(
+        host="127.0.0.1", port=1, socket_connect_timeout=0.2, retry=Retry(NoBackoff(), 0)
+    )
+    store = RedisTokenStore(client, iterations=1000, retry_after=60)
+
+    store.put(CREDS, _payload())
+    assert store.get(CREDS) is None
+    with store.lock(CREDS) as acquired:
+        assert acquired is False
+    assert store._is_down()
+
+
+def test_redis_store_clear_and_recovery(redis_store, fake_redis):
+    """clear() drops every grant; a store that started while down fetches the salt later."""
+    redis_store.put(CREDS, _payload())
+    redis_store.clear()
+    assert redis_store.get(CREDS) is None
+
+    late = RedisTokenStore(fake_redis, iterations=1000)
+    late._salt = b""  # as if the server was down when it started
+    late.put(CREDS, _payload())
+    assert redis_store.get(CREDS)["access_token"] == FAKE_TOKEN
+
+
+def test_redis_store_from_url_degrades_when_unreachable():
+    """from_url() connects lazily; an unreachable server leaves the store down."""
+    pytest.importorskip("redis")
+    store = RedisTokenStore.from_url("redis://127.0.0.1:1/0", iterations=1000, retry_after=60)
+    assert store._is_down()
+    assert store.get(CREDS) is None
+
+
+def test_redis_store_release_keeps_a_lease_it_lost(fake_redis, caplog):
+    """Releasing never deletes another holder's lease, and errors are only logged."""
+    redis = pytest.importorskip("redis")
+    store = RedisTokenStore(fake_redis, iterations=1000)
+    fake_redis.set("lease", "other-owner")
+    store._release("lease", "me")
+    assert fake_redis.get("lease") == b"other-owner"
+
+    with patch.object(fake_redis, "pipeline", side_effect=redis.WatchError):
+        store._release("lease", "other-owner")
+    with patch.object(fake_redis, "pipeline", side_effect=redis.ConnectionError("down")):
+        store._release("lease", "other-owner")
+    assert "Failed to release distributed token lock" in caplog.text
+
+
+@patch.object(_plugin_mod, "_fetch_grant")
+def test_backend_uses_custom_token_store(mock_fetch, redis_store):
+    """set_token_store() plugs a backend in front of the password grant."""
+    mock_fetch.return_value = Grant(FAKE_TOKEN, 1200, None, None)
+    kwargs = dict(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+    _plugin_mod._token_cache.clear()
+    set_token_store(redis_store)
+    try:
+        assert backend(**kwargs) == FAKE_TOKEN
+        _plugin_mod._token_cache.clear()
+        assert backend(**kwargs) == FAKE_TOKEN
+    finally:
+        set_token_store(None)
+        _plugin_mod._token_cache.clear()
+
+    assert mock_fetch.call_count == 1
@@ -0,0 +1,159 @@
+"""Unit tests for per-phase spans and sampled profiling."""
+
+import contextlib
+import pstats
+import sys
+import tracemalloc
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins import tracing
+from credential_plugins.delinea_secret_server import backend
+from credential_plugins.tracing import Profiler, identity_hash, span
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+FAKE_SERVER = "https://myserver.example.com/SecretServer"
+FAKE_TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCJ9.fakepayload.fakesig"
+
+
+@pytest.fixture
+def spans():
+    """Collect finished spans for the duration of a test."""
+    collected = []
+    tracing.add_span_callback(collected.append)
+    try:
+        yield collected
+    finally:
+        tracing.remove_span_callback(collected.append)
+
+
+class FakeTracer:
+    """Minimal stand-in for an OpenTelemetry tracer."""
+
+    def __init__(self):
+        self.started = []
+        self.attributes = {}
+
+    @contextlib.contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        self.started.append(name)
+        otel_span = MagicMock()
+        otel_span.set_attribute.side_effect = lambda k, v: self.attributes.update({(name, k): v})
+        yield otel_span
+
+
+def test_span_is_noop_without_consumer():
+    """No consumer registered: spans cost a shared no-op context."""
+    assert not tracing.enabled()
+    assert span("grant") is span("dns")
+
+
+def test_spans_nest_and_report_self_time(spans):
+    """Children share the trace, point at their parent and reduce its self time."""
+    with span("backend", identifier="token"):
+        with span("grant") as attributes:
+            attributes["http.status_code"] = 200
+
+    grant, root = spans
+    assert (grant.name, root.name) == ("grant", "backend")
+    assert grant.trace_id == root.trace_id
+    assert grant.parent_id == root.span_id and root.parent_id is None
+    assert grant.attributes["http.status_code"] == 200
+    assert root.attributes["self_seconds"] <= root.duration - grant.duration + 1e-6
+
+
+def test_span_records_error_type(spans):
+    """A span ended by an exception names its type."""
+    with pytest.raises(ConnectionError):
+        with span("connect"):
+            raise ConnectionError("refused")
+    assert spans[0].error == "ConnectionError"
+
+
+def test_broken_callback_does_not_fail_call(spans):
+    """Consumer errors are swallowed."""
+    tracing.add_span_callback(MagicMock(side_effect=RuntimeError("boom")))
+    try:
+        with span("dns"):
+            pass
+    finally:
+        tracing._callbacks[:] = [spans.append]
+    assert [s.name for s in spans] == ["dns"]
+
+
+def test_spans_forward_to_opentelemetry_tracer():
+    """A tracer with ``start_as_current_span`` receives every span."""
+    tracer = FakeTracer()
+    tracing.set_tracer(tracer)
+    try:
+        with span("backend"):
+            with span("grant"):
+                pass
+    finally:
+        tracing.set_tracer(None)
+    assert tracer.started == ["backend", "grant"]
+    assert ("grant", "tss.self_seconds") in tracer.attributes
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_backend_span_hashes_identity(mock_cls, spans):
+    """The backend span identifies the account by digest only."""
+    mock_cls.return_value = MagicMock(get_access_token=MagicMock(return_value=FAKE_TOKEN))
+    _plugin_mod._token_cache.clear()
+    try:
+        backend(base_url=FAKE_SERVER, username="appuser", password="s3cret")
+    finally:
+        _plugin_mod._token_cache.clear()
+
+    root = spans[-1]
+    assert root.name == "backend"
+    assert root.attributes["identity"] == identity_hash(FAKE_SERVER, "appuser")
+    assert root.attributes["identifier"] == "token"
+    text = repr(spans)
+    assert "appuser" not in text and "s3cret" not in text and FAKE_TOKEN not in text
+
+
+def test_profiler_writes_cprofile_stats(tmp_path):
+    """A sampled call leaves a pstats-readable profile."""
+    profiler = Profiler(1.0, "cprofile", str(tmp_path))
+    assert profiler.run(lambda: sum(range(100))) == 4950
+    (path,) = tmp_path.iterdir()
+    assert path.suffix == ".prof"
+    assert pstats.Stats(str(path)).total_calls > 0
+
+
+def test_profiler_writes_tracemalloc_snapshot(tmp_path):
+    """tracemalloc mode dumps a loadable snapshot and stops tracing again."""
+    profiler = Profiler(1.0, "tracemalloc", str(tmp_path))
+    profiler.run(lambda: [object() for _ in range(100)])
+    (path,) = tmp_path.iterdir()
+    assert tracemalloc.Snapshot.load(str(path)).traces is not None
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.parametrize("kind", ["cprofile", "tracemalloc"])
+def test_profiler_write_failure_keeps_result(tmp_path, kind, caplog):
+    """An unwritable profile directory is logged; the call still returns its value."""
+    profiler = Profiler(1.0, kind, str(tmp_path / "missing"))
+    assert profiler.run(lambda: "token") == "token"
+    assert "Could not write profile" in caplog.text
+    assert not tracemalloc.is_tracing()
+
+
+def test_backend_runs_under_profiler(tmp_path):
+    """With profiling enabled, backend() calls go through the profiler."""
+    profiler = Profiler(1.0, "cprofile", str(tmp_path))
+    with patch.object(_plugin_mod, "_profiler", profiler):
+        assert backend(base_url=FAKE_SERVER, username="u", password="p", identifier="base_url")
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_profiler_skips_unsampled_calls(tmp_path):
+    """With a zero sample rate nothing is written."""
+    Profiler(0.0, "cprofile", str(tmp_path)).run(lambda: None)
+    assert list(tmp_path.iterdir()) == []
+    with pytest.raises(ValueError, match="Unknown profiler"):
+        Profiler(0.5, "perf")
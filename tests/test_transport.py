@@ -0,0 +1,393 @@
+"""Unit tests for the pooled HTTP transport."""
+
+import json
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+import credential_plugins.delinea_secret_server  # noqa: F401
+from credential_plugins import tracing, transport
+from credential_plugins.delinea_secret_server import (
+    SecretServerError,
+    _fetch_grant,
+    _get_authorizer,
+    _request_access_grant,
+    backend,
+)
+from credential_plugins.transport import DNSCache, SessionPool, TLSSessionCache, origin
+
+_plugin_mod = sys.modules["credential_plugins.delinea_secret_server"]
+
+FAKE_TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCJ9.fakepayload.fakesig"
+
+
+class _TokenHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive Secret Server: health check and password grant."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path))
+        if "/secrets/" not in self.path:
+            self._reply(200, {"Healthy": True})
+        elif self.headers.get("Authorization") != f"Bearer {FAKE_TOKEN}":
+            self._reply(401, {"message": "Authentication failed"})
+        else:
+            item = {"fieldName": "Password", "slug": "password", "itemValue": "hunter2"}
+            self._reply(200, {"id": 42, "items": [item]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append(("POST", self.path))
+        self._reply(200, {"access_token": FAKE_TOKEN, "expires_in": 1200})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def token_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TokenHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def tls_token_server(tmp_path, token_server):
+    """The token server behind TLS, with a throwaway self-signed certificate."""
+    if not shutil.which("openssl"):
+        pytest.skip("openssl is required to generate a test certificate")
+    cert, key = str(tmp_path / "cert.pem"), str(tmp_path / "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-keyout", key, "-out", cert, "-subj", "/CN=localhost"]
+        + ["-addext", "subjectAltName=DNS:localhost"],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    token_server.socket = context.wrap_socket(token_server.socket, server_side=True)
+    token_server.cert = cert
+    return token_server
+
+
+@pytest.fixture
+def pool():
+    """Swap in a fresh session pool and server-type cache for the plugin."""
+    fresh = SessionPool()
+    with patch.object(_plugin_mod, "_http_pool", fresh), patch.object(
+        _plugin_mod, "_server_types", {}
+    ):
+        yield fresh
+    fresh.close()
+
+
+# ── SessionPool ─────────────────────────────────────────────────────────
+
+
+def test_origin_ignores_path_and_case():
+    """Sessions are keyed by scheme, host and port only."""
+    assert origin("HTTPS://Host.example.com:8443/SecretServer/oauth2/token") == (
+        "https://host.example.com:8443"
+    )
+
+
+def test_pool_reuses_session_per_origin():
+    """Requests to one origin share a session; other origins get their own."""
+    sessions = SessionPool()
+    first = sessions.session("https://a.example.com/SecretServer/oauth2/token")
+    again = sessions.session("https://a.example.com/api/v1/healthcheck")
+    other = sessions.session("https://b.example.com/oauth2/token")
+
+    assert first is again
+    assert first is not other
+    assert len(sessions) == 2
+    sessions.close()
+    assert len(sessions) == 0
+
+
+def test_pool_reaps_idle_sessions():
+    """Sessions unused for longer than the idle timeout are closed."""
+    sessions = SessionPool(idle_timeout=30)
+    with patch("credential_plugins.transport.time.monotonic", return_value=100.0):
+        session = sessions.session("https://a.example.com/")
+    session.close = MagicMock()
+
+    with patch("credential_plugins.transport.time.monotonic", return_value=131.0):
+        assert sessions.reap() == 1
+
+    session.close.assert_called_once()
+    assert len(sessions) == 0
+
+
+# ── DNSCache ────────────────────────────────────────────────────────────
+
+_ADDRINFO = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 443))]
+
+
+def test_dns_cache_serves_repeat_lookups():
+    """A second lookup within the TTL does not call getaddrinfo."""
+    cache = DNSCache(ttl=60)
+    with patch("socket.getaddrinfo", return_value=_ADDRINFO) as mock_gai:
+        assert cache.resolve("ss.example.com", 443) == ["10.0.0.1"]
+        assert cache.resolve("ss.example.com", 443) == ["10.0.0.1"]
+
+    assert mock_gai.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_dns_cache_expires_and_invalidates():
+    """Entries are re-resolved after the TTL or an explicit invalidation."""
+    cache = DNSCache(ttl=60)
+    with patch("socket.getaddrinfo", return_value=_ADDRINFO) as mock_gai:
+        with patch("credential_plugins.transport.time.monotonic", return_value=0.0):
+            cache.resolve("ss.example.com", 443)
+        with patch("credential_plugins.transport.time.monotonic", return_value=61.0):
+            cache.resolve("ss.example.com", 443)
+        cache.invalidate("ss.example.com")
+        cache.resolve("ss.example.com", 443)
+
+    assert mock_gai.call_count == 3
+
+
+def test_dns_cache_is_bounded():
+    """The least recently resolved host is dropped when the cache is full."""
+    cache = DNSCache(ttl=60, max_size=1)
+    with patch("socket.getaddrinfo", return_value=_ADDRINFO):
+        cache.resolve("a.example.com", 443)
+        cache.resolve("b.example.com", 443)
+    assert list(cache._entries) == [("b.example.com", 443)]
+
+    cache.clear()
+    assert len(cache._entries) == 0
+
+
+def test_dns_cache_does_not_cache_failures():
+    """A failed lookup returns no addresses and is retried next time."""
+    cache = DNSCache(ttl=60)
+    with patch("socket.getaddrinfo", side_effect=socket.gaierror("no such host")):
+        assert cache.resolve("missing.example.com", 443) == []
+    assert len(cache._entries) == 0
+
+
+# ── TLS session resumption ──────────────────────────────────────────────
+
+
+def test_tls_session_cache_counts_handshakes():
+    """Full and resumed handshakes are counted separately."""
+    cache = TLSSessionCache()
+    sock = MagicMock(session="session-1")
+    cache.record("ss.example.com", sock, resumed=False)
+    cache.record("ss.example.com", sock, resumed=True)
+
+    assert (cache.full_handshakes, cache.resumed_handshakes) == (1, 1)
+    assert cache.get("ss.example.com") == "session-1"
+
+
+def test_tls_session_cache_tracks_late_tickets():
+    """Sessions issued after the handshake replace the one recorded with it."""
+    cache = TLSSessionCache(max_size=1)
+    sock = MagicMock(session="session-1")
+    cache.record("ss.example.com", sock, resumed=False)
+    sock.session = "session-2"
+    assert cache.get("ss.example.com") == "session-2"
+
+    sock.session = "session-3"
+    cache.capture("ss.example.com", sock)
+    cache.capture("ss.example.com", MagicMock(session=None))
+    assert cache._entries["ss.example.com"][0] == "session-3"
+
+    cache.record("other.example.com", MagicMock(session="other"), resumed=False)
+    assert cache.get("ss.example.com") is None
+    with patch("credential_plugins.transport.tls_sessions", cache):
+        assert transport.stats()["tls_full_handshakes"] == 2
+
+
+def test_new_connections_resume_tls_sessions(tls_token_server):
+    """A fresh connection to a known host resumes the previous TLS session."""
+    url = f"https://localhost:{tls_token_server.server_address[1]}/api/v1/healthcheck"
+    sessions = SessionPool()
+    fresh_cache = TLSSessionCache()
+    with patch("credential_plugins.transport.tls_sessions", fresh_cache):
+        for _ in range(3):
+            sessions.session(url).get(url, verify=tls_token_server.cert, timeout=5)
+            sessions.close()
+
+    assert fresh_cache.full_handshakes == 1
+    assert fresh_cache.resumed_handshakes == 2
+    assert tls_token_server.connections == 3
+
+
+def test_untrusted_certificate_is_reported(tls_token_server):
+    """An untrusted certificate surfaces as an SSL error, not a dead socket."""
+    url = f"https://localhost:{tls_token_server.server_address[1]}/api/v1/healthcheck"
+    sessions = SessionPool()
+    with patch("credential_plugins.transport.tls_sessions", TLSSessionCache()):
+        with pytest.raises(requests.exceptions.SSLError, match="certificate verify failed"):
+            sessions.session(url).get(url, verify=True, timeout=5)
+    sessions.close()
+
+
+# ── Plugin integration ──────────────────────────────────────────────────
+
+
+@patch.object(_plugin_mod, "PasswordGrantAuthorizer")
+def test_get_authorizer_uses_pooled_transport(mock_cls, pool):
+    """Authorizers send grants and health checks through the pool."""
+    authorizer = _get_authorizer("https://a.example.com", "appuser", "s3cret")
+
+    assert authorizer.get_access_grant is _request_access_grant
+    assert authorizer._validate_health_endpoint is _plugin_mod._check_health_endpoint
+
+
+def test_request_access_grant_rejects_non_json(pool):
+    """An HTML 200 from Secret Server raises SecretServerError, as in the SDK."""
+    response = MagicMock(status_code=200, content=b"<html>login</html>")
+    session = MagicMock(post=MagicMock(return_value=response))
+    with patch.object(pool, "session", return_value=session):
+        with pytest.raises(SecretServerError):
+            _request_access_grant("https://a.example.com/oauth2/token", {})
+
+
+def test_get_json_rejects_non_json(pool):
+    """An HTML 200 from a proxy in front of the API raises SecretServerError."""
+    response = MagicMock(status_code=200, content=b"<html>login</html>")
+    session = MagicMock(get=MagicMock(return_value=response))
+    with patch.object(pool, "session", return_value=session):
+        with pytest.raises(SecretServerError):
+            _plugin_mod._get_json("https://a.example.com/api/v1/secrets/1", FAKE_TOKEN)
+
+
+@pytest.mark.parametrize(
+    "body, healthy",
+    [(b'{"Healthy": true}', True), (b"Healthy", True), (b"<html>down</html>", False)],
+)
+def test_health_check_reads_json_or_text(pool, body, healthy):
+    """The health check accepts the JSON flag or a plain-text ``Healthy`` body."""
+    response = MagicMock(content=body)
+    response.json.side_effect = lambda: json.loads(body)
+    session = MagicMock(get=MagicMock(return_value=response))
+    with patch.object(pool, "session", return_value=session):
+        assert _plugin_mod._check_health_endpoint("https://a.example.com/hc") is healthy
+
+
+def test_health_check_reports_unreachable_server(pool):
+    """A connection error means unhealthy, not an exception."""
+    session = MagicMock(get=MagicMock(side_effect=requests.ConnectionError("refused")))
+    with patch.object(pool, "session", return_value=session):
+        assert _plugin_mod._check_health_endpoint("https://a.example.com/hc") is False
+
+
+def test_connect_failure_drops_cached_addresses(pool):
+    """When every cached address refuses, the host is resolved afresh next time."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]  # closed again before the request
+    url = f"http://localhost:{port}/api/v1/healthcheck"
+    with patch.object(transport.dns_cache, "resolve", return_value=["127.0.0.1"]), patch.object(
+        transport.dns_cache, "invalidate"
+    ) as mock_invalidate:
+        with pytest.raises(requests.ConnectionError):
+            pool.session(url).get(url, timeout=5)
+
+    mock_invalidate.assert_called_with("localhost")
+
+
+def test_grants_reuse_one_connection(token_server, pool):
+    """Repeated grants ride one keep-alive connection and skip re-detection."""
+    base_url = f"http://127.0.0.1:{token_server.server_address[1]}/SecretServer"
+
+    first = _fetch_grant(base_url, "appuser", "s3cret")
+    second = _fetch_grant(base_url, "appuser", "s3cret")
+
+    assert first.access_token == second.access_token == FAKE_TOKEN
+    assert token_server.connections == 1
+    assert token_server.requests == [
+        ("GET", "/SecretServer/api/v1/healthcheck"),
+        ("POST", "/SecretServer/oauth2/token"),
+        ("POST", "/SecretServer/oauth2/token"),
+    ]
+
+
+def test_secret_fields_share_one_request(token_server, pool):
+    """Several fields of one secret cost one grant and one secret GET."""
+    base_url = f"http://127.0.0.1:{token_server.server_address[1]}/SecretServer"
+    kwargs = dict(base_url=base_url, username="appuser", password="s3cret", secret_id="42")
+    _plugin_mod._token_cache.clear()
+    _plugin_mod._secret_cache.clear()
+    try:
+        for field in ("password", "Password", "PASSWORD"):
+            assert backend(identifier="secret", secret_field=field, **kwargs) == "hunter2"
+    finally:
+        _plugin_mod._token_cache.clear()
+        _plugin_mod._secret_cache.clear()
+
+    assert token_server.connections == 1
+    assert token_server.requests == [
+        ("GET", "/SecretServer/api/v1/healthcheck"),
+        ("POST", "/SecretServer/oauth2/token"),
+        ("GET", "/SecretServer/api/v1/secrets/42"),
+    ]
+
+
+def test_grant_fails_over_from_unreachable_node(token_server, pool):
+    """A node refusing connections is skipped within the same backend() call."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        dead_port = probe.getsockname()[1]
+    live = f"http://127.0.0.1:{token_server.server_address[1]}/SecretServer"
+    base_url = f"http://127.0.0.1:{dead_port}/SecretServer,{live}"
+    _plugin_mod._token_cache.clear()
+    try:
+        assert backend(base_url=base_url, username="appuser", password="s3cret") == FAKE_TOKEN
+    finally:
+        _plugin_mod._token_cache.clear()
+
+    assert ("POST", "/SecretServer/oauth2/token") in token_server.requests
+
+
+def test_spans_cover_each_phase(token_server, pool):
+    """A cold grant emits DNS, connect and grant spans under the call's span."""
+    base_url = f"http://localhost:{token_server.server_address[1]}/SecretServer"
+    spans = []
+    tracing.add_span_callback(spans.append)
+    _plugin_mod._token_cache.clear()
+    try:
+        with patch.object(transport, "dns_cache", DNSCache()):
+            backend(base_url=base_url, username="appuser", password="s3cret")
+    finally:
+        tracing.remove_span_callback(spans.append)
+        _plugin_mod._token_cache.clear()
+
+    names = [s.name for s in spans]
+    assert names[-1] == "backend"
+    for phase in ("dns", "connect", "health_check", "grant"):
+        assert phase in names
+    assert len({s.trace_id for s in spans}) == 1